@@ -15,6 +15,16 @@ hidden_imports = (
         'httpx',
         'aiofiles',
         'tkinter',
+    ] +
+    #app modules GUI.py loads by name through startup.lazy_import, which PyInstaller can't follow
+    [
+        'search',
+        'search_engines',
+        'deep_search',
+        'memory_governor',
+        'dedup',
+        'relevance',
+        'workers',
     ]
 )
 
@@ -1,22 +1,38 @@
-import tkinter as tk
-from tkinter import scrolledtext, messagebox, END
-import os
-import threading
-import json
-import logging
-import platform
-import sys
-
-#local imports
-from connect import ModelHandler
-from search import start_web_search
-from deep_search import summarize_search_attempt, answer_from_summaries
-
-with open("config.json", "r", encoding="utf-8") as f:
-    CONFIG = json.load(f)
-
-logging.basicConfig(level=logging.INFO, filename="app.log", filemode="w",
-                    format="%(asctime)s - %(levelname)s - %(message)s")
+#imported first so its clock starts before everything else
+from startup import PROFILER, lazy_import
+
+with PROFILER.timed("import stdlib + tkinter"):
+    import tkinter as tk
+    from tkinter import scrolledtext, messagebox, END
+    import os
+    import threading
+    import json
+    import logging
+    import platform
+    import sys
+    import time
+    import queue
+    import importlib
+
+#local imports (search and deep_search are imported on first use, see lazy_import)
+with PROFILER.timed("import utils"):
+    from utils import load_config, save_json_safe, setup_logging
+with PROFILER.timed("load config"):
+    CONFIG = load_config()
+    setup_logging()
+#what connect and knowledge pull in, one module at a time so each gets its own line in the report
+for _module in ("numpy", "onnxruntime_genai", "stopping", "tracing", "store",
+                "generation_cache", "chat_journal", "memory_governor", "relevance"):
+    with PROFILER.timed(f"import {_module}"):
+        importlib.import_module(_module)
+with PROFILER.timed("import connect"):
+    from connect import ModelHandler
+with PROFILER.timed("import knowledge"):
+    from knowledge import get_knowledge_index
+with PROFILER.timed("import transcript"):
+    from transcript import Transcript
+from store import get_store
+from tracing import export_chrome_trace
 
 #Global flags
 deep_search_active = False
@@ -42,11 +58,45 @@ class ChatApp:
             logging.warning(f"Could not load icon: {e}")
 
 
-        #Initialize model handler from connect
-        self.model_handler = ModelHandler()
+        #Initialize model handler from connect; the model itself loads in the
+        #background so the window shows up without waiting for it
+        with PROFILER.timed("create ModelHandler"):
+            self.model_handler = ModelHandler(load_now=False)
+        self.model_ready = False
+        self.last_search_query = None
+
+        #local full-text index over past searches and saved chats
+        self.knowledge = get_knowledge_index()
+        journal = self.model_handler.journal
+        threading.Thread(target=self.knowledge.sync_chats,
+                         args=(CONFIG["chat_file_dir"], journal.directory if journal is not None else None),
+                         daemon=True).start()
+        if journal is not None:
+            #journal sessions are reindexed as they are written
+            journal.on_write.append(self.knowledge.index_chat_file)
         
-        self.create_ui()
-        self.setup_initial_state()
+        #widget updates from worker threads go through this queue and are
+        #applied on the Tk thread once per frame
+        ui_config = CONFIG.get("ui", {})
+        self._ui_queue = queue.SimpleQueue()
+        self.frame_interval_ms = ui_config.get("frame_interval_ms", 33)
+        self.stall_threshold_ms = ui_config.get("stall_threshold_ms", 200)
+        self.ui_stalls = 0
+        self.max_ui_lag_ms = 0.0
+
+        #the transcript owns the chat text; the widget only shows a window of it
+        self.transcript = Transcript()
+        self.rendered_from = 0
+        self.transcript_window = ui_config.get("transcript_window_messages", 200)
+        self.transcript_load_batch = ui_config.get("transcript_load_batch", 50)
+
+        with PROFILER.timed("build UI"):
+            self.create_ui()
+            self.setup_initial_state()
+        self.root.after(self.frame_interval_ms, self._drain_ui_queue)
+        self._probe_event_loop_lag()
+        self.root.bind("<Map>", self._on_first_map, add="+")
+        threading.Thread(target=self._load_model_in_background, daemon=True).start()
 
     def create_ui(self):
         main_frame = tk.Frame(self.root)
@@ -63,7 +113,7 @@ class ChatApp:
 
         self.chat_box = scrolledtext.ScrolledText(main_frame, wrap=tk.WORD, width=60, height=20, font=chat_font)
         self.chat_box.pack(fill=tk.BOTH, expand=True)
-        self.chat_box.config(state=tk.DISABLED)
+        self.chat_box.config(state=tk.DISABLED, yscrollcommand=self._on_chat_scroll)
         self.chat_box.bind("<Double-Button-1>", self.handle_double_click)
 
 
@@ -77,6 +127,10 @@ class ChatApp:
         self.user_input.grid(row=0, column=0, sticky="ew")
         self.user_input.bind("<Return>", self.send_message)
         self.user_input.bind("<Shift-Return>", lambda e: self.user_input.insert(tk.INSERT, "\n"))
+        #prefill the prompt in the background while the user types
+        self._prefill_after_id = None
+        self._prefilled_text = None
+        self.user_input.bind("<KeyRelease>", self._schedule_prefill)
 
 
         button_send_stop = tk.Frame(input_frame)
@@ -101,36 +155,92 @@ class ChatApp:
         self.abort_search_button = tk.Button(button_panel, text="Abort Deep Search", command=self.abort_search_action, bg="#8B0000", fg="white", state=tk.DISABLED)
         self.abort_search_button.pack(side=tk.LEFT, padx=2)
 
+        self.local_first_var = tk.BooleanVar(value=CONFIG.get("knowledge", {}).get("local_first", False))
+        self.local_first_check = tk.Checkbutton(button_panel, text="Search local first", variable=self.local_first_var)
+        self.local_first_check.pack(side=tk.LEFT, padx=2)
+
         self.save_clear_button = tk.Button(button_panel, text="Save & Clear Chat", command=self.save_and_clear_action)
         self.save_clear_button.pack(side=tk.RIGHT, padx=2)
 
+        #earlier chats from the journal (see chat_journal.py)
+        if self.model_handler.journal is not None:
+            self.resume_button = tk.Button(button_panel, text="Resume Chat", command=self.resume_chat_action)
+            self.resume_button.pack(side=tk.RIGHT, padx=2)
+
     def setup_initial_state(self):
-        self.chat_box.config(state=tk.NORMAL)
-        if self.model_handler.model:
-            self.chat_box.insert(tk.END, CONFIG["initial_message"] + "\n")
-        else:
-            self.chat_box.insert(tk.END, CONFIG["model_loading_message"] + "\n"
-                                      "If loading fails, chat and deep search will not work.\n")
-        self.chat_box.config(state=tk.DISABLED)
+        self._insert_chat(CONFIG["model_loading_message"] + "\n"
+                          "If loading fails, chat and deep search will not work.\n")
         self.chat_box.see(tk.END)
 
-        if not self.model_handler.model:
-            self.send_button.config(state=tk.DISABLED)
-            self.search_button.config(state=tk.DISABLED)
+        #enabled once the model has loaded
+        self.send_button.config(state=tk.DISABLED)
+        self.search_button.config(state=tk.DISABLED)
 
         #for enabling deep search button if previous results exists
-        if os.path.exists(CONFIG["search_result_dir"]) and any(
-                f.startswith("search_attempt_") for f in os.listdir(CONFIG["search_result_dir"])
-        ):
+        if get_store().latest_attempt_id() is not None:
             self.deep_search_button.config(state=tk.NORMAL)
 
+    def _load_model_in_background(self):
+        with PROFILER.timed("load model"):
+            loaded = self.model_handler.load_model_threaded()
+        self._ui_call(self._on_model_loaded, loaded)
+
+    def _on_model_loaded(self, loaded):
+        self.model_ready = loaded
+        #the model finishes loading after the first paint, so the report is written again with it
+        self._save_startup_report()
+        if loaded:
+            self._insert_chat(CONFIG["initial_message"] + "\n")
+            self._note_unfinished_deep_search()
+            self.send_button.config(state=tk.NORMAL)
+            self.search_button.config(state=tk.NORMAL)
+        else:
+            self._insert_chat("Model could not be loaded. Check the model folder and app.log.\n")
+        self.chat_box.see(tk.END)
+
+    def _note_unfinished_deep_search(self):
+        #a deep search cut short by closing the app (or a crash) picks up where it stopped
+        store = get_store()
+        attempt_id = store.latest_attempt_id()
+        run = store.get_deep_search(attempt_id) if attempt_id is not None else None
+        if run is None or run["stage"] == "done":
+            return
+        self._insert_chat(f"Deep search of '{store.get_attempt(attempt_id)['query']}' was interrupted "
+                          f"({run['chunks_done']}/{len(run['selection'])} chunks summarized, "
+                          f"{run['answers_done']} answers). Press Deep Search to continue it.\n")
+
+    def _on_first_map(self, event):
+        #first <Map> of the root window; after_idle runs once it has been drawn
+        if event.widget is not self.root:
+            return
+        self.root.unbind("<Map>")
+        self.root.after_idle(self._record_first_paint)
+
+    def _record_first_paint(self):
+        PROFILER.mark("first window paint")
+        self.time_to_window_ms = PROFILER.elapsed_ms()
+        budget = CONFIG.get("startup", {}).get("time_to_window_budget_ms", 1500)
+        self._save_startup_report()
+        if self.time_to_window_ms > budget:
+            logging.warning(f"Time to window {self.time_to_window_ms:.0f} ms is over the {budget} ms budget")
+        else:
+            logging.info(f"Time to window {self.time_to_window_ms:.0f} ms (budget {budget} ms)")
+
+    def _save_startup_report(self):
+        #written at first paint and again once the model has loaded, whichever comes last has everything
+        report = PROFILER.report()
+        report["budget_ms"] = CONFIG.get("startup", {}).get("time_to_window_budget_ms", 1500)
+        if hasattr(self, "time_to_window_ms"):
+            report["time_to_window_ms"] = round(self.time_to_window_ms, 1)
+        save_json_safe(report, CONFIG.get("startup", {}).get("report_file", "startup_report.json"))
+
     def add_hyperlink(self, text, url):
         def click_link(event):
             import webbrowser
             webbrowser.open(url)
         tag_name = f"link_{url.replace('.', '_').replace('/', '_').replace(':', '_')}"
         self.chat_box.tag_configure(tag_name, foreground="blue", underline=True)
-        self.chat_box.insert(tk.END, text, tag_name)
+        self._insert_chat(text, tag_name)
         self.chat_box.tag_bind(tag_name, "<Button-1>", click_link)
 
     def send_message(self, event=None):
@@ -138,10 +248,14 @@ class ChatApp:
         if not user_text:
             return "break"
 
-        self._update_chat_display(f"You: {user_text}\n", enable=False)
+        self._update_chat_display(f"You: {user_text}\n")
         self.reset_input_field()
+        if self._prefill_after_id is not None:
+            self.root.after_cancel(self._prefill_after_id)
+            self._prefill_after_id = None
+        self._prefilled_text = None
 
-        if not self.model_handler.model:
+        if not self.model_handler.is_loaded():
             self._update_chat_display(CONFIG["model_not_loaded_message"] + "\n")
             return
 
@@ -149,25 +263,46 @@ class ChatApp:
         self.send_button.config(state=tk.DISABLED)
         self.stop_button.config(state=tk.NORMAL)
 
-        threading.Thread(target=self.start_streaming, args=(user_text,), daemon=True).start()
+        threading.Thread(target=self.start_streaming, args=(user_text, self.local_first_var.get()), daemon=True).start()
         return "break"
 
-    def start_streaming(self, user_text):
-        def update_gui(chunk):
-            self.chat_box.config(state=tk.NORMAL)
-            self.chat_box.insert(tk.END, chunk)
-            self.chat_box.config(state=tk.DISABLED)
-            self.chat_box.see(tk.END)
+    def start_streaming(self, user_text, local_first=False):
+        #tokens are queued and coalesced into one insert per frame
+        update_gui = self._update_chat_display
 
         try:
-            self.model_handler.get_response(user_text, update_gui)
+            context = None
+            if local_first:
+                knowledge_config = CONFIG.get("knowledge", {})
+                context = self.knowledge.build_context(user_text,
+                                                       max_tokens=knowledge_config.get("context_tokens", 800),
+                                                       limit=knowledge_config.get("max_results", 5))
+            self.model_handler.get_response(user_text, update_gui, context=context)
         except Exception as e:
             logging.error(f"Error during streaming: {e}")
             self._update_chat_display(f"\n[Error during streaming setup: {e}]\n")
         finally:
             self._update_chat_display("\n")
-            self.send_button.config(state=tk.NORMAL)
-            self.stop_button.config(state=tk.DISABLED)
+            self._ui_call(self.send_button.config, state=tk.NORMAL)
+            self._ui_call(self.stop_button.config, state=tk.DISABLED)
+
+    def _schedule_prefill(self, event=None):
+        #debounced: only a pause in typing starts a prefill
+        prefill_config = CONFIG.get("prefill", {})
+        if not prefill_config.get("enabled", False) or not self.model_ready:
+            return
+        if self._prefill_after_id is not None:
+            self.root.after_cancel(self._prefill_after_id)
+        self._prefill_after_id = self.root.after(prefill_config.get("debounce_ms", 300), self._start_prefill)
+
+    def _start_prefill(self):
+        self._prefill_after_id = None
+        text = self.user_input.get("1.0", END).strip()
+        #local-first answers add retrieved context, so their prompt is not known yet
+        if not text or text == self._prefilled_text or self.local_first_var.get():
+            return
+        self._prefilled_text = text
+        threading.Thread(target=self.model_handler.prefill_draft, args=(text,), daemon=True).start()
 
     def stop_action(self):
         self._update_chat_display("[Stopping model response...]\n")
@@ -179,30 +314,88 @@ class ChatApp:
         self.user_input.focus_set()
 
     def save_and_clear_action(self):
-        chat_content = self.chat_box.get("1.0", tk.END).strip()
+        self._flush_ui_queue()
+        chat_content = self.transcript.text().strip()
         if not chat_content:
             messagebox.showwarning("Empty Chat", "There's no chat to save.")
             return
 
         folder = CONFIG["chat_file_dir"]
         os.makedirs(folder, exist_ok=True)
-        index = 1
-        while os.path.exists(os.path.join(folder, f"chat_history_{index}.txt")):
-            index += 1
-        filename = os.path.join(folder, f"chat_history_{index}.txt")
+        #named after the journal session, so saving a resumed chat again updates its file
+        journal = self.model_handler.journal
+        name = journal.session_id if journal is not None else time.strftime("%Y%m%d-%H%M%S")
+        filename = os.path.join(folder, f"chat_history_{name}.txt")
 
         with open(filename, "w", encoding="utf-8") as file:
             file.write(chat_content)
+        threading.Thread(target=self.knowledge.index_chat_file, args=(filename,), daemon=True).start()
 
+        self.transcript.clear()
+        self.rendered_from = 0
         self.chat_box.config(state=tk.NORMAL)
         self.chat_box.delete("1.0", tk.END)
-        self.chat_box.insert(tk.END, "Chat cleared. Model is ready.\n" if self.model_handler.model else "Chat cleared. Model not loaded.\n")
         self.chat_box.config(state=tk.DISABLED)
+        self._insert_chat("Chat cleared. Model is ready.\n" if self.model_handler.is_loaded() else "Chat cleared. Model not loaded.\n")
 
         self.model_handler.clear_history()
         messagebox.showinfo("Saved", f"Chat saved as {filename}")
         self.reset_input_field()
 
+    def resume_chat_action(self):
+        if self.model_handler.generating_response_lock.locked():
+            messagebox.showwarning("Busy", "Wait for the current reply to finish (or stop it) first.")
+            return
+        sessions = self.model_handler.journal.list_sessions(CONFIG.get("journal", {}).get("list_limit", 50))
+        if not sessions:
+            messagebox.showinfo("Resume Chat", "There are no earlier chats yet.")
+            return
+
+        dialog = tk.Toplevel(self.root)
+        dialog.title("Resume Chat")
+        dialog.transient(self.root)
+        listbox = tk.Listbox(dialog, width=80, height=min(len(sessions), 15))
+        listbox.pack(fill=tk.BOTH, expand=True, padx=10, pady=(10, 0))
+        for row in sessions:
+            updated = time.strftime("%Y-%m-%d %H:%M", time.localtime(row["updated_at"]))
+            listbox.insert(tk.END, f"{updated}  {row['title'] or '(no title)'}  ({row['turns']} messages)")
+        listbox.selection_set(0)
+
+        def resume(event=None):
+            selected = listbox.curselection()
+            if selected:
+                dialog.destroy()
+                threading.Thread(target=self._resume_chat, args=(sessions[selected[0]]["session_id"],),
+                                 daemon=True).start()
+
+        listbox.bind("<Double-Button-1>", resume)
+        tk.Button(dialog, text="Resume", command=resume, width=10).pack(pady=10)
+
+    def _resume_chat(self, session_id):
+        #waits for the model lock, so it runs off the Tk thread
+        start = time.perf_counter()
+        messages = self.model_handler.resume_session(session_id)
+        if messages is None:
+            self._ui_call(messagebox.showerror, "Resume Chat", "That chat's journal file is missing.")
+            return
+        self._ui_call(self._show_resumed_chat, messages, start)
+
+    def _show_resumed_chat(self, messages, start):
+        self._flush_ui_queue()
+        self.transcript.clear()
+        self.rendered_from = 0
+        self.chat_box.config(state=tk.NORMAL)
+        self.chat_box.delete("1.0", tk.END)
+        self.chat_box.config(state=tk.DISABLED)
+        for message in messages:
+            speaker = "You" if message["role"] == "user" else "Assistant"
+            self._insert_chat(f"{speaker}: {message['content']}\n")
+        self._insert_chat(f"Resumed chat ({len(messages)} messages).\n")
+        self._prefilled_text = None
+        self.chat_box.see(tk.END)
+        logging.info(f"Chat resumed and shown in {(time.perf_counter() - start) * 1000:.0f} ms")
+        self.reset_input_field()
+
     def search_action(self):
         user_query = self.user_input.get("1.0", END).strip()
         if not user_query:
@@ -213,56 +406,62 @@ class ChatApp:
         self._update_chat_display("Assistant: Starting web search... This may take a few moments.\n")
         self.reset_input_field()
 
-        threading.Thread(target=self.run_search_in_background, args=(user_query,), daemon=True).start()
+        threading.Thread(target=self.run_search_in_background, args=(user_query, self.local_first_var.get()), daemon=True).start()
 
-    def run_search_in_background(self, query):
+    def run_search_in_background(self, query, local_first=False):
         try:
-            self.search_button.config(state=tk.DISABLED)
-            result_folder = start_web_search(query)
-            self.display_search_results(result_folder)
-            self.deep_search_button.config(state=tk.NORMAL)
+            self._ui_call(self.search_button.config, state=tk.DISABLED)
+            if local_first and self.display_local_results(query):
+                return
+            attempt_id = lazy_import("search").start_web_search(query)
+            self.last_search_query = query
+            self._ui_call(self.display_search_results, attempt_id)
+            self._ui_call(self.deep_search_button.config, state=tk.NORMAL)
         except Exception as e:
             logging.error(f"Search error: {e}")
             self._update_chat_display(f"Assistant: An error occurred during web search: {str(e)}\n")
         finally:
-            self.search_button.config(state=tk.NORMAL)
-
-    def display_search_results(self, result_folder):
-        urls_file = os.path.join(result_folder, "urls_n_headlines.txt")
-        if not os.path.exists(urls_file) or os.path.getsize(urls_file) == 0:
-            self._update_chat_display("Assistant: No search results (URLs and headlines) found to display.\n")
+            self._ui_call(self.search_button.config, state=tk.NORMAL)
+
+    def display_local_results(self, query):
+        #answers the search from the local index; False means go to the web
+        knowledge_config = CONFIG.get("knowledge", {})
+        hits = self.knowledge.search(query, limit=knowledge_config.get("max_results", 5))
+        if len(hits) < knowledge_config.get("min_hits", 2):
+            self._update_chat_display("Assistant: Not enough local knowledge, searching the web...\n")
+            return False
+
+        self._update_chat_display("Assistant: Found in local knowledge (untick 'Search local first' to search the web):\n")
+        for hit in hits:
+            self._update_chat_display(f"- [{hit['kind']}] {hit['title']}: {hit['snippet']}\n")
+        self._update_chat_display("\n")
+        return True
+
+    def display_search_results(self, attempt_id):
+        #runs on the Tk thread (queued with _ui_call)
+        links = get_store().get_links(attempt_id)
+        if not links:
+            self._insert_chat("Assistant: No search results (URLs and headlines) found to display.\n")
             return
 
-        self._update_chat_display("Assistant: Search results (click to open):\n")
+        self._insert_chat("Assistant: Search results (click to open):\n")
         try:
-            with open(urls_file, "r", encoding="utf-8") as f:
-                lines = f.readlines()
-
-            i = 0
-            while i < len(lines):
-                title = lines[i].strip()
-                i += 1
-                if i < len(lines):
-                    url = lines[i].strip()
-                    i += 1
-                    if i < len(lines) and lines[i].strip() == "":
-                        i += 1
-                    if title and url.startswith(("http://", "https://")): 
-                        self.chat_box.insert(tk.END, f"- {title}: ")
-                        self.add_hyperlink(url + "\n", url)
-                    elif title:
-                        self.chat_box.insert(tk.END, f"- {title}\n")
+            for link in links:
+                title = link["title"].strip()
+                url = link["url"].strip()
+                if title and url.startswith(("http://", "https://")):
+                    self._insert_chat(f"- {title}: ")
+                    self.add_hyperlink(url + "\n", url)
                 elif title:
-                    self.chat_box.insert(tk.END, f"- {title}\n")
-            self.chat_box.insert(tk.END, "\n")
+                    self._insert_chat(f"- {title}\n")
+            self._insert_chat("\n")
         except Exception as e:
             logging.error(f"Display error: {e}")
-            self._update_chat_display(f"Assistant: Error reading or displaying search results: {str(e)}\n")
-        self.chat_box.config(state=tk.DISABLED)
+            self._insert_chat(f"Assistant: Error reading or displaying search results: {str(e)}\n")
         self.chat_box.see(tk.END)
 
     def deep_search_action(self):
-        if not self.model_handler.model:
+        if not self.model_handler.is_loaded():
             messagebox.showerror("Model Error", "The language model is not loaded. Cannot perform deep search.")
             return
 
@@ -282,41 +481,56 @@ class ChatApp:
         global deep_search_active
         if deep_search_active:
             deep_search_stop_flag.set()
-            self._update_chat_display("Deep search abort signal sent. May take a moment to halt.\n")
+            self._update_chat_display("Aborting deep search...\n")
         else:
             self._update_chat_display("No active deep search to abort.\n")
 
     def run_deep_search(self):
         global deep_search_active
         try:
+            store = get_store()
+            attempt_id = store.latest_attempt_id()
+            run = store.get_deep_search(attempt_id) if attempt_id is not None else None
+            if run is not None and run["stage"] != "done":
+                self._update_chat_display(f"Resuming: {run['chunks_done']}/{len(run['selection'])} chunks already "
+                                          f"summarized, {run['answers_done']} answers done.\n")
             self._update_chat_display("Summarizing web results...\n")
-            summary_path = summarize_search_attempt(self.model_handler)
+            deep_search = lazy_import("deep_search")
+            attempt_id = deep_search.summarize_search_attempt(self.model_handler, query=self.last_search_query,
+                                                              cancel_event=deep_search_stop_flag,
+                                                              progress=self._update_chat_display)
             if deep_search_stop_flag.is_set():
-                self._update_chat_display("Deep search summarization interrupted by user.\n")
+                saved = len(store.get_summaries(attempt_id))
+                self._update_chat_display(f"Deep search summarization interrupted by user. "
+                                          f"{saved} chunk summaries were kept for attempt {attempt_id}; "
+                                          f"Deep Search continues from there.\n")
                 return
 
-            if not summary_path or not os.listdir(summary_path):
+            if not store.get_summaries(attempt_id):
                 self._update_chat_display("Deep Search: No summaries were generated from web results. Cannot proceed.\n")
                 return
 
-            self._update_chat_display(f"Summaries saved. Path: {os.path.relpath(summary_path)}\n")
+            self._update_chat_display(f"Summaries saved for search attempt {attempt_id}.\n")
             self._update_chat_display("Generating final answers from summaries...\n")
 
-            final_answer_text = answer_from_summaries(self.model_handler)
+            final_answer_text = deep_search.answer_from_summaries(self.model_handler, attempt_id=attempt_id,
+                                                                  cancel_event=deep_search_stop_flag,
+                                                                  progress=self._update_chat_display)
             if deep_search_stop_flag.is_set():
-                self._update_chat_display("Deep search was interrupted before completion.\n")
+                self._update_chat_display("Deep search was interrupted before completion. "
+                                          "Answers finished so far are shown above.\n")
                 return
 
             if not final_answer_text.strip():
                 self._update_chat_display("Deep Search: No final answers could be generated from the summaries.\n")
                 return
 
-            self._update_chat_display("Deep Search Final Answers:\n")
-            self._update_chat_display(final_answer_text + "\n")
-            self.model_handler.base_history.append({
-                "role": "assistant",
-                "content": f"[Deep Search Summary Note]: {final_answer_text[:1000]}..."
-            })
+            #stored answers and new ones were both shown above through progress
+            self._update_chat_display("Deep Search complete.\n")
+            governor = lazy_import("memory_governor").get_memory_governor()
+            peaks = ", ".join(f"{label} {report['peak_mb']:.0f} MB" for label, report in governor.reports.items())
+            self._update_chat_display(f"Peak memory: {peaks} (budget {governor.budget_mb} MB).\n")
+            self.model_handler.add_to_history("assistant", f"[Deep Search Summary Note]: {final_answer_text[:1000]}...")
             self._update_chat_display("Deep search findings noted in conversation context.\n")
 
         except FileNotFoundError as e:
@@ -326,15 +540,106 @@ class ChatApp:
             self._update_chat_display(f"Unexpected error during deep search: {str(e)}\n")
         finally:
             deep_search_active = False
-            self.deep_search_button.config(state=tk.NORMAL if os.path.exists(CONFIG["search_result_dir"]) and any(
-                os.listdir(CONFIG["search_result_dir"])) else tk.DISABLED)
-            self.abort_search_button.config(state=tk.DISABLED)
+            #trace file is rewritten after every deep search (no-op unless tracing is enabled)
+            export_chrome_trace()
+            self._ui_call(self.deep_search_button.config,
+                          state=tk.NORMAL if get_store().latest_attempt_id() is not None else tk.DISABLED)
+            self._ui_call(self.abort_search_button.config, state=tk.DISABLED)
+
+    def _update_chat_display(self, message):
+        #safe from any thread, text shows up on the next frame
+        self._ui_queue.put(message)
+
+    def _ui_call(self, func, *args, **kwargs):
+        #runs a widget operation on the Tk thread, in order with queued text
+        self._ui_queue.put((func, args, kwargs))
+
+    def _insert_chat(self, text, *tags):
+        #Tk thread only
+        closed = self.transcript.append(text, tags[0] if tags else None)
+        self.chat_box.config(state=tk.NORMAL)
+        self.chat_box.insert(tk.END, text, *tags)
+        self.chat_box.config(state=tk.DISABLED)
+        if closed:
+            self._trim_chat_window()
 
-    def _update_chat_display(self, message, enable=True):
+    def _trim_chat_window(self):
+        #drops the oldest rendered messages so the widget stays a fixed size
+        rendered = len(self.transcript) - self.rendered_from
+        if rendered <= self.transcript_window:
+            return
+        #don't yank text away while the user is reading older messages
+        if self.chat_box.yview()[1] < 1.0:
+            return
+        drop = rendered - self.transcript_window
+        lines = self.transcript.line_count(self.rendered_from, self.rendered_from + drop)
         self.chat_box.config(state=tk.NORMAL)
-        self.chat_box.insert(tk.END, message)
-        self.chat_box.config(state=tk.DISABLED if not enable else tk.NORMAL)
-        self.chat_box.see(tk.END)
+        self.chat_box.delete("1.0", f"{lines + 1}.0")
+        self.chat_box.config(state=tk.DISABLED)
+        self.rendered_from += drop
+
+    def _on_chat_scroll(self, first, last):
+        self.chat_box.vbar.set(first, last)
+        if float(first) <= 0.0 and self.rendered_from > 0:
+            self.root.after_idle(self._load_older_messages)
+
+    def _load_older_messages(self):
+        #renders the previous batch of messages above the current view
+        if self.rendered_from <= 0 or float(self.chat_box.yview()[0]) > 0.0:
+            return
+        start = max(0, self.rendered_from - self.transcript_load_batch)
+        self.chat_box.config(state=tk.NORMAL)
+        for i in range(self.rendered_from - 1, start - 1, -1):
+            for text, tag in reversed(self.transcript.segments(i)):
+                self.chat_box.insert("1.0", text, *((tag,) if tag else ()))
+        self.chat_box.config(state=tk.DISABLED)
+        lines = self.transcript.line_count(start, self.rendered_from)
+        self.rendered_from = start
+        #keep the line the user was looking at in place
+        self.chat_box.yview(f"{lines + 1}.0")
+
+    def _flush_ui_queue(self):
+        #applies everything queued so far, consecutive text as a single insert
+        pending = []
+        wrote = False
+        while True:
+            try:
+                item = self._ui_queue.get_nowait()
+            except queue.Empty:
+                break
+            if isinstance(item, str):
+                pending.append(item)
+                continue
+            if pending:
+                self._insert_chat("".join(pending))
+                pending = []
+                wrote = True
+            func, args, kwargs = item
+            try:
+                func(*args, **kwargs)
+            except Exception as e:
+                logging.error(f"Error applying UI update {func}: {e}")
+        if pending:
+            self._insert_chat("".join(pending))
+            wrote = True
+        if wrote:
+            self.chat_box.see(tk.END)
+
+    def _drain_ui_queue(self):
+        self._flush_ui_queue()
+        self.root.after(self.frame_interval_ms, self._drain_ui_queue)
+
+    def _probe_event_loop_lag(self, expected=None):
+        #measures how late the Tk loop wakes up; big delays mean the UI froze
+        now = time.perf_counter()
+        if expected is not None:
+            lag_ms = max(0.0, (now - expected) * 1000)
+            self.max_ui_lag_ms = max(self.max_ui_lag_ms, lag_ms)
+            if lag_ms > self.stall_threshold_ms:
+                self.ui_stalls += 1
+                logging.warning(f"UI stall: event loop {lag_ms:.0f} ms late (stalls so far: {self.ui_stalls})")
+        interval_ms = CONFIG.get("ui", {}).get("lag_probe_interval_ms", 100)
+        self.root.after(interval_ms, self._probe_event_loop_lag, now + interval_ms / 1000)
 
     def handle_double_click(self, event):
         index = self.chat_box.index(f"@{event.x},{event.y}")
@@ -345,6 +650,23 @@ class ChatApp:
 
 
 if __name__ == "__main__":
-    root = tk.Tk()
+    #--profile-startup: exit right after the first paint; the exit code says
+    #whether time-to-window stayed within the budget (used by benchmarks.py)
+    profile_startup = "--profile-startup" in sys.argv
+    #model worker processes (workers.py) re-enter a frozen exe through this
+    import multiprocessing
+    multiprocessing.freeze_support()
+    with PROFILER.timed("create Tk root"):
+        root = tk.Tk()
     app = ChatApp(root)
+    if profile_startup:
+        def exit_after_paint():
+            if not hasattr(app, "time_to_window_ms"):
+                root.after(10, exit_after_paint)
+                return
+            budget = CONFIG.get("startup", {}).get("time_to_window_budget_ms", 1500)
+            print(f"time_to_window_ms={app.time_to_window_ms:.1f}")
+            root.destroy()
+            os._exit(0 if app.time_to_window_ms <= budget else 1)
+        root.after(10, exit_after_paint)
     root.mainloop()
\ No newline at end of file
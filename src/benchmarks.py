@@ -0,0 +1,519 @@
+import os
+import sys
+import time
+import argparse
+import logging
+import statistics
+import subprocess
+
+#local imports
+from utils import split_into_chunks, setup_logging
+
+setup_logging("benchmarks.log")
+
+def deep_search_prompts(limit=4):
+    #summary prompts built from the latest stored search attempt
+    from store import get_store
+    from deep_search import build_summary_prompt
+
+    store = get_store()
+    attempt_id = store.latest_attempt_id()
+    if attempt_id is None:
+        raise FileNotFoundError("No search attempts in the store to benchmark with")
+    prompts = []
+    for page in store.get_pages(attempt_id):
+        for chunk in split_into_chunks(page["content"]):
+            prompts.append(build_summary_prompt(page["title"], page["url"], chunk))
+            if len(prompts) >= limit:
+                return prompts
+    return prompts
+
+
+def bench_speculative(model_handler, prompts, max_tokens_gen=200):
+    """
+    Tokens/s of greedy decoding with and without prompt-lookup drafts on the
+    same prompts, plus whether both produced identical text.
+    """
+    results = {}
+    outputs = {}
+    for mode in (False, True):
+        model_handler.speculative_stats.update(calls=0, tokens=0, drafted=0, accepted=0, forward_passes=0, seconds=0.0)
+        tokens = 0
+        start = time.perf_counter()
+        outputs[mode] = []
+        for prompt in prompts:
+            text = model_handler.generate_full_response(prompt, max_tokens_gen=max_tokens_gen, speculative=mode,
+                                                        do_sample=False)
+            outputs[mode].append(text)
+            tokens += len(model_handler.tokenizer.encode(text))
+        elapsed = time.perf_counter() - start
+        results["speculative" if mode else "greedy"] = tokens / elapsed if elapsed else 0.0
+
+    stats = model_handler.speculative_stats
+    print(f"greedy:      {results['greedy']:.2f} tok/s")
+    print(f"speculative: {results['speculative']:.2f} tok/s "
+          f"(acceptance {100 * stats['accepted'] / stats['drafted'] if stats['drafted'] else 0:.1f}%, "
+          f"{stats['tokens'] / stats['forward_passes'] if stats['forward_passes'] else 0:.2f} tokens/pass)")
+    print(f"identical output: {outputs[False] == outputs[True]}")
+    return results
+
+
+def bench_workers(prompts, num_workers, threads_per_worker=None, max_tokens_gen=200):
+    """
+    Aggregate tokens/s of the same prompts on one process using all cores
+    vs. a pool of model worker processes with the cores split between them.
+    """
+    from connect import ModelHandler
+    from workers import ModelWorkerPool, can_partition_threads
+
+    if not can_partition_threads():
+        print("This onnxruntime-genai can't limit threads per worker (no Config.overlay); the app runs 1 worker here "
+              "and a pool would only oversubscribe the CPU")
+        return {}
+    results = {}
+    handler = ModelHandler()
+    start = time.perf_counter()
+    outputs = [handler.generate_full_response(p, max_tokens_gen=max_tokens_gen) for p in prompts]
+    elapsed = time.perf_counter() - start
+    tokens = sum(len(handler.tokenizer.encode(text)) for text in outputs)
+    results["single"] = tokens / elapsed if elapsed else 0.0
+    print(f"single process, all cores: {tokens} tokens in {elapsed:.1f} s -> {results['single']:.2f} tok/s")
+
+    pool = ModelWorkerPool(num_workers, threads_per_worker)
+    try:
+        #warm up so model loading isn't counted
+        list(pool.generate_all(prompts[:1] * num_workers, max_tokens_gen=1))
+        start = time.perf_counter()
+        outputs = list(pool.generate_all(prompts, max_tokens_gen=max_tokens_gen))
+        elapsed = time.perf_counter() - start
+    finally:
+        pool.shutdown()
+    tokens = sum(len(handler.tokenizer.encode(text)) for text in outputs)
+    results["pool"] = tokens / elapsed if elapsed else 0.0
+    print(f"{num_workers} workers x {pool.threads_per_worker} threads: {tokens} tokens in {elapsed:.1f} s "
+          f"-> {results['pool']:.2f} tok/s ({results['pool'] / results['single'] if results['single'] else 0:.2f}x)")
+    return results
+
+
+TUNE_PROMPT = ("Explain how a web search engine finds, ranks and returns pages for a query, "
+               "covering crawling, indexing and ranking in a few paragraphs.")
+
+def _measure_generation(loaded, prompt, max_new_tokens):
+    #time to first token and decode tokens/s of one greedy generation
+    import onnxruntime_genai as og
+    from connect import _start_generator, _advance
+
+    input_tokens = loaded.tokenizer.encode(prompt)
+    params = og.GeneratorParams(loaded.model)
+    params.set_search_options(max_length=len(input_tokens) + max_new_tokens, do_sample=False)
+
+    start = time.perf_counter()
+    generator = _start_generator(loaded.model, params, input_tokens)
+    _advance(generator)
+    first = time.perf_counter()
+    tokens = 1
+    while not generator.is_done() and tokens < max_new_tokens:
+        _advance(generator)
+        tokens += 1
+    end = time.perf_counter()
+    return first - start, (tokens - 1) / (end - first) if end > first else 0.0
+
+def tune_runtime(max_tokens_gen=64, threads=None):
+    """
+    Benchmarks a grid of session settings (intra-op threads, thread spinning,
+    CPU memory arena) with a fixed prompt and saves the fastest one as the
+    runtime profile for this machine, which connect.py then loads.
+
+    Return:
+        dict: The saved profile, None if this runtime can't apply session settings
+    """
+    from utils import load_config, save_json_safe
+    from connect import ModelRegistry, _configured_variants, machine_id, session_options_supported
+    from memory_governor import get_memory_governor
+
+    if not session_options_supported():
+        #every candidate would run with the same default session, so a "fastest" profile would be noise
+        print("This onnxruntime-genai has no Config.overlay, so session settings can't be applied; "
+              "nothing to tune and no profile written")
+        return None
+
+    config = load_config()
+    cores = os.cpu_count() or 1
+    thread_counts = threads or sorted({1, max(1, cores // 2), cores})
+    prompt = config["prompt_template"].format(role="user", content=TUNE_PROMPT) + config["assistant_start_token"]
+
+    results = []
+    for intra in thread_counts:
+        for spinning in (True, False):
+            for arena in (True, False):
+                settings = {"intra_op_num_threads": intra, "allow_spinning": spinning, "enable_cpu_mem_arena": arena}
+                registry = ModelRegistry(_configured_variants(), config.get("model_routing", {}),
+                                         get_memory_governor())
+                registry.session_overrides = settings
+                try:
+                    loaded = registry.get("chat")
+                    _measure_generation(loaded, prompt, 4)
+                    ttft, tps = _measure_generation(loaded, prompt, max_tokens_gen)
+                finally:
+                    registry.evict_all()
+                results.append({"settings": settings, "ttft_ms": round(ttft * 1000, 1), "decode_tok_s": round(tps, 2)})
+                print(f"threads={intra:<3} spinning={spinning!s:<5} arena={arena!s:<5} "
+                      f"TTFT {ttft * 1000:8.1f} ms  decode {tps:6.2f} tok/s")
+
+    best = max(results, key=lambda r: (r["decode_tok_s"], -r["ttft_ms"]))
+    profile = {"machine": machine_id(), "settings": best["settings"], "results": results}
+    profile_file = config.get("runtime", {}).get("profile_file", "runtime_profile.json")
+    save_json_safe(profile, profile_file)
+    print(f"fastest: {best['settings']} -> saved to {profile_file}")
+    return profile
+
+
+def bench_startup(runs=5, budget_ms=None):
+    """
+    Cold-starts GUI.py with --profile-startup several times and checks the
+    median time-to-window against the configured budget.
+
+    Return:
+        bool: True if the median is within budget
+    """
+    from utils import load_config
+
+    if budget_ms is None:
+        budget_ms = load_config().get("startup", {}).get("time_to_window_budget_ms", 1500)
+    gui = os.path.join(os.path.dirname(os.path.abspath(__file__)), "GUI.py")
+    timings = []
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, gui, "--profile-startup"], capture_output=True, text=True)
+        for line in result.stdout.splitlines():
+            if line.startswith("time_to_window_ms="):
+                timings.append(float(line.split("=", 1)[1]))
+        if result.returncode not in (0, 1):
+            print(f"GUI.py exited with {result.returncode}: {result.stderr.strip()[-500:]}")
+    if not timings:
+        print("No startup timings collected")
+        return False
+
+    median = statistics.median(timings)
+    ok = median <= budget_ms
+    print(f"time to window: median {median:.0f} ms, min {min(timings):.0f} ms, max {max(timings):.0f} ms "
+          f"over {len(timings)} runs (budget {budget_ms} ms) -> {'PASS' if ok else 'FAIL'}")
+    return ok
+
+
+PREFILL_MESSAGES = {
+    "short": "What is the capital of France?",
+    "medium": ("I am planning a week-long trip to Japan in the spring. Which cities would you suggest "
+               "for a first visit, and how many days should I spend in each of them?"),
+    "long": ("I have a small Python script that reads a large CSV file with sales records, groups them by "
+             "region and month, and writes a summary report. It works, but it takes several minutes on a "
+             "file with a few million rows and uses a lot of memory. I am reading the whole file with the "
+             "csv module into a list of dictionaries and then looping over it with nested dictionaries for "
+             "the grouping. What are the most effective ways to make this faster and lighter without "
+             "rewriting everything, and when would it be worth switching to something like pandas?"),
+}
+
+def bench_prefill(runs=3):
+    """
+    Time to first token of a chat turn for short, medium and long messages,
+    sent cold and sent after the typed text was prefilled in the background.
+    """
+    from connect import ModelHandler, CONFIG, _prefill_supported
+
+    if not _prefill_supported():
+        print("This onnxruntime-genai has no Generator.append_tokens; prefill is not available")
+        return {}
+    CONFIG.setdefault("prefill", {})["enabled"] = True
+    CONFIG.setdefault("history_compression", {})["enabled"] = False
+    handler = ModelHandler()
+
+    def ttft(message, prefill):
+        handler.clear_history()
+        if prefill:
+            handler.prefill_draft(message)
+        start = time.perf_counter()
+        first = []
+        def on_text(text):
+            #only the first token matters here
+            if not first:
+                first.append(time.perf_counter() - start)
+                handler.stop_response()
+        handler.get_response(message, on_text)
+        return first[0] * 1000 if first else float("nan")
+
+    results = {}
+    for label, message in PREFILL_MESSAGES.items():
+        cold = statistics.median(ttft(message, False) for _ in range(runs))
+        warm = statistics.median(ttft(message, True) for _ in range(runs))
+        results[label] = {"cold_ms": cold, "prefilled_ms": warm}
+        print(f"{label:>6} ({len(handler.tokenizer.encode(message))} tokens): "
+              f"TTFT {cold:.0f} ms cold, {warm:.0f} ms prefilled")
+    stats = handler.prefill_stats
+    print(f"reused {stats['reused_tokens']} of {stats['prompt_tokens']} prompt tokens "
+          f"in {stats['reused_turns']}/{stats['turns']} turns")
+    return results
+
+
+def bench_memory(max_tokens=200, mode=None):
+    """
+    Peak RSS of generation with and without memory_lean (bucketed max_length,
+    shared KV buffers), on the PREFILL_MESSAGES prompts. Each mode runs in a
+    fresh process, since RSS never shrinks back within one.
+    mode: "lean" or "default" runs just that mode in this process.
+    """
+    if mode is None:
+        results = {}
+        for child_mode in ("default", "lean"):
+            result = subprocess.run([sys.executable, os.path.abspath(__file__), "memory", "--mode", child_mode,
+                                     "--max-tokens", str(max_tokens)], capture_output=True, text=True)
+            for line in result.stdout.splitlines():
+                if line.startswith("peak_rss_mb="):
+                    results[child_mode] = float(line.split("=", 1)[1])
+                elif line.startswith(child_mode):
+                    print(line)
+            if result.returncode != 0:
+                print(f"{child_mode} run exited with {result.returncode}: {result.stderr.strip()[-500:]}")
+        if len(results) == 2:
+            print(f"peak RSS: {results['default']:.0f} MB default, {results['lean']:.0f} MB memory-lean "
+                  f"({results['lean'] - results['default']:+.0f} MB)")
+        return results
+
+    from connect import ModelHandler, CONFIG
+
+    CONFIG.setdefault("memory_lean", {})["enabled"] = mode == "lean"
+    CONFIG.setdefault("generation_cache", {})["enabled"] = False
+    handler = ModelHandler()
+    for message in PREFILL_MESSAGES.values():
+        prompt = (CONFIG["prompt_template"].format(role="user", content=message) + CONFIG["assistant_start_token"])
+        handler.generate_full_response(prompt, max_tokens_gen=max_tokens, speculative=False, task="chat")
+    stats = handler.memory_stats
+    print(f"{mode}: {stats['generations']} generations, last max_length {stats['last_max_length']}, "
+          f"shared KV buffer {handler._share_buffer_supported}, peak {stats['peak_rss_mb']:.0f} MB")
+    print(f"peak_rss_mb={stats['peak_rss_mb']}")
+    return {mode: stats["peak_rss_mb"]}
+
+
+def _span_durations(events, name):
+    #durations in ms of all spans called name, from complete (X) or async begin/end (b/e) events
+    durations = [e["dur"] / 1000 for e in events if e["name"] == name and e["ph"] == "X"]
+    begins = {e["id"]: e["ts"] for e in events if e["name"] == name and e["ph"] == "b"}
+    durations += [(e["ts"] - begins[e["id"]]) / 1000 for e in events
+                  if e["name"] == name and e["ph"] == "e" and e["id"] in begins]
+    return durations
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))] if ordered else 0.0
+
+def bench_search(runs=3, query="offline benchmark query", serp_latency_ms=None, **corpus_options):
+    """
+    Runs the whole web-search pipeline (SERP, fetch, extract, dedup, store)
+    against a local fake web, fully offline, and reports wall time, fetch
+    latency distribution, CPU spent in extraction and peak memory (app plus
+    browsers, as seen by the memory governor). corpus_options are passed to fake_web.build_corpus.
+    serp_latency_ms maps engine name -> results page delay; one stand-in
+    server runs per engine (default: every known engine, 50 ms).
+    """
+    import asyncio
+    import tempfile
+    from contextlib import ExitStack
+    from fake_web import FakeWeb, build_corpus, SERP_PATHS
+    from search_engines import EngineStats
+    from utils import load_config
+    from tracing import TRACER
+    from memory_governor import get_memory_governor
+
+    config = load_config()
+    workdir = tempfile.mkdtemp(prefix="search_bench_")
+    #results go to a throwaway store, never the real one
+    config.setdefault("storage", {})["db_path"] = os.path.join(workdir, "search_store.db")
+    config["storage"]["export_folders"] = False
+    config.setdefault("search", {})["stats_file"] = os.path.join(workdir, "engine_stats.json")
+    serp_latency_ms = serp_latency_ms or {name: 50 for name in SERP_PATHS}
+    from store import get_store
+    get_store.cache_clear()
+    from search import run_web_search
+
+    corpus = build_corpus(**corpus_options)
+    was_tracing = TRACER.enabled
+    TRACER.enabled = True
+    walls, fetches, extract_cpu, peaks, saved = [], [], [], [], []
+    try:
+        with ExitStack() as servers:
+            #the first engine's server also hosts the pages every engine links to
+            webs = {}
+            for name, latency in serp_latency_ms.items():
+                first = next(iter(webs.values()), None)
+                webs[name] = servers.enter_context(FakeWeb(corpus, serp_latency_ms=latency, serp_style=name,
+                                                           page_base_url=first.base_url if first else None))
+            web = next(iter(webs.values()))
+            #only the stand-ins are queried, so nothing leaves the machine; they serve plain
+            #HTML, so no engine needs a browser
+            config["search"]["engines"] = {name: {"enabled": True, "base_url": w.base_url, "render": False}
+                                           for name, w in webs.items()}
+            for _ in range(runs):
+                TRACER.events.clear()
+                start = time.perf_counter()
+                attempt_id = asyncio.run(run_web_search(query))
+                walls.append(time.perf_counter() - start)
+
+                peaks.append(get_memory_governor().reports["web search"]["peak_mb"])
+                fetches += _span_durations(TRACER.events, "fetch")
+                extract_cpu.append(sum(e["args"].get("cpu_ms", 0) for e in TRACER.events
+                                       if e["name"] == "extract" and e["ph"] in ("X", "b")))
+                saved.append(len(get_store().get_pages(attempt_id)))
+    finally:
+        TRACER.enabled = was_tracing
+        TRACER.events.clear()
+
+    js_only = sum(page.js_only for page in corpus)
+    failing = sum(page.fails for page in corpus)
+    print(f"corpus: {len(corpus)} pages ({failing} failing, {js_only} JS-only) at {web.base_url}")
+    print(f"wall time: median {statistics.median(walls):.2f} s, min {min(walls):.2f} s over {runs} runs")
+    print(f"fetch latency: p50 {_percentile(fetches, 50):.0f} ms, p90 {_percentile(fetches, 90):.0f} ms, "
+          f"p99 {_percentile(fetches, 99):.0f} ms, max {max(fetches, default=0):.0f} ms ({len(fetches)} fetches)")
+    print(f"extraction CPU: {statistics.median(extract_cpu):.0f} ms per search")
+    stats = EngineStats(config["search"]["stats_file"])
+    for name in serp_latency_ms:
+        entry = stats.engines.get(name, {})
+        print(f"engine {name}: {serp_latency_ms[name]} ms stand-in, avg {entry.get('latency_ms') or 0:.0f} ms, "
+              f"{entry.get('failures', 0)}/{entry.get('requests', 0)} failed, priority score {stats.score(name):.0f}")
+    governor = get_memory_governor()
+    print(f"peak memory: {max(peaks):.1f} MB (budget {governor.budget_mb} MB), "
+          f"{governor.stats['waits']} backpressure waits, pages saved per search: {statistics.median(saved):.0f}")
+    return {"wall_s": walls, "fetch_ms": fetches, "extract_cpu_ms": extract_cpu, "peak_rss_mb": max(peaks)}
+
+def bench_journal(turns=100, runs=5, words=80):
+    """
+    Save and resume cost of the chat journal for sessions of the given
+    number of messages: time each message append costs the caller, time
+    until a session is on disk, listing time and time to resume it into a
+    ModelHandler. Runs against a throwaway store and journal directory; no
+    model is loaded, so resume is measured without the background prefill.
+    """
+    import random
+    import tempfile
+    from utils import load_config
+
+    config = load_config()
+    workdir = tempfile.mkdtemp(prefix="journal_bench_")
+    config.setdefault("storage", {})["db_path"] = os.path.join(workdir, "search_store.db")
+    config["journal"] = dict(config.get("journal", {}), enabled=True, dir=os.path.join(workdir, "sessions"))
+    config.setdefault("history_compression", {})["enabled"] = False
+    from store import get_store
+    get_store.cache_clear()
+    from connect import ModelHandler
+
+    handler = ModelHandler(load_now=False)
+    journal = handler.journal
+    rng = random.Random(0)
+    vocabulary = "the model answer question memory token cache session resume chat history journal disk".split()
+    appends, flushes, resumes, sizes = [], [], [], []
+    for _ in range(runs):
+        handler.clear_history()
+        session_id = journal.session_id
+        for turn in range(turns):
+            content = " ".join(rng.choices(vocabulary, k=words))
+            start = time.perf_counter()
+            handler.add_to_history("user" if turn % 2 == 0 else "assistant", content)
+            appends.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        journal.flush()
+        flushes.append(time.perf_counter() - start)
+        sizes.append(os.path.getsize(journal.path(session_id)))
+
+        handler.clear_history()
+        start = time.perf_counter()
+        messages = handler.resume_session(session_id)
+        resumes.append(time.perf_counter() - start)
+        assert len(messages) == turns, f"resumed {len(messages)} of {turns} messages"
+
+    start = time.perf_counter()
+    listed = journal.list_sessions()
+    list_ms = (time.perf_counter() - start) * 1000
+    appends_us = [a * 1e6 for a in appends]
+    print(f"{runs} sessions of {turns} messages, ~{words} words each, "
+          f"{statistics.median(sizes) / 1024:.0f} KB journal per session")
+    print(f"save: append p50 {_percentile(appends_us, 50):.0f} us, p99 {_percentile(appends_us, 99):.0f} us "
+          f"(caller side), on disk {statistics.median(flushes) * 1000:.1f} ms after the last message")
+    print(f"list: {len(listed)} sessions in {list_ms:.2f} ms")
+    print(f"resume: median {statistics.median(resumes) * 1000:.1f} ms, max {max(resumes) * 1000:.1f} ms")
+    return {"append_us": appends_us, "flush_ms": [f * 1000 for f in flushes],
+            "resume_ms": [r * 1000 for r in resumes], "list_ms": list_ms}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Performance benchmarks for the chat app")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    spec = sub.add_parser("speculative", help="greedy vs prompt-lookup decoding on deep-search prompts")
+    spec.add_argument("--prompts", type=int, default=4)
+    spec.add_argument("--max-tokens", type=int, default=200)
+
+    workers = sub.add_parser("workers", help="single process vs. model worker pool throughput")
+    workers.add_argument("--prompts", type=int, default=8)
+    workers.add_argument("--workers", type=int, default=2)
+    workers.add_argument("--threads", type=int, default=None, help="threads per worker (default: cores / workers)")
+    workers.add_argument("--max-tokens", type=int, default=200)
+
+    tune = sub.add_parser("tune", help="find the fastest runtime session settings and save them as a profile")
+    tune.add_argument("--max-tokens", type=int, default=64)
+    tune.add_argument("--threads", type=int, nargs="*", default=None, help="intra-op thread counts to try")
+
+    startup = sub.add_parser("startup", help="cold-start time to first window paint against the budget")
+    startup.add_argument("--runs", type=int, default=5)
+    startup.add_argument("--budget-ms", type=int, default=None)
+
+    prefill = sub.add_parser("prefill", help="time to first token with and without prefill while typing")
+    prefill.add_argument("--runs", type=int, default=3)
+
+    memory = sub.add_parser("memory", help="peak RSS of generation with and without memory_lean")
+    memory.add_argument("--max-tokens", type=int, default=200)
+    memory.add_argument("--mode", choices=("default", "lean"), default=None,
+                        help="run one mode in this process (default: both, each in its own process)")
+
+    search = sub.add_parser("search", help="web-search pipeline against a local fake web (offline)")
+    search.add_argument("--runs", type=int, default=3)
+    search.add_argument("--pages", type=int, default=15)
+    search.add_argument("--latency-ms", type=int, default=100)
+    search.add_argument("--jitter-ms", type=int, default=50)
+    search.add_argument("--size-kb", type=int, default=20)
+    search.add_argument("--failure-rate", type=float, default=0.1)
+    search.add_argument("--js-only-rate", type=float, default=0.1)
+    search.add_argument("--bad-domain-rate", type=float, default=0.1)
+    search.add_argument("--seed", type=int, default=0)
+    search.add_argument("--serp-latency", nargs="*", default=None, metavar="ENGINE=MS",
+                        help="stand-in engines and their results page delay, e.g. bing=3000 duckduckgo=80")
+
+    journal = sub.add_parser("journal", help="chat journal save and resume times")
+    journal.add_argument("--turns", type=int, default=100)
+    journal.add_argument("--runs", type=int, default=5)
+    journal.add_argument("--words", type=int, default=80)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "speculative":
+        from connect import ModelHandler
+        handler = ModelHandler()
+        bench_speculative(handler, deep_search_prompts(args.prompts), args.max_tokens)
+    elif args.command == "workers":
+        bench_workers(deep_search_prompts(args.prompts), args.workers, args.threads, args.max_tokens)
+    elif args.command == "tune":
+        tune_runtime(args.max_tokens, args.threads)
+    elif args.command == "startup":
+        return 0 if bench_startup(args.runs, args.budget_ms) else 1
+    elif args.command == "prefill":
+        bench_prefill(args.runs)
+    elif args.command == "memory":
+        bench_memory(args.max_tokens, args.mode)
+    elif args.command == "search":
+        serp_latency = dict((name, int(ms)) for name, ms in (item.split("=", 1) for item in args.serp_latency or []))
+        bench_search(args.runs, serp_latency_ms=serp_latency or None, pages=args.pages, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                     size_kb=args.size_kb, failure_rate=args.failure_rate, js_only_rate=args.js_only_rate,
+                     bad_domain_rate=args.bad_domain_rate, seed=args.seed)
+    elif args.command == "journal":
+        bench_journal(args.turns, args.runs, args.words)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,244 @@
+import os
+import json
+import time
+import uuid
+import queue
+import atexit
+import logging
+import threading
+
+#local imports
+from utils import load_config, setup_logging, ensure_dir_exists
+
+CONFIG = load_config()
+
+setup_logging()
+
+#session index, next to the other store tables
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS chat_sessions (
+    session_id TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    path TEXT NOT NULL,
+    turns INTEGER NOT NULL,
+    tokens INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_chat_sessions_updated ON chat_sessions(updated_at);
+"""
+
+
+class ChatJournal:
+    """
+    Append-only record of every chat session: one JSON line per message
+    (role, content, token count, generation params) and per history
+    summary, in <directory>/<session_id>.jsonl. Lines are written by a
+    background thread, so a finished reply never waits on the disk; a crash
+    loses at most the lines still queued. The chat_sessions table in the
+    store indexes the sessions, so listing them reads no session files.
+    A resumed session keeps appending to its own file.
+    """
+    def __init__(self, directory, store, fsync=False):
+        self.directory = directory
+        self.store = store
+        self.fsync = fsync
+        self._lock = threading.Lock()
+        self._queue = queue.SimpleQueue()
+        self._writer = None
+        self.stats = {"lines": 0, "batches": 0, "write_s": 0.0}
+        #callbacks(path) run on the writer thread after a session file was written
+        self.on_write = []
+        with store.connection() as conn:
+            conn.executescript(SCHEMA)
+        self.new_session()
+        atexit.register(self.close)
+
+    def new_session(self):
+        #the file only appears with the first message, so an empty chat leaves nothing behind
+        with self._lock:
+            now = time.time()
+            self.session_id = f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(now))}-{uuid.uuid4().hex[:6]}"
+            self._session = {"session_id": self.session_id, "title": "", "path": self.path(self.session_id),
+                             "turns": 0, "tokens": 0, "created_at": now, "updated_at": now}
+        return self.session_id
+
+    def path(self, session_id):
+        return os.path.join(self.directory, f"{session_id}.jsonl")
+
+    def append_turn(self, role, content, tokens=None, params=None):
+        """
+        Queues one message of the current session.
+
+        Args:
+            role (str): user, assistant or system
+            content (str): Message text
+            tokens (int): Token count of the message, if known
+            params (dict): Generation settings the message was made with
+        """
+        record = {"type": "turn", "role": role, "content": content, "tokens": tokens, "at": time.time()}
+        if params:
+            record["params"] = params
+        with self._lock:
+            session = self._session
+            if not session["title"] and role == "user" and content.strip():
+                session["title"] = content.strip().splitlines()[0][:80]
+            session["turns"] += 1
+            session["tokens"] += tokens or 0
+            session["updated_at"] = record["at"]
+            self._put(record, dict(session))
+
+    def record_summary(self, summary, upto):
+        #history compression state: messages [1, upto) of the history are covered by summary
+        with self._lock:
+            self._put({"type": "summary", "summary": summary, "upto": upto, "at": time.time()}, dict(self._session))
+
+    def _put(self, record, session):
+        #caller holds _lock
+        if self._writer is None or not self._writer.is_alive():
+            self._writer = threading.Thread(target=self._write_loop, name="chat-journal", daemon=True)
+            self._writer.start()
+        self._queue.put((record, session))
+
+    def _write_loop(self):
+        handle, handle_path = None, None
+        running = True
+        while running:
+            batch = [self._queue.get()]
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            #one flush and one index update per burst of messages
+            start = time.perf_counter()
+            sessions, waiters = {}, []
+            for item in batch:
+                if item is None:
+                    running = False
+                    continue
+                if isinstance(item, threading.Event):
+                    waiters.append(item)
+                    continue
+                record, session = item
+                try:
+                    if session["path"] != handle_path:
+                        if handle is not None:
+                            handle.close()
+                        ensure_dir_exists(self.directory)
+                        handle, handle_path = open(session["path"], "a", encoding="utf-8"), session["path"]
+                    handle.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+                    sessions[session["session_id"]] = session
+                    self.stats["lines"] += 1
+                except OSError as e:
+                    logging.error(f"Chat journal: could not write to {session['path']}: {e}")
+            try:
+                if handle is not None:
+                    handle.flush()
+                    if self.fsync:
+                        os.fsync(handle.fileno())
+                if sessions:
+                    self._update_index(sessions.values())
+            except Exception as e:
+                logging.error(f"Chat journal: could not flush: {e}", exc_info=True)
+            if sessions:
+                self.stats["batches"] += 1
+                self.stats["write_s"] += time.perf_counter() - start
+                for session in sessions.values():
+                    for callback in self.on_write:
+                        try:
+                            callback(session["path"])
+                        except Exception as e:
+                            logging.error(f"Chat journal: write callback failed: {e}", exc_info=True)
+            for waiter in waiters:
+                waiter.set()
+        if handle is not None:
+            handle.close()
+
+    def _update_index(self, sessions):
+        conn = self.store.connection()
+        with conn:
+            conn.executemany("INSERT OR REPLACE INTO chat_sessions "
+                             "(session_id, title, path, turns, tokens, created_at, updated_at) "
+                             "VALUES (:session_id, :title, :path, :turns, :tokens, :created_at, :updated_at)",
+                             list(sessions))
+
+    def flush(self, timeout=10):
+        #waits until everything queued so far is on disk and in the index
+        if self._writer is None or not self._writer.is_alive():
+            return True
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def close(self):
+        if self._writer is not None and self._writer.is_alive():
+            self._queue.put(None)
+            self._writer.join(timeout=10)
+
+    def list_sessions(self, limit=50):
+        """
+        Return:
+            list: Most recently updated sessions first, rows of session_id,
+            title, path, turns, tokens, created_at, updated_at
+        """
+        return self.store.connection().execute(
+            "SELECT * FROM chat_sessions ORDER BY updated_at DESC LIMIT ?", (limit,)).fetchall()
+
+    def load(self, session_id):
+        """
+        Reads a session back from its journal file, after writing out what
+        is still queued. A line cut short by a crash is skipped.
+
+        Args:
+            session_id (str): Session to read
+
+        Return:
+            dict: messages ([{"role", "content"}], without the system prompt),
+            tokens (per message, None where unknown), summary and summarized_upto
+            (history compression state); None if the session has no file
+        """
+        self.flush()
+        return read_session_file(self.path(session_id))
+
+    def resume(self, session):
+        """
+        Makes a session returned by load() the current one again, so new
+        messages are appended to it.
+        """
+        session_id = session["session_id"]
+        row = self.store.connection().execute("SELECT * FROM chat_sessions WHERE session_id = ?",
+                                              (session_id,)).fetchone()
+        with self._lock:
+            self.session_id = session_id
+            self._session = dict(row) if row else {
+                "session_id": session_id, "title": "", "path": self.path(session_id),
+                "turns": len(session["messages"]), "tokens": sum(t or 0 for t in session["tokens"]),
+                "created_at": time.time(), "updated_at": time.time()}
+
+
+def read_session_file(path):
+    """
+    Parses one journal file (see ChatJournal.load for the result).
+
+    Return:
+        dict: The session, None if the file does not exist
+    """
+    if not os.path.exists(path):
+        return None
+    session_id = os.path.splitext(os.path.basename(path))[0]
+    session = {"session_id": session_id, "messages": [], "tokens": [], "summary": "", "summarized_upto": 1}
+    with open(path, "r", encoding="utf-8") as f:
+        for number, line in enumerate(f, start=1):
+            try:
+                record = json.loads(line)
+            except ValueError:
+                logging.warning(f"Chat journal: skipping unreadable line {number} of {path}")
+                continue
+            if record.get("type") == "turn":
+                session["messages"].append({"role": record["role"], "content": record["content"]})
+                session["tokens"].append(record.get("tokens"))
+            elif record.get("type") == "summary":
+                session["summary"], session["summarized_upto"] = record["summary"], record["upto"]
+    return session
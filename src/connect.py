@@ -3,117 +3,650 @@ import threading
 import json
 import logging
 import sys
+import gc
+import time
+import platform
+from collections import OrderedDict
+from contextlib import contextmanager
 
 #local imports
-from utils import resource_path
+from utils import resource_path, load_json_safe, get_process_rss_mb, load_config, setup_logging
+from stopping import StopSequenceMatcher
+from tracing import span
+from store import get_store
+from generation_cache import GenerationCache, model_identity, cache_key, is_deterministic
+from chat_journal import ChatJournal
+from memory_governor import get_memory_governor
 
+import numpy as np
 import onnxruntime_genai as og
 
-with open("config.json", "r", encoding="utf-8") as f:
-    CONFIG = json.load(f)
+CONFIG = load_config()
 
-logging.basicConfig(level=logging.INFO, filename="model.log", filemode="w",
-                    format="%(asctime)s - %(levelname)s - %(message)s")
+setup_logging()
 
-class ModelHandler:
-    def __init__(self):
-        #Initializing paths and model
-        self.model_path = self._build_model_path()
+def _speculative_supported():
+    #prompt lookup needs multi-token append, KV rewind and raw logits (newer onnxruntime-genai)
+    return all(hasattr(og.Generator, name) for name in ("append_tokens", "rewind_to", "get_output"))
+
+def _prefill_supported():
+    #keeping a prefilled KV cache and extending it later needs append_tokens (newer onnxruntime-genai)
+    return hasattr(og.Generator, "append_tokens")
+
+def _start_generator(model, params, input_tokens=None):
+    """
+    Creates a generator and feeds it the prompt the way the runtime wants it:
+    Generator.append_tokens where it exists (onnxruntime-genai 0.6+, which
+    dropped GeneratorParams.input_ids), params.input_ids on older runtimes.
+    Search options must already be set on params.
+    """
+    if input_tokens is not None and not _prefill_supported():
+        params.input_ids = input_tokens
+    generator = og.Generator(model, params)
+    if input_tokens is not None and _prefill_supported():
+        generator.append_tokens(list(input_tokens))
+    return generator
+
+def _advance(generator):
+    #older runtimes need compute_logits before every step, newer ones fold it into generate_next_token
+    if hasattr(generator, "compute_logits"):
+        generator.compute_logits()
+    generator.generate_next_token()
+
+def _common_prefix(a, b):
+    n = min(len(a), len(b))
+    for i in range(n):
+        if a[i] != b[i]:
+            return i
+    return n
+
+def _find_draft(tokens, ngram_size, draft_length):
+    """
+    Prompt-lookup drafting: find the latest earlier occurrence of the last
+    n tokens (longest n first) and propose the tokens that followed it.
+    """
+    if draft_length <= 0:
+        return []
+    for n in range(min(ngram_size, len(tokens) - 1), 0, -1):
+        tail = tokens[-n:]
+        for start in range(len(tokens) - n - 1, -1, -1):
+            if tokens[start:start + n] == tail:
+                return tokens[start + n:start + n + draft_length]
+    return []
+
+def _greedy_token(logits, seen_tokens, repetition_penalty):
+    #argmax after the same repetition penalty the runtime applies
+    if repetition_penalty != 1.0 and seen_tokens:
+        logits = logits.copy()
+        idx = np.fromiter(seen_tokens, dtype=np.int64)
+        vals = logits[idx]
+        logits[idx] = np.where(vals > 0, vals / repetition_penalty, vals * repetition_penalty)
+    return int(np.argmax(logits))
+
+def _phase_timings(start, first_token_at, new_tokens):
+    #prefill = until the first new token, decode = the rest
+    end = time.perf_counter()
+    if first_token_at is None:
+        return {"new_tokens": 0, "prefill_ms": round((end - start) * 1000, 1)}
+    return {"new_tokens": new_tokens,
+            "prefill_ms": round((first_token_at - start) * 1000, 1),
+            "decode_ms": round((end - first_token_at) * 1000, 1)}
+
+def _cancelled(cancel_event):
+    return cancel_event is not None and cancel_event.is_set()
+
+class _PeakRss:
+    #peak resident memory over one generation, read every few tokens
+    def __init__(self, every):
+        self.every = max(1, every)
+        self.ticks = 0
+        self.start_mb = get_process_rss_mb()
+        self.peak_mb = self.start_mb or 0.0
+
+    def tick(self):
+        self.ticks += 1
+        if self.ticks % self.every == 0:
+            self.sample()
+
+    def sample(self):
+        self.peak_mb = max(self.peak_mb, get_process_rss_mb() or 0.0)
+        return self.peak_mb
+
+class _StreamingDecoder:
+    """
+    Decodes a growing list of generated tokens, runs the new text through the
+    stop-sequence matcher and forwards what is safe to show to the callback.
+    """
+    def __init__(self, tokenizer, matcher, callback=None):
+        self.tokenizer = tokenizer
+        self.matcher = matcher
+        self.callback = callback
+        self.decoded = ""
+        self.text = ""
+
+    def update(self, tokens):
+        #True once a stop sequence has been hit
+        decoded = self.tokenizer.decode(tokens)
+        chunk = decoded[len(self.decoded):]
+        if not chunk:
+            return False
+        self.decoded = decoded
+        emit, hit = self.matcher.feed(chunk)
+        self._emit(emit)
+        return hit
+
+    def finish(self):
+        if self.matcher.matched is None:
+            self._emit(self.matcher.flush())
+        return self.text
+
+    def _emit(self, text):
+        if text:
+            self.text += text
+            if self.callback:
+                self.callback(text)
+
+
+def _configured_variants():
+    """
+    Model variants from config: name -> {"path", "memory_mb"}.
+    Falls back to the single model_name / model_subpath_elements entry.
+    """
+    declared = CONFIG.get("models") or {
+        "default": {"model_name": CONFIG["model_name"], "model_subpath_elements": CONFIG["model_subpath_elements"]}
+    }
+    return {
+        name: {
+            "path": os.path.join(resource_path(spec["model_name"]), *spec.get("model_subpath_elements", [])),
+            "memory_mb": spec.get("memory_mb")
+        }
+        for name, spec in declared.items()
+    }
+
+def _estimate_model_mb(path):
+    #weights dominate resident size, so on-disk ONNX size is a good first guess
+    total = 0
+    for filename in os.listdir(path):
+        if ".onnx" in filename:
+            total += os.path.getsize(os.path.join(path, filename))
+    return total / (1024 * 1024)
+
+
+def _session_options(overrides=None):
+    """
+    ONNX Runtime session options for model sessions, in genai_config form.
+    Built from the runtime section of config, then the tuned profile for
+    this machine (if any), then overrides. Unset values keep the defaults
+    that ship with the model folder.
+    """
+    runtime = dict(CONFIG.get("runtime", {}))
+    profile_file = runtime.get("profile_file", "runtime_profile.json")
+    profile = load_json_safe(profile_file) if os.path.exists(profile_file) else None
+    if profile and profile.get("machine") == machine_id():
+        runtime.update(profile.get("settings", {}))
+    runtime.update(overrides or {})
+
+    options = {}
+    for key in ("intra_op_num_threads", "inter_op_num_threads"):
+        if runtime.get(key):
+            options[key] = int(runtime[key])
+    if runtime.get("enable_cpu_mem_arena") is not None:
+        options["enable_cpu_mem_arena"] = bool(runtime["enable_cpu_mem_arena"])
+    if runtime.get("allow_spinning") is not None:
+        flag = "1" if runtime["allow_spinning"] else "0"
+        options["config_entries"] = {"session.intra_op.allow_spinning": flag,
+                                     "session.inter_op.allow_spinning": flag}
+    return options
+
+def machine_id():
+    #tuned profiles only apply to the machine they were measured on
+    return f"{platform.node()}-{platform.machine()}-{os.cpu_count()}"
+
+def session_options_supported():
+    #session options can only be set through a genai_config overlay (newer onnxruntime-genai)
+    return hasattr(og, "Config") and hasattr(og.Config, "overlay")
+
+def _open_model(path, session_options=None):
+    #session options go in as a genai_config overlay where the runtime supports it
+    if session_options and session_options_supported():
+        config = og.Config(path)
+        config.overlay(json.dumps({"model": {"decoder": {"session_options": session_options}}}))
+        return og.Model(config)
+    if session_options:
+        logging.info("This onnxruntime-genai cannot override session options; using the model folder defaults.")
+    return og.Model(path)
+
+
+class _Prefill:
+    #a generator holding the KV cache of a prompt prefix, built while the user types;
+    #it keeps one pin on its model while it is held (see ModelHandler._set_prefill)
+    def __init__(self, loaded, generator, max_length):
+        self.loaded = loaded
+        self.generator = generator
+        self.max_length = max_length
+        self.tokens = []
+
+
+class LoadedModel:
+    #one resident model variant
+    def __init__(self, name, path, model, tokenizer, memory_mb):
+        self.name = name
+        self.path = path
+        self.model = model
+        self.tokenizer = tokenizer
+        self.memory_mb = memory_mb
+        #generations (and a held prefill) using the model; a pinned model is never evicted
+        self.pins = 0
+        #identity of the weights on disk, part of every generation cache key
+        self.model_id = model_identity(name, path)
+        genai_config = load_json_safe(os.path.join(path, "genai_config.json")) or {}
+        eos = genai_config.get("model", {}).get("eos_token_id", [])
+        #EOS ids are needed when we drive decoding ourselves
+        self.eos_token_ids = set(eos if isinstance(eos, list) else [eos])
+
+    def release(self):
         self.model = None
         self.tokenizer = None
-        self.load_model_threaded()
+
+
+class ModelRegistry:
+    """
+    Declared model variants, each loaded on first use. Before a load, least
+    recently used models that are not in use are evicted until the new one
+    fits the memory governor's budget, the same one the search pipeline
+    stays inside. Tasks (chat, summarize, answer) are routed to variants by
+    config. Code that generates holds the model with use() (or pin/unpin),
+    so it can't be released under it.
+    """
+    def __init__(self, variants, routing, governor):
+        self.variants = variants
+        self.routing = routing
+        self.governor = governor
+        self.resident = OrderedDict()
+        self.loaded_once = set()
+        self.failed = {}
+        #runtime config overrides for model sessions (e.g. a worker's thread share)
+        self.session_overrides = {}
+        #callbacks(name, model_id) run after every successful load
+        self.on_load = []
+        self._lock = threading.RLock()
+
+    def variant_for(self, task):
+        name = self.routing.get(task) or self.routing.get("chat")
+        if name not in self.variants:
+            name = next(iter(self.variants))
+        return name
+
+    def path_for(self, task):
+        return self.variants[self.variant_for(task)]["path"]
+
+    def is_available(self, task):
+        #loaded successfully at least once (it may be evicted right now)
+        name = self.variant_for(task)
+        return name in self.resident or name in self.loaded_once
+
+    @property
+    def budget_mb(self):
+        return self.governor.budget_mb
+
+    def resident_mb(self):
+        return sum(m.memory_mb for m in self.resident.values())
+
+    def resident_model(self, task="chat"):
+        #the task's model if it is loaded right now; never loads or evicts
+        with self._lock:
+            return self.resident.get(self.variant_for(task))
+
+    def pin(self, task="chat"):
+        #loads the task's model if needed and keeps it from eviction until unpin()
+        with self._lock:
+            loaded = self.get(task)
+            loaded.pins += 1
+            return loaded
+
+    def unpin(self, loaded):
+        with self._lock:
+            loaded.pins -= 1
+
+    @contextmanager
+    def use(self, task="chat"):
+        #with registry.use(task) as loaded: the model stays resident for the block
+        loaded = self.pin(task)
+        try:
+            yield loaded
+        finally:
+            self.unpin(loaded)
+
+    def get(self, task="chat"):
+        name = self.variant_for(task)
+        with self._lock:
+            loaded = self.resident.get(name)
+            if loaded:
+                self.resident.move_to_end(name)
+                return loaded
+            return self._load(name)
+
+    def _load(self, name):
+        path = self.variants[name]["path"]
+        try:
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"Model directory not found: {path}")
+            need_mb = self.variants[name]["memory_mb"] or _estimate_model_mb(path)
+            self._make_room(need_mb)
+
+            logging.info(f"Loading model '{name}' from: {path}")
+            rss_before = get_process_rss_mb()
+            model = _open_model(path, _session_options(self.session_overrides))
+            tokenizer = og.Tokenizer(model)
+            rss_after = get_process_rss_mb()
+        except Exception as e:
+            self.failed[name] = e
+            raise
+
+        measured = (rss_after - rss_before) if rss_before is not None and rss_after is not None else 0
+        loaded = LoadedModel(name, path, model, tokenizer, max(need_mb, measured))
+        self.resident[name] = loaded
+        self.loaded_once.add(name)
+        self.failed.pop(name, None)
+        for callback in self.on_load:
+            callback(name, loaded.model_id)
+        logging.info(f"Model '{name}' loaded (~{loaded.memory_mb:.0f} MB, resident total {self.resident_mb():.0f} MB)")
+        return loaded
+
+    def _used_mb(self):
+        #app and browser memory as the governor measures it (models included);
+        #the resident model estimates where memory can't be read
+        own, children = self.governor.memory_mb()
+        return max(own + children, self.resident_mb())
+
+    def _make_room(self, need_mb):
+        #least recently used first; models in use are skipped
+        for name in [name for name, loaded in self.resident.items() if not loaded.pins]:
+            if self._used_mb() + need_mb <= self.budget_mb:
+                return
+            self.resident.pop(name).release()
+            gc.collect()
+            logging.info(f"Evicted model '{name}' to stay within {self.budget_mb} MB")
+        if self._used_mb() + need_mb > self.budget_mb:
+            logging.warning(f"Loading {need_mb:.0f} MB more goes over the {self.budget_mb} MB budget "
+                            f"(models in use: {[name for name, m in self.resident.items() if m.pins]})")
+
+    def evict_all(self):
+        #every model not in use
+        with self._lock:
+            for name in [name for name, loaded in self.resident.items() if not loaded.pins]:
+                self.resident.pop(name).release()
+            gc.collect()
+
+
+class ModelHandler:
+    def __init__(self, load_now=True, worker=False):
+        #Initializing model registry and loading the chat model
+        #(load_now=False leaves the load to the caller, e.g. a background thread;
+        #worker=True: only generate_full_response is used, in a worker process,
+        #so no journal, generation cache or history compression)
+        self.worker = worker
+        self.registry = ModelRegistry(_configured_variants(),
+                                      CONFIG.get("model_routing", {}),
+                                      get_memory_governor())
+        self.model_path = self.registry.path_for("chat")
+
+        #exact-match cache of deterministic generate_full_response results
+        cache_config = CONFIG.get("generation_cache", {})
+        self.generation_cache = None
+        if cache_config.get("enabled", False) and not worker:
+            self.generation_cache = GenerationCache(get_store() if cache_config.get("disk", True) else None,
+                                                    cache_config.get("memory_entries", 256),
+                                                    cache_config.get("disk_entries", 5000))
+            self.registry.on_load.append(self.generation_cache.on_model_loaded)
+
+        if load_now:
+            self.load_model_threaded()
 
         #For chat history
         self.base_history = [
             {"role": "system", "content": CONFIG["system_prompt"]}
         ]
+        #older turns folded into a running summary: base_history[1:summarized_upto]
+        #is sent as history_summary; base_history itself keeps every original turn
+        self.history_summary = ""
+        self.summarized_upto = len(self.base_history)
+        #turns before base_history[_prompt_start] were trimmed off the prompt to fit
+        #history_max_tokens (they stay in base_history and the journal)
+        self._prompt_start = len(self.base_history)
+        self._history_epoch = 0
+        self._compression_cancel = threading.Event()
+        self._compression_thread = None
+        #a turn that ends while a cancelled pass is still winding down asks for another one
+        self._compression_lock = threading.Lock()
+        self._compression_pending = False
+        self.compression_stats = {"runs": 0, "messages_summarized": 0, "tokens_saved_total": 0, "last_tokens_saved": 0}
+
+        #append-only journal of every message, for resuming a chat later;
+        #base_history[:_journaled] is already in it
+        journal_config = CONFIG.get("journal", {})
+        self.journal = None
+        if journal_config.get("enabled", False) and not worker:
+            self.journal = ChatJournal(journal_config.get("dir", os.path.join(CONFIG["chat_file_dir"], "sessions")),
+                                       get_store(), journal_config.get("fsync", False))
+        self._journaled = len(self.base_history)
+
+        #speculative prefill of the prompt while the user is still typing
+        self._prefill = None
+        self._prefill_lock = threading.Lock()
+        self._prefill_cancel = threading.Event()
+        self.prefill_stats = {"turns": 0, "reused_turns": 0, "reused_tokens": 0, "prompt_tokens": 0}
+
+        #KV sizing and peak memory of the last generation (see _search_options)
+        self._share_buffer_supported = None
+        self.memory_stats = {"generations": 0, "last_max_length": 0, "last_peak_rss_mb": 0.0, "peak_rss_mb": 0.0}
 
         #control generation 
         self.stop_response_flag = False
         self.generating_response_lock = threading.Lock()
         self.current_generator = None
+        #why the last generation ended: eos, max_new_tokens, max_length, stop_sequence, user or cancelled
+        self.last_stop_reason = None
+        self.last_stop_sequence = None
 
-    def _build_model_path(self):
-        #using config
-        model_name = CONFIG["model_name"]
-        subpaths = CONFIG["model_subpath_elements"]
-        return os.path.join(resource_path(model_name), *subpaths)
+        #prompt-lookup speculative decoding counters
+        self.speculative_stats = {"calls": 0, "tokens": 0, "drafted": 0, "accepted": 0,
+                                  "forward_passes": 0, "seconds": 0.0}
 
     def load_model_threaded(self):
         try:
-            if not os.path.exists(self.model_path):
-                raise FileNotFoundError(f"Model directory not found: {self.model_path}")
-            logging.info(f"Loading model from: {self.model_path}")
-            self.model = og.Model(self.model_path)
-            self.tokenizer = og.Tokenizer(self.model)
+            self.registry.get("chat")
             logging.info("Model and Tokenizer loaded successfully!")
+            return True
         except Exception as e:
             logging.error(f"Error loading model: {e}")
-            self.model = None
-            self.tokenizer = None
+            return False
+
+    def is_loaded(self, task="chat"):
+        #True if the model for this task can be used (resident or reloadable)
+        return self.registry.is_available(task)
+
+    @property
+    def model(self):
+        #chat model if it is resident; reading it never loads or evicts a model
+        loaded = self.registry.resident_model("chat")
+        return loaded.model if loaded else None
+
+    @property
+    def tokenizer(self):
+        loaded = self.registry.resident_model("chat")
+        return loaded.tokenizer if loaded else None
+
+    def _max_length(self, prompt_len, max_new_tokens):
+        #runtime max_length is prompt + new tokens, capped by the context window;
+        #in memory-lean mode it is rounded up to a bucket so consecutive generations
+        #ask for the same KV sizes and the allocator can hand the same blocks back
+        window = CONFIG.get("context_window", 4096)
+        if prompt_len >= window:
+            raise ValueError(f"Prompt is {prompt_len} tokens, context window is {window}")
+        needed = prompt_len + max_new_tokens
+        lean = CONFIG.get("memory_lean", {})
+        if lean.get("enabled", False):
+            bucket = max(1, lean.get("kv_bucket_tokens", 128))
+            needed = -(-needed // bucket) * bucket
+        return min(needed, window)
+
+    def _search_options(self, params, max_length, **options):
+        """
+        set_search_options with max_length, plus shared past/present KV buffers
+        in memory-lean mode: the runtime then allocates the KV cache once, at
+        max_length, and updates it in place instead of copying it every token.
+        Runtimes that don't know the option get the plain settings.
+        """
+        options["max_length"] = max_length
+        lean = CONFIG.get("memory_lean", {})
+        if lean.get("enabled", False) and lean.get("share_kv_buffer", True) and self._share_buffer_supported is not False:
+            try:
+                params.set_search_options(past_present_share_buffer=True, **options)
+                self._share_buffer_supported = True
+                return
+            except Exception as e:
+                logging.warning(f"Shared KV buffers not supported by this runtime, using separate ones: {e}")
+                self._share_buffer_supported = False
+        params.set_search_options(**options)
 
-    def _build_prompt_from_history(self):
-        """Constructs the full prompt from chat history using the template."""
+    def _sampling_options(self, gen_config=None):
+        gen_config = gen_config or CONFIG["generation_params"]
+        return dict(temperature=gen_config["temperature"], top_p=gen_config["top_p"],
+                    do_sample=gen_config["do_sample"], repetition_penalty=gen_config["repetition_penalty"])
+
+    def _peak_rss(self):
+        return _PeakRss(CONFIG.get("memory_lean", {}).get("sample_every_tokens", 16))
+
+    def _record_memory(self, trace, peak, max_length):
+        #peak RSS of one generation, in the trace span and memory_stats
+        peak_mb = peak.sample()
+        stats = self.memory_stats
+        stats["generations"] += 1
+        stats["last_max_length"] = max_length
+        stats["last_peak_rss_mb"] = round(peak_mb, 1)
+        if peak_mb > stats["peak_rss_mb"]:
+            stats["peak_rss_mb"] = round(peak_mb, 1)
+            logging.info(f"New peak memory during generation: {peak_mb:.0f} MB (max_length {max_length})")
+        trace.set(max_length=max_length, peak_rss_mb=round(peak_mb, 1),
+                  rss_growth_mb=round(peak_mb - peak.start_mb, 1) if peak.start_mb is not None else None)
+
+    def _stop_sequences(self, stop_sequences):
+        return CONFIG.get("stop_sequences", []) if stop_sequences is None else stop_sequences
+
+    def _record_stop(self, reason, matcher):
+        self.last_stop_reason = reason
+        self.last_stop_sequence = matcher.matched
+        logging.info(f"Generation ended: {reason}" + (f" ({matcher.matched!r})" if matcher.matched else ""))
+
+    def _build_prompt_from_history(self, context=None, compressed=True, prompt_start=None, draft=None):
+        """
+        Constructs the full prompt from chat history using the template.
+        Turns already compressed are replaced by the running summary, turns
+        trimmed to fit history_max_tokens are left out (compressed=False gives
+        the prompt with every original turn; prompt_start overrides where the
+        kept turns begin).
+        Optional grounding context goes in as a system turn right before the
+        latest user message; it is not stored in the history.
+        draft: a user message not sent yet (prefill), added as the latest one.
+        """
+        history = self.base_history
+        if draft is not None:
+            history = history + [{"role": "user", "content": draft}]
+        if compressed:
+            if prompt_start is None:
+                prompt_start = self._prompt_start
+            start = max(prompt_start, self.summarized_upto if self.history_summary else 1)
+            history = history[:1] + history[start:]
+            if self.history_summary:
+                summary = {"role": "system", "content": f"Summary of the earlier conversation:\n{self.history_summary}"}
+                history = history[:1] + [summary] + history[1:]
+        if context:
+            note = {"role": "system", "content": f"Relevant notes from earlier searches and chats:\n{context}"}
+            history = history[:-1] + [note] + history[-1:]
         prompt = ""
-        for item in self.base_history:
+        for item in history:
             prompt += CONFIG["prompt_template"].format(role=item["role"], content=item["content"])
         prompt += CONFIG["assistant_start_token"]
         return prompt
 
-    def get_response(self, user_input, callback):
+    def get_response(self, user_input, callback, context=None, stop_sequences=None):
         """
         Streams a response from the model for the given user input.
         Uses the callback to update the UI incrementally.
+        context: optional local knowledge text used to ground this answer.
+        stop_sequences: strings that end the reply (defaults to config), never shown.
         """
-        if not self.model or not self.tokenizer:
+        if not self.is_loaded("chat"):
             callback("\n[Error: Model not loaded or failed to load.]\n")
             return
 
-        with self.generating_response_lock:
+        #background compression and prefill give the lock back within one step
+        self._compression_cancel.set()
+        self._prefill_cancel.set()
+        with self.generating_response_lock, span("chat_response") as trace:
             self.stop_response_flag = False
+            loaded = None
+            reply_tokens = None
             try:
+                loaded = self.registry.pin("chat")
+                start = time.perf_counter()
+                first_token_at = None
                 #adding user message to history
                 self.base_history.append({"role": "user", "content": user_input})
-                full_prompt = self._build_prompt_from_history()
+                full_prompt = self._build_prompt_from_history(context)
 
                 #encoding input tokens
-                input_tokens = self.tokenizer.encode(full_prompt)
+                input_tokens, self._prompt_start = self._trim_prompt(loaded, context,
+                                                                     loaded.tokenizer.encode(full_prompt))
+                trace.set(prompt_tokens=len(input_tokens))
+                if self.history_summary:
+                    self._record_tokens_saved(loaded, context, len(input_tokens))
 
-                #generation parameters
-                params = og.GeneratorParams(self.model)
-                params.input_ids = input_tokens
                 gen_config = CONFIG["generation_params"]
-                params.set_search_options(
-                    max_length=gen_config["max_length"],
-                    temperature=gen_config["temperature"],
-                    top_p=gen_config["top_p"],
-                    do_sample=gen_config["do_sample"],
-                    repetition_penalty=gen_config["repetition_penalty"]
-                )
-
-                self.current_generator = og.Generator(self.model, params)
-                assistant_response = ""
+                max_new_tokens = gen_config["max_new_tokens"]
+                max_length = self._max_length(len(input_tokens), max_new_tokens)
+                peak = self._peak_rss()
+                #reuse the KV cache prefilled while the user was typing, if it still matches
+                self.current_generator = self._take_prefilled(loaded, input_tokens, max_length)
+                trace.set(prefilled=self.current_generator is not None)
+                if self.current_generator is None:
+                    #generation parameters
+                    params = og.GeneratorParams(loaded.model)
+                    self._search_options(params, max_length, **self._sampling_options())
+                    self.current_generator = _start_generator(loaded.model, params, input_tokens)
+                matcher = StopSequenceMatcher(self._stop_sequences(stop_sequences))
+                stream = _StreamingDecoder(loaded.tokenizer, matcher, callback)
                 response_tokens = []
+                reason = "eos"
 
                 while not self.current_generator.is_done():
                     if self.stop_response_flag:
                         logging.info("Generation stopped by user.")
+                        reason = "user"
+                        break
+                    if len(response_tokens) >= max_new_tokens:
+                        reason = "max_new_tokens"
                         break
 
-                    self.current_generator.compute_logits()
-                    self.current_generator.generate_next_token()
+                    _advance(self.current_generator)
                     new_token_id = self.current_generator.get_next_tokens()[0]
                     response_tokens.append(new_token_id)
+                    peak.tick()
+                    if first_token_at is None:
+                        first_token_at = time.perf_counter()
 
-                    decoded = self.tokenizer.decode(response_tokens)
-                    chunk = decoded[len(assistant_response):]
-                    if chunk:
-                        callback(chunk)
-                        assistant_response = decoded
+                    if stream.update(response_tokens):
+                        reason = "stop_sequence"
+                        break
 
-                final_response = assistant_response.strip()
+                final_response = stream.finish().strip()
+                trace.set(**_phase_timings(start, first_token_at, len(response_tokens)), stop_reason=reason)
+                self._record_memory(trace, peak, max_length)
+                self._record_stop(reason, matcher)
                 if final_response:
                     self.base_history.append({"role": "assistant", "content": final_response})
+                    reply_tokens = len(response_tokens)
 
                 if self.stop_response_flag:
                     callback("\n[Model response stopped by user]\n")
@@ -124,46 +657,496 @@ class ModelHandler:
             finally:
                 self.current_generator = None
                 self.stop_response_flag = False
+                self._journal_history(loaded, reply_tokens)
+                if loaded is not None:
+                    self.registry.unpin(loaded)
+        self._schedule_compression()
+
+    def _trim_prompt(self, loaded, context, input_tokens, draft=None):
+        """
+        Leaves the oldest turns out of the prompt until it fits
+        history_max_tokens (and the context window), for chats that grow
+        faster than history compression folds them into the summary. The
+        latest user message is always kept. Prefill passes the text typed so
+        far as draft, so it cuts the history where the reply will.
+
+        Return:
+            tuple: (input tokens of the trimmed prompt, new prompt start for _prompt_start)
+        """
+        budget = min(CONFIG.get("history_max_tokens", 2048), CONFIG.get("context_window", 4096) - 1)
+        history = self.base_history + ([{"role": "user", "content": draft}] if draft is not None else [])
+        last = len(history) - 1
+        prompt_start = self._prompt_start
+        while len(input_tokens) > budget:
+            start = max(prompt_start, self.summarized_upto if self.history_summary else 1)
+            if start >= last:
+                break
+            #cut at a user turn, so the prompt doesn't open with a reply to a dropped question
+            start += 1
+            while start < last and history[start]["role"] != "user":
+                start += 1
+            prompt_start = start
+            input_tokens = loaded.tokenizer.encode(self._build_prompt_from_history(context, prompt_start=prompt_start,
+                                                                                   draft=draft))
+        if prompt_start != self._prompt_start and draft is None:
+            logging.warning(f"Prompt over history_max_tokens ({budget}): left the oldest turns out, "
+                            f"now starting at message {prompt_start} ({len(input_tokens)} tokens)")
+        return input_tokens, prompt_start
+
+    def _journal_history(self, loaded=None, reply_tokens=None):
+        """
+        Queues the messages added to base_history since the last call, so
+        the journal mirrors it message for message. reply_tokens is the
+        token count of a final assistant reply; other counts are taken with
+        the tokenizer of loaded, when given.
+        """
+        if self.journal is None:
+            return
+        new = self.base_history[self._journaled:]
+        self._journaled = len(self.base_history)
+        for i, item in enumerate(new):
+            reply = i == len(new) - 1 and item["role"] == "assistant" and reply_tokens is not None
+            tokens = reply_tokens if reply else None
+            if tokens is None and loaded is not None:
+                tokens = len(loaded.tokenizer.encode(item["content"]))
+            params = None
+            if reply:
+                params = dict(CONFIG["generation_params"], model=loaded.name if loaded else None,
+                              stop_reason=self.last_stop_reason)
+            self.journal.append_turn(item["role"], item["content"], tokens, params)
+
+    def resume_session(self, session_id):
+        """
+        Restores a journaled chat: its messages become the history (after
+        the current system prompt) together with the summary it had, and
+        new messages are appended to the same session. The restored prompt
+        is then prefilled in the background (journal.prefill_on_resume), so
+        the first reply does not process the whole conversation again.
+
+        Args:
+            session_id (str): Session from journal.list_sessions()
+
+        Return:
+            list: Restored messages ([{"role", "content"}]), None if there is no such session
+        """
+        if self.journal is None:
+            return None
+        #the current chat stays as it is unless the session can be read
+        session = self.journal.load(session_id)
+        if session is None:
+            return None
+        #background compression and prefill give the lock back within one step
+        self._compression_cancel.set()
+        self._prefill_cancel.set()
+        with self.generating_response_lock:
+            self.clear_history()
+            self.journal.resume(session)
+            self.base_history.extend(session["messages"])
+            self._journaled = len(self.base_history)
+            if session["summary"] and session["summarized_upto"] <= len(self.base_history):
+                self.history_summary = session["summary"]
+                self.summarized_upto = session["summarized_upto"]
+        logging.info(f"Resumed chat session {session_id}: {len(session['messages'])} messages"
+                     + (f", summary up to message {self.summarized_upto}" if self.history_summary else ""))
+        if CONFIG.get("journal", {}).get("prefill_on_resume", True):
+            threading.Thread(target=self.prefill_draft, args=("",), daemon=True).start()
+        return session["messages"]
+
+    def prefill_draft(self, draft_text):
+        """
+        Prefills the KV cache for the prompt the user is about to send
+        (history + the text typed so far), so that on send only the last few
+        tokens are left to process. Meant to be called, debounced, from the
+        input box on a background thread. Each call extends the previous
+        prefill; when the text diverges the cache is rewound to the common
+        prefix (or dropped). Any new call or an incoming turn stops it
+        within one chunk of tokens.
+        """
+        config = CONFIG.get("prefill", {})
+        if not config.get("enabled", False) or not _prefill_supported() or not self.is_loaded("chat"):
+            return
+        self._prefill_cancel.set()
+        with self._prefill_lock, self.registry.use("chat") as loaded:
+            cancel = self._prefill_cancel = threading.Event()
+            epoch = self._history_epoch
+            try:
+                self._extend_prefill(loaded, draft_text, config, cancel)
+            finally:
+                #clear_history doesn't wait for a running prefill, so one that saw the old chat drops its cache here
+                if epoch != self._history_epoch:
+                    self._set_prefill(None)
+
+    def _extend_prefill(self, loaded, draft_text, config, cancel):
+        #caller holds _prefill_lock and a pin on loaded
+
+        #the prompt the reply will get, cut where get_response will cut it, up to the draft;
+        #the last few tokens may still change as the word is finished
+        _, prompt_start = self._trim_prompt(loaded, None, loaded.tokenizer.encode(
+            self._build_prompt_from_history(draft=draft_text)), draft=draft_text)
+        prompt = self._build_prompt_from_history(prompt_start=prompt_start, draft=draft_text)
+        suffix = CONFIG["prompt_template"].split("{content}")[1].format(role="user") + CONFIG["assistant_start_token"]
+        target = list(loaded.tokenizer.encode(prompt[:-len(suffix)]))
+        target = target[:max(0, len(target) - config.get("holdback_tokens", 4))]
+        #room for the rest of the message and the reply; a longer prompt is prefilled from scratch
+        try:
+            max_length = self._max_length(len(target) + config.get("headroom_tokens", 64),
+                                          CONFIG["generation_params"]["max_new_tokens"])
+        except ValueError:
+            return
+
+        state = self._prefill
+        if state is not None and state.loaded is loaded and state.max_length >= max_length:
+            keep = _common_prefix(state.tokens, target)
+            if keep < len(state.tokens):
+                if keep and hasattr(state.generator, "rewind_to"):
+                    state.generator.rewind_to(keep)
+                    state.tokens = state.tokens[:keep]
+                else:
+                    state = None
+        else:
+            state = None
+        if state is None:
+            params = og.GeneratorParams(loaded.model)
+            self._search_options(params, max_length, **self._sampling_options())
+            generator = _start_generator(loaded.model, params)
+            state = _Prefill(self.registry.pin("chat"), generator, max_length)
+        self._set_prefill(state)
+
+        #extend in chunks, only while no real generation needs the model
+        chunk = config.get("chunk_tokens", 64)
+        while len(state.tokens) < len(target) and not cancel.is_set():
+            if not self.generating_response_lock.acquire(blocking=False):
+                return
+            try:
+                piece = target[len(state.tokens):len(state.tokens) + chunk]
+                state.generator.append_tokens(piece)
+                state.tokens.extend(piece)
+            finally:
+                self.generating_response_lock.release()
+
+    def _set_prefill(self, state):
+        #caller holds _prefill_lock; the prefill being replaced gives back its model pin
+        previous, self._prefill = self._prefill, state
+        if previous is not None and previous is not state:
+            self.registry.unpin(previous.loaded)
+
+    def _take_prefilled(self, loaded, input_tokens, max_length):
+        #generator with all of input_tokens appended, built on the prefill if it matches;
+        #the caller's own pin on loaded keeps the model while the generator is used
+        with self._prefill_lock:
+            state = self._prefill
+            self._set_prefill(None)
+        self.prefill_stats["turns"] += 1
+        self.prefill_stats["prompt_tokens"] += len(input_tokens)
+        if state is None or state.loaded is not loaded or state.max_length < max_length:
+            return None
+        #at least one token must be appended now so the last position has fresh logits
+        keep = min(_common_prefix(state.tokens, input_tokens), len(input_tokens) - 1)
+        if keep < len(state.tokens):
+            if not keep or not hasattr(state.generator, "rewind_to"):
+                return None
+            state.generator.rewind_to(keep)
+        try:
+            state.generator.append_tokens(list(input_tokens[keep:]))
+        except Exception as e:
+            logging.warning(f"Prefilled cache could not be extended, prefilling from scratch: {e}")
+            return None
+        self.prefill_stats["reused_turns"] += 1
+        self.prefill_stats["reused_tokens"] += keep
+        logging.info(f"Reused {keep} prefilled tokens, {len(input_tokens) - keep} left to prefill")
+        return state.generator
+
+    def _record_tokens_saved(self, loaded, context, prompt_tokens):
+        #prompt tokens this turn would have cost without the summary
+        full_tokens = len(loaded.tokenizer.encode(self._build_prompt_from_history(context, compressed=False)))
+        saved = full_tokens - prompt_tokens
+        self.compression_stats["last_tokens_saved"] = saved
+        self.compression_stats["tokens_saved_total"] += saved
+        logging.info(f"History compression saved {saved} prompt tokens this turn ({prompt_tokens} instead of {full_tokens})")
+
+    def _schedule_compression(self):
+        """
+        Starts a background pass that folds older turns into the running
+        summary once the history is over the configured token threshold.
+        It waits for the user to be idle and is cancelled by the next turn.
+        If the previous pass has not finished yet (usually one this turn
+        cancelled), it starts the new pass as it ends.
+        """
+        config = CONFIG.get("history_compression", {})
+        if not config.get("enabled", False) or self.worker:
+            return
+        with self._compression_lock:
+            if self._compression_thread is not None:
+                self._compression_pending = True
+                return
+            self._start_compression(config)
+
+    def _start_compression(self, config):
+        #caller holds _compression_lock
+        self._compression_pending = False
+        self._compression_cancel = threading.Event()
+        self._compression_thread = threading.Thread(target=self._run_compression,
+                                                    args=(config, self._compression_cancel, self._history_epoch),
+                                                    daemon=True)
+        self._compression_thread.start()
+
+    def _run_compression(self, config, cancel, epoch):
+        try:
+            self._compress_history(config, cancel, epoch)
+        finally:
+            with self._compression_lock:
+                self._compression_thread = None
+                if self._compression_pending:
+                    self._start_compression(config)
+
+    def _compress_history(self, config, cancel, epoch):
+        if cancel.wait(config.get("idle_delay_s", 1.0)):
+            return
+        try:
+            with self.registry.use("chat") as loaded:
+                if len(loaded.tokenizer.encode(self._build_prompt_from_history())) < config.get("threshold_tokens", 2000):
+                    return
+
+            history = list(self.base_history)
+            start = self.summarized_upto
+            end = len(history) - config.get("keep_recent_messages", 4)
+            if end <= start:
+                return
+            turns = "\n".join(f"{item['role']}: {item['content']}" for item in history[start:end])
+            instructions = (f"Summarize the conversation below in at most {config.get('summary_words', 150)} words. "
+                            "Keep facts, names, numbers, decisions and open questions; drop small talk.")
+            if self.history_summary:
+                turns = f"Earlier summary:\n{self.history_summary}\n\nConversation since then:\n{turns}"
+            prompt = (CONFIG["prompt_template"].format(role="system", content=instructions)
+                      + CONFIG["prompt_template"].format(role="user", content=turns)
+                      + CONFIG["assistant_start_token"])
 
-    def generate_full_response(self, prompt_string, max_tokens_gen=None):
+            summary = self.generate_full_response(prompt, max_tokens_gen=config.get("summary_max_tokens", 256),
+                                                  task=config.get("task", "chat"), cancel_event=cancel)
+        except Exception as e:
+            logging.error(f"History compression failed: {e}", exc_info=True)
+            return
+
+        #a new turn or a cleared chat makes this result stale
+        if cancel.is_set() or epoch != self._history_epoch or not summary or summary.startswith("[Error:"):
+            return
+        self.history_summary = summary
+        self.summarized_upto = end
+        if self.journal is not None:
+            self.journal.record_summary(summary, end)
+        self.compression_stats["runs"] += 1
+        self.compression_stats["messages_summarized"] = end - 1
+        logging.info(f"Compressed history messages {start}-{end - 1} into a {len(summary.split())}-word summary")
+
+    def generate_full_response(self, prompt_string, max_tokens_gen=None, speculative=None, stop_sequences=None,
+                               task="summarize", cancel_event=None, callback=None, do_sample=None):
         """
         Generates a full response from a given prompt string.
         Useful for summarization and deep search tasks.
+        task: routes to the model variant configured for it (summarize, answer, chat).
+        max_tokens_gen: new tokens to generate (defaults to max_new_tokens in config).
+        speculative: use prompt-lookup speculative decoding (defaults to config);
+        only applied for greedy decoding, where it gives the same output.
+        stop_sequences: strings that end the response (defaults to config), trimmed off.
+        cancel_event: threading.Event checked before every token; once set, generation
+        stops, the lock is released and the text so far is returned
+        (last_stop_reason is then "cancelled").
+        callback: optional callback(text) receiving the response as it is generated.
+        do_sample: overrides do_sample from config for this call only (False for greedy).
         """
-        if not self.model or not self.tokenizer:
+        if self.registry.variant_for(task) in self.registry.failed:
             logging.error("Model not loaded.")
             return "[Error: Model not loaded.]"
+        if _cancelled(cancel_event):
+            self.last_stop_reason = "cancelled"
+            return ""
 
-        with self.generating_response_lock:
+        gen_config = CONFIG["generation_params"]
+        if do_sample is not None:
+            gen_config = dict(gen_config, do_sample=do_sample)
+        spec_config = CONFIG.get("speculative", {})
+        if speculative is None:
+            speculative = spec_config.get("enabled", False)
+        if speculative and gen_config["do_sample"]:
+            logging.info("Speculative decoding skipped: only used when do_sample is false.")
+            speculative = False
+        if speculative and not _speculative_supported():
+            logging.warning("Speculative decoding needs a newer onnxruntime-genai, using normal decoding.")
+            speculative = False
+
+        with self.generating_response_lock, span("generate", task=task, speculative=speculative) as trace:
+            loaded = None
             try:
-                input_tokens = self.tokenizer.encode(prompt_string)
-                params = og.GeneratorParams(self.model)
-                params.input_ids = input_tokens
+                loaded = self.registry.pin(task)
+                input_tokens = loaded.tokenizer.encode(prompt_string)
+                trace.set(prompt_tokens=len(input_tokens))
+                max_new_tokens = max_tokens_gen or gen_config["max_new_tokens"]
+                stop_sequences = self._stop_sequences(stop_sequences)
+                matcher = StopSequenceMatcher(stop_sequences)
+                stream = _StreamingDecoder(loaded.tokenizer, matcher, callback)
 
-                gen_config = CONFIG["generation_params"]
-                max_len = len(input_tokens) + (max_tokens_gen or gen_config["max_length"])
-                params.set_search_options(
-                    max_length=max_len,
-                    temperature=gen_config["temperature"],
-                    top_p=gen_config["top_p"],
-                    do_sample=gen_config["do_sample"],
-                    repetition_penalty=gen_config["repetition_penalty"]
-                )
-
-                generator = og.Generator(self.model, params)
+                key = None
+                if self.generation_cache is not None and is_deterministic(gen_config):
+                    #speculative decoding is left out of the key: it gives the same text
+                    key = cache_key(loaded.model_id, input_tokens,
+                                    {k: v for k, v in gen_config.items() if k != "max_new_tokens"}
+                                    | {"max_new_tokens": max_new_tokens, "stop_sequences": stop_sequences,
+                                       "context_window": CONFIG.get("context_window", 4096)})
+                    cached = self.generation_cache.get(key)
+                    if cached is not None:
+                        trace.set(cache="hit")
+                        self.last_stop_reason = "cache"
+                        self.last_stop_sequence = None
+                        if callback and cached:
+                            callback(cached)
+                        return cached
+
+                peak = self._peak_rss()
+                if speculative:
+                    draft_length = spec_config.get("draft_length", 8)
+                    reason = self._generate_speculative(loaded, list(input_tokens), max_new_tokens, gen_config,
+                                                        spec_config.get("ngram_size", 3), draft_length,
+                                                        lambda output: peak.tick() or stream.update(output),
+                                                        cancel_event)
+                    trace.set(stop_reason=reason)
+                    self._record_memory(trace, peak, self._max_length(len(input_tokens),
+                                                                      max_new_tokens + draft_length + 1))
+                    self._record_stop(reason, matcher)
+                    return self._cache_result(key, loaded, reason, stream.finish().strip())
+
+                params = og.GeneratorParams(loaded.model)
+                max_length = self._max_length(len(input_tokens), max_new_tokens)
+                self._search_options(params, max_length, **self._sampling_options(gen_config),
+                                     **({"random_seed": gen_config["seed"]} if gen_config.get("seed") is not None else {}))
+
+                start = time.perf_counter()
+                first_token_at = None
+                generator = _start_generator(loaded.model, params, input_tokens)
                 response_tokens = []
+                reason = "eos"
 
-                while not generator.is_done() and len(response_tokens) < (max_tokens_gen or gen_config["max_length"]):
-                    generator.compute_logits()
-                    generator.generate_next_token()
+                while not generator.is_done():
+                    if _cancelled(cancel_event):
+                        reason = "cancelled"
+                        break
+                    if len(response_tokens) >= max_new_tokens:
+                        reason = "max_new_tokens"
+                        break
+                    _advance(generator)
                     new_token_id = generator.get_next_tokens()[0]
                     response_tokens.append(new_token_id)
+                    peak.tick()
+                    if first_token_at is None:
+                        first_token_at = time.perf_counter()
 
-                return self.tokenizer.decode(response_tokens).strip()
+                    if stream.update(response_tokens):
+                        reason = "stop_sequence"
+                        break
+
+                trace.set(**_phase_timings(start, first_token_at, len(response_tokens)), stop_reason=reason)
+                self._record_memory(trace, peak, max_length)
+                self._record_stop(reason, matcher)
+                return self._cache_result(key, loaded, reason, stream.finish().strip())
 
             except Exception as e:
                 logging.error(f"Error generating full response: {e}", exc_info=True)
                 return f"[Error: {e}]"
+            finally:
+                if loaded is not None:
+                    self.registry.unpin(loaded)
+
+    def _cache_result(self, key, loaded, reason, text):
+        #only complete generations are cached, never cancelled ones
+        if key is not None and reason != "cancelled":
+            self.generation_cache.put(key, loaded.name, loaded.model_id, text)
+        return text
+
+    def _generate_speculative(self, loaded, input_tokens, max_new_tokens, gen_config, ngram_size, draft_length, on_tokens,
+                              cancel_event=None):
+        """
+        Greedy decoding with prompt-lookup drafts: draft tokens copied from
+        earlier in the context are verified in one forward pass, the longest
+        matching prefix is kept and the KV cache is rewound past the rest.
+        on_tokens(output) is called after every pass and returns True to stop.
+
+        Return:
+            str: Stop reason
+        """
+        start = time.perf_counter()
+        penalty = gen_config["repetition_penalty"]
+
+        params = og.GeneratorParams(loaded.model)
+        max_length = self._max_length(len(input_tokens), max_new_tokens + draft_length + 1)
+        self._search_options(params, max_length, do_sample=False, repetition_penalty=penalty)
+        generator = _start_generator(loaded.model, params, input_tokens)
+        passes = 1
+
+        context = list(input_tokens)
+        seen = set(context)
+        prefill_logits = generator.get_output("logits")[0]
+        if len(prefill_logits) < len(input_tokens):
+            #runtime only exposes last-position logits, so drafts can't be verified
+            logging.warning("Per-position logits unavailable, speculative drafting disabled.")
+            draft_length = 0
+        next_token = _greedy_token(prefill_logits[-1], seen, penalty)
+        output = []
+        drafted = accepted = 0
+        reason = "eos"
+
+        while next_token not in loaded.eos_token_ids:
+            if _cancelled(cancel_event):
+                reason = "cancelled"
+                break
+            if len(output) >= max_new_tokens:
+                reason = "max_new_tokens"
+                break
+            #next_token plus its draft must fit in max_length (capped by the context window);
+            #once it is full, stop where greedy decoding would and return what we have
+            room = max_length - len(context) - 1
+            if room < 0 or generator.is_done():
+                reason = "max_length"
+                break
+            draft = _find_draft(context + [next_token], ngram_size,
+                                min(draft_length, max_new_tokens - len(output) - 1, room))
+            generator.append_tokens([next_token] + draft)
+            logits = generator.get_output("logits")[0][-(len(draft) + 1):]
+            passes += 1
+
+            output.append(next_token)
+            context.append(next_token)
+            seen.add(next_token)
+
+            #position i predicts the token after draft[i-1]; keep drafts the model agrees with
+            n_ok = 0
+            for i, token in enumerate(draft):
+                if _greedy_token(logits[i], seen, penalty) != token or token in loaded.eos_token_ids:
+                    break
+                output.append(token)
+                context.append(token)
+                seen.add(token)
+                n_ok += 1
+            drafted += len(draft)
+            accepted += n_ok
+
+            next_token = _greedy_token(logits[n_ok], seen, penalty)
+            if n_ok < len(draft):
+                generator.rewind_to(len(context))
+            if on_tokens(output[:max_new_tokens]):
+                reason = "stop_sequence"
+                break
+
+        elapsed = time.perf_counter() - start
+        stats = self.speculative_stats
+        stats["calls"] += 1
+        stats["tokens"] += len(output)
+        stats["drafted"] += drafted
+        stats["accepted"] += accepted
+        stats["forward_passes"] += passes
+        stats["seconds"] += elapsed
+        logging.info("Speculative: %d tokens in %d passes, acceptance %.1f%%, %.1f tok/s",
+                     len(output), passes, 100 * accepted / drafted if drafted else 0.0,
+                     len(output) / elapsed if elapsed else 0.0)
+        return reason
 
     def stop_response(self):
         #Stopping the current response generation
@@ -175,8 +1158,25 @@ class ModelHandler:
             self.base_history = [self.base_history[0]]
         else:
             self.base_history = []
+        self._compression_cancel.set()
+        self._prefill_cancel.set()
+        self._history_epoch += 1
+        #runs on the Tk thread: a prefill busy with a forward pass holds _prefill_lock,
+        #so it is not waited for; it drops its cache itself when it sees the new epoch
+        if self._prefill_lock.acquire(blocking=False):
+            try:
+                self._set_prefill(None)
+            finally:
+                self._prefill_lock.release()
+        self.history_summary = ""
+        self.summarized_upto = len(self.base_history)
+        self._prompt_start = len(self.base_history)
+        self._journaled = len(self.base_history)
+        if self.journal is not None:
+            self.journal.new_session()
         logging.info("Chat history cleared.")
 
     def add_to_history(self, role, content):
         #Adding the message to the chathistory
-        self.base_history.append({"role": "assistant", "content": content})
\ No newline at end of file
+        self.base_history.append({"role": role, "content": content})
+        self._journal_history()
\ No newline at end of file
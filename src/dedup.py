@@ -0,0 +1,122 @@
+import random
+import logging
+import zlib
+
+#local imports
+from utils import setup_logging
+from relevance import tokenize
+from store import page_name
+
+setup_logging()
+
+#mersenne prime used for the universal hash family
+_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+def shingles(text, size=5):
+    #set of hashed word k-shingles (crc32 keeps hashes stable across runs)
+    words = tokenize(text)
+    if not words:
+        return set()
+    if len(words) <= size:
+        return {zlib.crc32(" ".join(words).encode("utf-8"))}
+    return {
+        zlib.crc32(" ".join(words[i:i + size]).encode("utf-8"))
+        for i in range(len(words) - size + 1)
+    }
+
+
+class MinHasher:
+    """
+    MinHash signatures with LSH banding for near-duplicate lookup.
+    num_perm must be divisible by bands; rows per band = num_perm // bands.
+    """
+    def __init__(self, num_perm=64, bands=16, seed=1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        rng = random.Random(seed)
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.params = [(rng.randint(1, _PRIME - 1), rng.randint(0, _PRIME - 1)) for _ in range(num_perm)]
+
+    def signature(self, shingle_set):
+        if not shingle_set:
+            return None
+        return [min((a * h + b) % _PRIME & _MAX_HASH for h in shingle_set) for a, b in self.params]
+
+    def band_keys(self, signature):
+        return [(band, tuple(signature[band * self.rows:(band + 1) * self.rows])) for band in range(self.bands)]
+
+    @staticmethod
+    def similarity(sig_a, sig_b):
+        #estimated jaccard similarity
+        return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / len(sig_a)
+
+
+def find_near_duplicates(texts, threshold=0.8, shingle_size=5, num_perm=64, bands=16):
+    """
+    Find texts that are near-duplicates of an earlier text in the list.
+    Earlier entries win, so pass texts in priority (e.g. search rank) order.
+
+    Args:
+        texts (list): Text strings to compare
+        threshold (float): Minimum estimated Jaccard similarity to count as duplicate
+
+    Return:
+        list: (duplicate_index, kept_index, similarity) tuples
+    """
+    hasher = MinHasher(num_perm=num_perm, bands=bands)
+    buckets = {}
+    signatures = {}
+    duplicates = []
+
+    for idx, text in enumerate(texts):
+        sig = hasher.signature(shingles(text, shingle_size))
+        if sig is None:
+            continue
+        keys = hasher.band_keys(sig)
+
+        best = None
+        candidates = {c for key in keys for c in buckets.get(key, ())}
+        for cand in sorted(candidates):
+            sim = MinHasher.similarity(sig, signatures[cand])
+            if sim >= threshold and (best is None or sim > best[1]):
+                best = (cand, sim)
+
+        if best:
+            duplicates.append((idx, best[0], best[1]))
+            continue
+
+        #only kept texts go into the index so chains collapse onto the original
+        signatures[idx] = sig
+        for key in keys:
+            buckets.setdefault(key, []).append(idx)
+
+    if duplicates:
+        logging.info("Found %d near-duplicates among %d texts", len(duplicates), len(texts))
+    return duplicates
+
+
+def remove_duplicate_pages(store, attempt_id, threshold=0.8, shingle_size=5, num_perm=64, bands=16):
+    """
+    Delete stored pages of an attempt that near-duplicate a higher-ranked one
+    and record what was removed in the store's duplicates table.
+
+    Return:
+        list: Names of the pages that were removed
+    """
+    pages = store.get_pages(attempt_id)
+    duplicates = find_near_duplicates([p["content"] for p in pages], threshold, shingle_size, num_perm, bands)
+    if not duplicates:
+        return []
+
+    labels = [f"{page_name(p)} [{p['url']}]" for p in pages]
+    store.record_duplicates(attempt_id, "page", [(labels[dup], labels[kept], sim) for dup, kept, sim in duplicates])
+
+    removed = []
+    for dup, kept, sim in duplicates:
+        store.remove_page(pages[dup]["id"])
+        removed.append(page_name(pages[dup]))
+        logging.info("Removed %s (%.2f similar to %s)", labels[dup], sim, labels[kept])
+    return removed
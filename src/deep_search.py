@@ -1,87 +1,27 @@
-import os
+import json
+import time
 import logging
-from pathlib import Path
 
 #local imports
-from utils import chunk_text_if_needed
+from utils import split_into_chunks, load_config, setup_logging
+from relevance import select_relevant_chunks, estimate_tokens
+from dedup import find_near_duplicates
+from store import get_store, page_name, combine_summaries, format_answers
+from workers import generate_many
+from tracing import span, traced
+from memory_governor import monitored
 
-logging.basicConfig(level=logging.INFO, filename="deep_search.log", filemode="w",
-                    format="%(asctime)s - %(levelname)s - %(message)s")
+CONFIG = load_config()
 
-def summarize_search_attempt(model_handler, base_dir="web_searches", summary_dir="model_search_summary"):
-    """
-    Summarizes all search result documents in the latest web search folder.
-    
-    Args:
-        model_handler: Instance of ModelHandler for generating summaries
-        base_dir: Base directory containing search attempts
-        summary_dir: Directory where summaries will be saved
-    
-    Return:
-        str: Path to the folder containing generated summaries
-    """
-    logging.info("Finding latest search attempt...")
-    
-    if not os.path.exists(base_dir):
-        raise FileNotFoundError(f"Base directory not found: {base_dir}")
-        
-    folders = [f for f in os.listdir(base_dir) if f.startswith("search_attempt_")]
-    if not folders:
-        raise FileNotFoundError(f"No search attempts found in '{base_dir}'")
-    
-    try:
-        #sort numeric suffix
-        folders.sort(key=lambda x: int(x.split("_")[-1]))
-        latest_folder = folders[-1]
-    except (ValueError, IndexError):
-        #fallback to alphabetical sorting
-        folders.sort()
-        latest_folder = folders[-1]
-
-    latest_path = os.path.join(base_dir, latest_folder)
-    summary_folder_name = f"{latest_folder}_summary"
-    summary_folder_path = os.path.join(summary_dir, summary_folder_name)
-    
-    os.makedirs(summary_folder_path, exist_ok=True)
-    
-    logging.info(f"Reading from: {latest_path}")
-    logging.info(f"Saving summaries to: {summary_folder_path}")
-
-    for filename in sorted(os.listdir(latest_path)):
-        if not filename.endswith(".txt") or not filename.startswith("search_data_"):
-            continue
-            
-        filepath = os.path.join(latest_path, filename)
-        logging.info(f"Processing: {filename}")
-        
-        try:
-            with open(filepath, "r", encoding="utf-8") as f:
-                content = f.read()
-                
-            lines = content.strip().split('\n')
-            article_title = lines[0] if lines else "Unknown Title"
-            article_url = lines[1] if len(lines) > 1 else "Unknown URL"
-            
-            if len(lines) > 2:
-                article_content = '\n'.join(lines[2:]).strip()
-            else:
-                article_content = content.strip()
-                
-            if not article_content:
-                logging.warning(f"Content for '{filename}' is empty after stripping metadata. Skipping.")
-                continue
+setup_logging()
 
-            chunks, was_split = chunk_text_if_needed(article_content, filename, latest_path)
-            
-            final_summary = ""
-            valid_summaries = 0
-            
-            for idx, chunk_text in enumerate(chunks):
-                prompt = f"""<|system|>
+def build_summary_prompt(title, url, chunk_text):
+    #Phi-3 prompt for summarizing one document chunk
+    return f"""<|system|>
 You are an AI assistant that summarizes technical documents concisely. Aim for around 100-150 words per summary.
 Focus on the key information and main points of the provided text.
-Input document title: {article_title}
-Input document URL: {article_url}
+Input document title: {title}
+Input document URL: {url}
 <|end|>
 <|user|>
 Summarize this document chunk:
@@ -91,94 +31,10 @@ Summarize this document chunk:
 <|end|>
 <|assistant|>
 """
-                logging.info(f"Summarizing {'chunk' if was_split else 'full text'} {idx+1}/{len(chunks)} for '{filename}'...")
-                
-                try:
-                    response = model_handler.generate_full_response(prompt, max_tokens_gen=200)
-                    
-                    if response and not response.startswith("[Error:"):
-                        valid_summaries += 1
-                        final_summary += f"[{'Chunk' if was_split else 'Document'} {idx+1} Summary for '{filename}']:\n{response.strip()}\n\n"
-                        logging.info(f"Summary received for chunk {idx+1}.")
-                    elif response.startswith("[Error:"):
-                        logging.error(f"Error from model for {filename}, chunk {idx+1}: {response}")
-                    else:
-                        logging.warning(f"Empty or invalid response from model for {filename}, chunk {idx+1}")
-                        
-                except Exception as e:
-                    logging.exception(f"Error calling model_handler.generate_full_response: {e}")
-                    continue
-                    
-            if valid_summaries == 0:
-                logging.warning(f"No valid summaries generated for {filename}. Skipping file.")
-                continue
-                
-            summary_filename = filename.replace(".txt", "_summary.txt")
-            summary_path = os.path.join(summary_folder_path, summary_filename)
-            
-            with open(summary_path, "w", encoding="utf-8") as f:
-                f.write(final_summary.strip())
-                
-            logging.info(f"Saved combined summary: {summary_filename} to {summary_folder_path}")
-            
-        except Exception as e:
-            logging.exception(f"Error processing file {filename}: {e}")
-            continue
-
-    logging.info("All processable files summarized and saved.")
-    return summary_folder_path
 
-
-def answer_from_summaries(model_handler, summary_base_dir="model_search_summary"):
-    """
-    Generates answers based on individual summaries from multiple documents.
-    
-    Args:
-        model_handler: Instance of ModelHandler for answering questions
-        summary_base_dir: Directory containing summary folders
-        
-    Return:
-        str: Combined answers from all summaries
-    """
-    logging.info("Finding latest summary folder...")
-    
-    if not os.path.exists(summary_base_dir):
-        raise FileNotFoundError(f"Summary directory not found: {summary_base_dir}")
-        
-    folders = [f for f in os.listdir(summary_base_dir) if f.endswith("_summary")]
-    
-    if not folders:
-        raise FileNotFoundError(f"No summary folders found in '{summary_base_dir}'")
-    
-    try:
-        folders.sort(key=lambda x: int(x.split("_")[2]))  #search_attempt_NUMBER_summary
-    except (ValueError, IndexError):
-        #fallback to alphabetical sorting
-        folders.sort()
-        
-    latest_summary_folder = folders[-1]
-    latest_summary_path = os.path.join(summary_base_dir, latest_summary_folder)
-    
-    logging.info(f"Reading summaries from: {latest_summary_path}")
-    
-    all_answers_text = ""
-    
-    for filename in sorted(os.listdir(latest_summary_path)):
-        if not filename.endswith("_summary.txt"):
-            continue
-            
-        filepath = os.path.join(latest_summary_path, filename)
-        logging.info(f"Loading summary file: {filename}")
-        
-        try:
-            with open(filepath, "r", encoding="utf-8") as f:
-                summary_content = f.read().strip()
-                
-            if not summary_content:
-                logging.warning(f"Summary file '{filename}' is empty. Skipping.")
-                continue
-                
-            prompt = f"""<|system|>
+def build_answer_prompt(summary_content):
+    #Phi-3 prompt for answering from one document's combined summary
+    return f"""<|system|>
 You are an AI assistant. Your task is to analyze the provided document summary and answer the questions clearly and concisely.
 <|end|>
 <|user|>
@@ -194,40 +50,318 @@ Provide your answer for these three points.
 <|end|>
 <|assistant|>
 """
-            logging.info(f"Generating answer for {filename}...")
-            
-            try:
-                response = model_handler.generate_full_response(prompt, max_tokens_gen=350)
-                
-                if response and not response.startswith("[Error:"):
-                    answer_block = f"Answer based on '{filename}':\n{response.strip()}\n{'-'*60}\n"
-                    all_answers_text += answer_block
-                    logging.info(f"Answer generated for '{filename}'")
-                elif response.startswith("[Error:"):
-                    logging.error(f"Error from model for '{filename}': {response}")
-                else:
-                    logging.warning(f"Empty or invalid response for '{filename}'")
-                    
-            except Exception as e:
-                logging.exception(f"Error calling model_handler.generate_full_response for '{filename}': {e}")
+
+class _ProgressReporter:
+    """
+    Sends deep-search progress to a text callback: a header line per item with
+    an ETA from the token rate measured so far, then the item's tokens as they
+    are generated (or the whole response if it could not be streamed, e.g.
+    from a worker process).
+    """
+    def __init__(self, callback, total):
+        self.callback = callback
+        self.total = total
+        self.start = time.perf_counter()
+        self.done = 0
+        self.tokens = 0
+        self.streamed = False
+
+    def begin(self, label):
+        if not self.callback:
+            return
+        self.streamed = False
+        self.callback(f"\n[{label} | item {self.done + 1}/{self.total}{self._eta()}]\n")
+
+    def on_token(self, text):
+        self.streamed = True
+        self.callback(text)
+
+    def end(self, response):
+        self.done += 1
+        self.tokens += estimate_tokens(response or "")
+        if self.callback:
+            self.callback(("" if self.streamed else (response or "")) + "\n")
+
+    def _eta(self):
+        elapsed = time.perf_counter() - self.start
+        if not self.done or not self.tokens or not elapsed:
+            return ""
+        rate = self.tokens / elapsed
+        remaining = (self.total - self.done) * (self.tokens / self.done) / rate
+        return f" | {rate:.1f} tok/s, ETA {int(remaining // 60)}m {int(remaining % 60):02d}s"
+
+
+def _resolve_attempt(store, attempt_id):
+    #latest attempt unless one is given
+    if attempt_id is None:
+        attempt_id = store.latest_attempt_id()
+    if attempt_id is None or store.get_attempt(attempt_id) is None:
+        raise FileNotFoundError("No search attempts found in the search store")
+    return attempt_id
+
+def _select_chunks(store, attempt_id, query):
+    """
+    Splits the attempt's pages into chunks, drops near-duplicates and ranks
+    the rest against the query.
+
+    Return:
+        list: (page, chunks, chosen chunk indexes) for pages with chosen chunks
+    """
+    #first pass: split every stored page into chunks
+    documents = []
+    for page in store.get_pages(attempt_id):
+        article_content = page["content"].strip()
+        if not article_content:
+            logging.warning(f"Content for '{page_name(page)}' is empty. Skipping.")
+            continue
+
+        chunks = split_into_chunks(article_content)
+        if len(chunks) > 1:
+            logging.info(f"Split {page_name(page)} into {len(chunks)} chunks")
+        with span("store.set_chunks", chunks=len(chunks)):
+            store.set_chunks(page["id"], chunks)
+        #the chunks are all that is needed of the page text from here on
+        page = {key: page[key] for key in ("id", "position", "title", "url")}
+        documents.append((page, chunks))
+
+    chunk_refs = [(doc_idx, idx) for doc_idx, (_, chunks) in enumerate(documents) for idx in range(len(chunks))]
+
+    #drop near-duplicate chunks (syndicated copies, repeated boilerplate) before ranking
+    dedup_config = CONFIG.get("dedup", {})
+    with span("dedup_chunks", chunks=len(chunk_refs)):
+        duplicates = find_near_duplicates(
+            [documents[d][1][i] for d, i in chunk_refs],
+            threshold=dedup_config.get("similarity_threshold", 0.8),
+            shingle_size=dedup_config.get("shingle_size", 5)
+        )
+    if duplicates:
+        labels = [f"{page_name(documents[d][0])} chunk {i+1}" for d, i in chunk_refs]
+        store.record_duplicates(attempt_id, "chunk", [(labels[dup], labels[kept], sim) for dup, kept, sim in duplicates])
+        duplicate_idx = {dup for dup, _, _ in duplicates}
+        chunk_refs = [ref for i, ref in enumerate(chunk_refs) if i not in duplicate_idx]
+        logging.info(f"Skipped {len(duplicates)} near-duplicate chunk(s)")
+
+    #rank all chunks of the attempt against the query, keep only the best ones
+    deep_config = CONFIG.get("deep_search", {})
+    with span("rank_chunks", chunks=len(chunk_refs)):
+        selected = select_relevant_chunks(
+            query,
+            [documents[d][1][i] for d, i in chunk_refs],
+            top_k=deep_config.get("relevance_top_k", 8),
+            token_budget=deep_config.get("relevance_token_budget", 6000)
+        )
+    selected_refs = {chunk_refs[i] for i in selected}
+    logging.info(f"Summarizing {len(selected_refs)} of {len(chunk_refs)} chunks relevant to '{query}'")
+
+    documents_selected = [(page, chunks, [idx for idx in range(len(chunks)) if (doc_idx, idx) in selected_refs])
+                          for doc_idx, (page, chunks) in enumerate(documents)]
+    for page, chunks, chosen in documents_selected:
+        if not chosen:
+            logging.info(f"No query-relevant chunks in {page_name(page)}.txt. Skipping.")
+    return [doc for doc in documents_selected if doc[2]]
+
+def _resume_selection(store, attempt_id, selection):
+    #the chunks chosen when the run started, read back from the store
+    pages = {page["id"]: page for page in store.get_pages(attempt_id)}
+    chosen = {}
+    for page_id, idx in selection:
+        if page_id in pages:
+            chosen.setdefault(page_id, []).append(idx)
+    return [({key: pages[page_id][key] for key in ("id", "position", "title", "url")}, store.get_chunks(page_id), indexes)
+            for page_id, indexes in sorted(chosen.items(), key=lambda item: pages[item[0]]["position"])]
+
+
+@traced("summarize_search_attempt")
+@monitored("summarizing")
+def summarize_search_attempt(model_handler, query=None, attempt_id=None, store=None, cancel_event=None,
+                             progress=None):
+    """
+    Summarizes the query-relevant chunks of the documents in a search attempt.
+    Chunks are ranked with BM25 against the query and only the top ones within the
+    configured token budget are sent to the model (or the model worker pool).
+    The chosen chunks are recorded in the store when the run starts and each
+    summary is committed as it completes, so a run that was cancelled or
+    crashed resumes with the chunks still missing (deep_search.resume).
+
+    Args:
+        model_handler: Instance of ModelHandler for generating summaries
+        query: Original search query (taken from the attempt if None)
+        attempt_id: Search attempt to summarize (latest if None)
+        store: SearchStore holding the attempt (shared store if None)
+        cancel_event: threading.Event that stops the run within one token;
+            summaries finished before it was set are kept
+        progress: Optional callback(text) receiving per-chunk progress lines and
+            the summary tokens as they are generated
+
+    Return:
+        int: Id of the summarized attempt
+    """
+    store = store or get_store()
+    attempt_id = _resolve_attempt(store, attempt_id)
+    if query is None:
+        query = store.get_attempt(attempt_id)["query"]
+
+    logging.info(f"Summarizing search attempt {attempt_id} for '{query}'")
+
+    #a run that was interrupted (cancelled, closed, crashed) continues where it stopped
+    run = store.get_deep_search(attempt_id) if CONFIG.get("deep_search", {}).get("resume", True) else None
+    if run is not None and run["stage"] != "summarizing":
+        logging.info(f"Attempt {attempt_id} is already summarized")
+        return attempt_id
+    if run is not None:
+        logging.info(f"Resuming attempt {attempt_id}: {run['chunks_done']} of {len(run['selection'])} chunks "
+                     f"already summarized")
+        documents_selected = _resume_selection(store, attempt_id, run["selection"])
+        finished = run["summarized"]
+    else:
+        documents_selected = _select_chunks(store, attempt_id, query)
+        store.start_deep_search(attempt_id, [(page["id"], idx) for page, _, chosen in documents_selected
+                                             for idx in chosen])
+        finished = set()
+
+    #build the prompts for the selected chunks that have no summary yet
+    jobs = []
+    for doc_no, (page, chunks, chosen) in enumerate(documents_selected):
+        for chunk_no, idx in enumerate(chosen):
+            if (page["id"], idx) in finished:
                 continue
-                
-        except Exception as e:
-            logging.exception(f"Error reading summary file {filename}: {e}")
+            label = (f"Summarizing document {doc_no+1}/{len(documents_selected)} '{page['title']}', "
+                     f"chunk {chunk_no+1}/{len(chosen)}")
+            jobs.append((page, idx, len(chunks), label, build_summary_prompt(page['title'], page['url'], chunks[idx])))
+    #only the selected chunks (inside the prompts) stay in memory while the model runs
+    del documents_selected
+
+    #summarize, fanned out over model workers when configured; results arrive in order;
+    #every summary is committed as it arrives, so it survives a crash
+    valid_summaries = {}
+    reporter = _ProgressReporter(progress, len(jobs))
+    responses = generate_many(model_handler, [prompt for *_, prompt in jobs], max_tokens_gen=200, task="summarize",
+                              cancel_event=cancel_event, on_token=reporter.on_token if progress else None)
+    if jobs:
+        reporter.begin(jobs[0][3])
+    cancelled = False
+    for done, ((page, idx, chunk_count, _, _), response) in enumerate(zip(jobs, responses)):
+        filename = f"{page_name(page)}.txt"
+        if cancel_event is not None and cancel_event.is_set():
+            #a response finishing after cancellation may be cut short, so it is not kept
+            logging.info(f"Summarization cancelled after {done} of {len(jobs)} chunks")
+            responses.close()
+            cancelled = True
+            break
+        reporter.end(response)
+        if done + 1 < len(jobs):
+            reporter.begin(jobs[done + 1][3])
+        valid_summaries.setdefault(filename, 0)
+        logging.info(f"Summary for {'chunk' if chunk_count > 1 else 'full text'} {idx+1}/{chunk_count} of '{filename}'...")
+
+        if response and not response.startswith("[Error:"):
+            valid_summaries[filename] += 1
+            with span("store.add_summary"):
+                store.add_summary(page["id"], idx, response.strip())
+            logging.info(f"Summary received for chunk {idx+1}.")
+        elif response.startswith("[Error:"):
+            logging.error(f"Error from model for {filename}, chunk {idx+1}: {response}")
+        else:
+            logging.warning(f"Empty or invalid response from model for {filename}, chunk {idx+1}")
+
+    for filename, count in valid_summaries.items():
+        if count == 0:
+            logging.warning(f"No valid summaries generated for {filename}.")
+    if not cancelled:
+        store.set_deep_search_stage(attempt_id, "answering")
+
+    if CONFIG.get("storage", {}).get("export_folders", False):
+        store.export_attempt(attempt_id, CONFIG["search_result_dir"], CONFIG["summary_dir"])
+
+    logging.info("All processable documents summarized and saved.")
+    return attempt_id
+
+
+@traced("answer_from_summaries")
+@monitored("answering")
+def answer_from_summaries(model_handler, attempt_id=None, store=None, cancel_event=None, progress=None):
+    """
+    Generates answers based on individual summaries from multiple documents.
+
+    Args:
+        model_handler: Instance of ModelHandler for answering questions
+        attempt_id: Search attempt whose summaries are used (latest if None)
+        store: SearchStore holding the attempt (shared store if None)
+        cancel_event: threading.Event that stops the run within one token;
+            answers finished before it was set are kept and returned
+        progress: Optional callback(text) receiving per-document progress lines
+            and the answer tokens as they are generated
+
+    Like summarizing, a resumed run only answers the documents that have no
+    answer yet, and a finished one returns the stored answers. Stored
+    answers are passed to progress first, so the caller shows every answer.
+
+    Return:
+        str: Combined answers from all summaries
+    """
+    store = store or get_store()
+    attempt_id = _resolve_attempt(store, attempt_id)
+    run = store.get_deep_search(attempt_id) if CONFIG.get("deep_search", {}).get("resume", True) else None
+    summary_rows = store.get_summaries(attempt_id)
+    page_ids = {page_name(row): row["page_id"] for row in summary_rows}
+    answered = set()
+    if run is not None:
+        stored = store.get_answers(attempt_id)
+        answered = {row["page_id"] for row in stored}
+        if answered:
+            logging.info(f"Resuming answers for attempt {attempt_id}: {len(answered)} already done")
+            #answers from before the interruption were streamed to an earlier session, not this one
+            if progress:
+                progress(f"Answers already done ({len(answered)}):\n{format_answers(stored)}\n")
+
+    logging.info(f"Reading summaries of attempt {attempt_id}")
+
+    jobs = []
+    for name, summary_content in combine_summaries(summary_rows):
+        filename = f"{name}_summary.txt"
+        if not summary_content:
+            logging.warning(f"Summary '{filename}' is empty. Skipping.")
             continue
+        if page_ids[name] in answered:
+            continue
+        jobs.append((name, build_answer_prompt(summary_content)))
+
+    logging.info(f"Generating answers for {len(jobs)} summaries...")
+    labels = [f"Answering from document {i+1}/{len(jobs)} '{name}'" for i, (name, _) in enumerate(jobs)]
+    reporter = _ProgressReporter(progress, len(jobs))
+    responses = generate_many(model_handler, [prompt for _, prompt in jobs], max_tokens_gen=350, task="answer",
+                              cancel_event=cancel_event, on_token=reporter.on_token if progress else None)
+    if jobs:
+        reporter.begin(labels[0])
+    cancelled = False
+    for done, ((name, _), response) in enumerate(zip(jobs, responses)):
+        filename = f"{name}_summary.txt"
+        if cancel_event is not None and cancel_event.is_set():
+            logging.info(f"Answering cancelled after {done} of {len(jobs)} summaries")
+            responses.close()
+            cancelled = True
+            break
+        reporter.end(response)
+        if done + 1 < len(jobs):
+            reporter.begin(labels[done + 1])
+        if response and not response.startswith("[Error:"):
+            store.add_answer(page_ids[name], response.strip())
+            logging.info(f"Answer generated for '{filename}'")
+        elif response.startswith("[Error:"):
+            logging.error(f"Error from model for '{filename}': {response}")
+        else:
+            logging.warning(f"Empty or invalid response for '{filename}'")
 
-    if not all_answers_text.strip():
+    if not cancelled and run is not None:
+        store.set_deep_search_stage(attempt_id, "done")
+
+    all_answers_text = format_answers(store.get_answers(attempt_id))
+    if not all_answers_text:
         logging.error("No valid answers could be generated from any summaries.")
         return ""
 
-    output_filename = "all_deep_search_answers.txt"
-    output_path = os.path.join(latest_summary_path, output_filename)
-    
-    try:
-        with open(output_path, "w", encoding="utf-8") as f:
-            f.write(all_answers_text.strip())
-        logging.info(f"All deep search answers saved to: {output_path}")
-    except Exception as e:
-        logging.error(f"Failed to save deep search answers: {e}")
-
-    return all_answers_text.strip()
\ No newline at end of file
+    if CONFIG.get("storage", {}).get("export_folders", False):
+        store.export_attempt(attempt_id, CONFIG["search_result_dir"], CONFIG["summary_dir"])
+
+    logging.info(f"All deep search answers saved for attempt {attempt_id}")
+    return all_answers_text
@@ -0,0 +1,208 @@
+import json
+import time
+import random
+import logging
+import threading
+from html import escape
+from urllib.parse import urlparse, parse_qs, quote
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+#stand-in for Bing and the pages it links to, for offline search benchmarks
+
+_WORDS = (
+    "model data system network energy market research policy design water city health learning "
+    "memory process signal storage language history science power travel cost report value "
+    "change growth method result study team project source quality security software hardware "
+    "battery engine climate price service record review guide average update standard feature"
+).split()
+
+#where each engine style answers queries
+SERP_PATHS = {"bing": "/search", "duckduckgo": "/html/", "mojeek": "/search"}
+
+#served for JS-only pages: readable text appears only after the script runs
+_JS_ONLY_PAGE = """<html><head><title>{title}</title></head><body><div id="app"></div>
+<script>document.getElementById("app").innerText = {text};</script></body></html>"""
+
+
+def _paragraphs(rng, size_bytes):
+    #synthetic article text of roughly size_bytes
+    paragraphs = []
+    total = 0
+    while total < size_bytes:
+        sentences = []
+        for _ in range(rng.randint(3, 7)):
+            words = rng.choices(_WORDS, k=rng.randint(8, 20))
+            sentences.append(" ".join(words).capitalize() + ".")
+        paragraph = " ".join(sentences)
+        paragraphs.append(paragraph)
+        total += len(paragraph)
+    return paragraphs
+
+
+class FakePage:
+    #one page of the corpus and how it misbehaves
+    def __init__(self, index, title, text, latency_s, fails, js_only, bad_domain):
+        self.index = index
+        self.title = title
+        self.text = text
+        self.latency_s = latency_s
+        self.fails = fails
+        self.js_only = js_only
+        self.bad_domain = bad_domain
+
+    @property
+    def path(self):
+        #the blacklist matches substrings, so this path sends the link down the Playwright route
+        return f"/www.reddit.com/page/{self.index}" if self.bad_domain else f"/page/{self.index}"
+
+    def html(self):
+        if self.js_only:
+            return _JS_ONLY_PAGE.format(title=escape(self.title), text=json.dumps(" ".join(self.text)))
+        body = "\n".join(f"<p>{escape(p)}</p>" for p in self.text)
+        return (f"<html><head><title>{escape(self.title)}</title></head><body>"
+                f"<nav><a href='/'>Home</a> <a href='/about'>About</a></nav>"
+                f"<article><h1>{escape(self.title)}</h1>\n{body}</article>"
+                f"<footer>Copyright fake web</footer></body></html>")
+
+
+def build_corpus(pages=15, latency_ms=100, jitter_ms=50, size_kb=20, failure_rate=0.1,
+                 js_only_rate=0.1, bad_domain_rate=0.1, seed=0):
+    """
+    Builds a reproducible corpus of synthetic pages.
+
+    Args:
+        pages (int): Number of pages (the SERP lists them all, in order)
+        latency_ms (int): Mean response delay per page
+        jitter_ms (int): Delay is drawn uniformly from latency_ms +/- jitter_ms
+        size_kb (int): Approximate article size
+        failure_rate (float): Share of pages answering 500
+        js_only_rate (float): Share of pages whose text is only rendered by JavaScript
+        bad_domain_rate (float): Share of links that look like blacklisted domains
+        seed (int): Random seed
+
+    Return:
+        list: FakePage objects
+    """
+    rng = random.Random(seed)
+    corpus = []
+    for index in range(1, pages + 1):
+        title = " ".join(rng.choices(_WORDS, k=4)).title()
+        corpus.append(FakePage(
+            index=index,
+            title=title,
+            text=_paragraphs(rng, size_kb * 1024),
+            latency_s=max(0.0, latency_ms + rng.uniform(-jitter_ms, jitter_ms)) / 1000,
+            fails=rng.random() < failure_rate,
+            js_only=rng.random() < js_only_rate,
+            bad_domain=rng.random() < bad_domain_rate
+        ))
+    return corpus
+
+
+class FakeWeb:
+    """
+    Local HTTP server with a search results page in one engine's markup
+    (serp_style: bing, duckduckgo or mojeek) and the corpus pages it links
+    to. Each request is served on its own thread, so page delays overlap the
+    way real sites do. Several servers can stand in for several engines:
+    give the extra ones page_base_url so they all link to the same pages.
+
+        with FakeWeb(build_corpus(pages=15)) as web:
+            CONFIG["search"]["engines"]["bing"]["base_url"] = web.base_url
+            ...
+    """
+    def __init__(self, corpus, host="127.0.0.1", port=0, serp_latency_ms=50, serp_style="bing", page_base_url=None,
+                 seed=0):
+        self.corpus = {page.path: page for page in corpus}
+        self.serp_latency_s = serp_latency_ms / 1000
+        self.serp_style = serp_style
+        self.page_base_url = page_base_url
+        #engines disagree on order; the first one keeps the corpus order
+        self.serp_order = list(self.corpus.values())
+        if page_base_url is not None:
+            random.Random(f"{serp_style}:{seed}").shuffle(self.serp_order)
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def serp_html(self, query):
+        pages_at = self.page_base_url or self.base_url
+        items = []
+        for page in self.serp_order:
+            url, title, snippet = f"{pages_at}{page.path}", escape(page.title), escape(page.text[0][:160])
+            if self.serp_style == "duckduckgo":
+                items.append(f"<div class='result'><h2 class='result__title'><a class='result__a' "
+                             f"href='//duckduckgo.com/l/?uddg={quote(url, safe='')}&amp;rut=x'>{title}</a></h2>"
+                             f"<a class='result__snippet'>{snippet}</a></div>")
+            elif self.serp_style == "mojeek":
+                items.append(f"<li><a class='title' href='{url}'>{title}</a><p class='s'>{snippet}</p></li>")
+            else:
+                items.append(f"<li class='b_algo'><h2><a href='{url}'>{title}</a></h2><p>{snippet}</p></li>")
+        results = "\n".join(items)
+        if self.serp_style == "mojeek":
+            results = f"<ul class='results-standard'>{results}</ul>"
+        elif self.serp_style == "bing":
+            results = f"<ol id='b_results'>{results}</ol>"
+        return (f"<html><head><title>{escape(query)} - Search</title></head><body>"
+                f"{results}</body></html>")
+
+    def _handler_class(self):
+        web = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with web._lock:
+                    web.requests += 1
+                url = urlparse(self.path)
+                if url.path == SERP_PATHS[web.serp_style]:
+                    time.sleep(web.serp_latency_s)
+                    query = parse_qs(url.query).get("q", [""])[0]
+                    return self._send(200, web.serp_html(query))
+                page = web.corpus.get(url.path)
+                if page is None:
+                    return self._send(404, "<html><body>Not found</body></html>")
+                time.sleep(page.latency_s)
+                if page.fails:
+                    return self._send(500, "<html><body>Internal error</body></html>")
+                self._send(200, page.html())
+
+            def _send(self, status, html):
+                body = html.encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                try:
+                    self.wfile.write(body)
+                except (BrokenPipeError, ConnectionResetError):
+                    #the client gave up (a cancelled slower engine, a timed-out fetch)
+                    pass
+
+            def log_message(self, format, *args):
+                #keeps the access log out of the benchmark output
+                logging.debug("fake web: " + format % args)
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-web", daemon=True)
+        self._thread.start()
+        logging.info(f"Fake web serving {len(self.corpus)} pages at {self.base_url}")
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,146 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+#local imports
+from utils import load_config, setup_logging
+
+CONFIG = load_config()
+
+setup_logging()
+
+#disk tier lives next to the store tables
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS generation_cache (
+    key TEXT PRIMARY KEY,
+    model_name TEXT NOT NULL,
+    model_id TEXT NOT NULL,
+    response TEXT NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_generation_cache_used ON generation_cache(last_used);
+CREATE INDEX IF NOT EXISTS idx_generation_cache_model ON generation_cache(model_name, model_id);
+"""
+
+def model_identity(name, path):
+    #changes whenever any model file is replaced, so stale generations never match
+    digest = hashlib.sha1(name.encode("utf-8"))
+    try:
+        for filename in sorted(os.listdir(path)):
+            stat = os.stat(os.path.join(path, filename))
+            digest.update(f"{filename}:{stat.st_size}:{int(stat.st_mtime)}".encode("utf-8"))
+    except OSError:
+        pass
+    return digest.hexdigest()
+
+def cache_key(model_id, input_tokens, params):
+    #params: everything else that decides the output (search options, max new tokens, stop sequences, seed)
+    digest = hashlib.sha256(model_id.encode("utf-8"))
+    digest.update(json.dumps(params, sort_keys=True).encode("utf-8"))
+    digest.update(",".join(str(int(t)) for t in input_tokens).encode("utf-8"))
+    return digest.hexdigest()
+
+def is_deterministic(gen_config):
+    #greedy decoding, or sampling with a fixed seed
+    return not gen_config.get("do_sample") or gen_config.get("seed") is not None
+
+
+class GenerationCache:
+    """
+    Exact-match cache of finished generations: an in-memory LRU in front of
+    a bounded table in the search store database.
+    """
+    def __init__(self, store=None, memory_entries=256, disk_entries=5000):
+        self.store = store
+        self.memory_entries = memory_entries
+        self.disk_entries = disk_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0}
+        if store is not None:
+            with store.connection() as conn:
+                conn.executescript(SCHEMA)
+
+    def get(self, key):
+        with self._lock:
+            response = self._memory.get(key)
+            if response is not None:
+                self._memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                self._log_stats()
+                return response
+
+        row = None
+        if self.store is not None:
+            conn = self.store.connection()
+            with conn:
+                row = conn.execute("SELECT response FROM generation_cache WHERE key = ?", (key,)).fetchone()
+                if row:
+                    conn.execute("UPDATE generation_cache SET last_used = ? WHERE key = ?", (time.time(), key))
+        with self._lock:
+            if row is None:
+                self.stats["misses"] += 1
+                self._log_stats()
+                return None
+            self.stats["disk_hits"] += 1
+            self._remember(key, row["response"])
+            self._log_stats()
+        return row["response"]
+
+    def put(self, key, model_name, model_id, response):
+        with self._lock:
+            self._remember(key, response)
+            self.stats["stores"] += 1
+        if self.store is None or self.disk_entries <= 0:
+            return
+        conn = self.store.connection()
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO generation_cache (key, model_name, model_id, response, last_used) "
+                         "VALUES (?, ?, ?, ?, ?)", (key, model_name, model_id, response, time.time()))
+            conn.execute("""DELETE FROM generation_cache WHERE key IN (
+                                SELECT key FROM generation_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?)""",
+                         (self.disk_entries,))
+
+    def _remember(self, key, response):
+        self._memory[key] = response
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def on_model_loaded(self, model_name, model_id):
+        """
+        Invalidation hook, called whenever a model is loaded: drops disk
+        entries made by an earlier version of the same model.
+        """
+        if self.store is None:
+            return
+        conn = self.store.connection()
+        with conn:
+            cur = conn.execute("DELETE FROM generation_cache WHERE model_name = ? AND model_id != ?",
+                               (model_name, model_id))
+        if cur.rowcount:
+            logging.info(f"Generation cache: dropped {cur.rowcount} entries from an older '{model_name}'")
+
+    def invalidate(self):
+        #drops everything, memory and disk
+        with self._lock:
+            self._memory.clear()
+        if self.store is not None:
+            conn = self.store.connection()
+            with conn:
+                conn.execute("DELETE FROM generation_cache")
+        logging.info("Generation cache cleared")
+
+    def _log_stats(self):
+        lookups = self.stats["memory_hits"] + self.stats["disk_hits"] + self.stats["misses"]
+        if lookups % 50 == 0:
+            logging.info(f"Generation cache: {lookups} lookups, hit rate {100 * self.hit_rate():.1f}% ({self.stats})")
+
+    def hit_rate(self):
+        hits = self.stats["memory_hits"] + self.stats["disk_hits"]
+        lookups = hits + self.stats["misses"]
+        return hits / lookups if lookups else 0.0
@@ -0,0 +1,184 @@
+import os
+import json
+import logging
+import threading
+from functools import lru_cache
+
+#local imports
+from utils import load_config, setup_logging
+from relevance import tokenize, estimate_tokens
+from store import get_store
+from chat_journal import read_session_file
+
+CONFIG = load_config()
+
+setup_logging()
+
+#FTS5 tables live next to the store tables; triggers keep them in step with
+#every page and summary write, so the index never needs a rebuild
+SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS knowledge_pages USING fts5(title, url UNINDEXED, body, tokenize='porter unicode61');
+CREATE VIRTUAL TABLE IF NOT EXISTS knowledge_summaries USING fts5(title, url UNINDEXED, body, tokenize='porter unicode61');
+CREATE VIRTUAL TABLE IF NOT EXISTS knowledge_chats USING fts5(title, url UNINDEXED, body, tokenize='porter unicode61');
+CREATE TABLE IF NOT EXISTS indexed_chats (
+    path TEXT PRIMARY KEY,
+    mtime REAL NOT NULL,
+    fts_rowid INTEGER NOT NULL
+);
+
+CREATE TRIGGER IF NOT EXISTS knowledge_pages_ai AFTER INSERT ON pages BEGIN
+    INSERT INTO knowledge_pages(rowid, title, url, body) VALUES (new.id, new.title, new.url, new.content);
+END;
+CREATE TRIGGER IF NOT EXISTS knowledge_pages_ad AFTER DELETE ON pages BEGIN
+    DELETE FROM knowledge_pages WHERE rowid = old.id;
+END;
+CREATE TRIGGER IF NOT EXISTS knowledge_summaries_ai AFTER INSERT ON summaries BEGIN
+    INSERT INTO knowledge_summaries(rowid, title, url, body)
+        SELECT new.rowid, p.title, p.url, new.summary FROM pages p WHERE p.id = new.page_id;
+END;
+CREATE TRIGGER IF NOT EXISTS knowledge_summaries_ad AFTER DELETE ON summaries BEGIN
+    DELETE FROM knowledge_summaries WHERE rowid = old.rowid;
+END;
+"""
+
+KINDS = ("pages", "summaries", "chats")
+
+def _read_chat(path):
+    #saved transcripts are plain text; journal sessions are rendered as "Role: message" lines
+    if path.endswith(".jsonl"):
+        session = read_session_file(path) or {"messages": []}
+        return "\n\n".join(f"{m['role'].capitalize()}: {m['content']}" for m in session["messages"])
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+def _match_expression(query):
+    #quoted OR of query terms, so user punctuation can't break FTS5 syntax
+    terms = dict.fromkeys(tokenize(query))
+    return " OR ".join(f'"{t}"' for t in terms)
+
+
+class KnowledgeIndex:
+    """
+    Incremental full-text index over fetched pages, deep-search summaries
+    (including attempts imported from the old folders, see store.py), saved
+    chats and journal sessions, stored in the search store database.
+    """
+    def __init__(self, store):
+        self.store = store
+        self._chat_lock = threading.Lock()
+        with store.connection() as conn:
+            conn.executescript(SCHEMA)
+            #pick up rows written before the index existed (no-op afterwards)
+            conn.execute("""INSERT INTO knowledge_pages(rowid, title, url, body)
+                            SELECT id, title, url, content FROM pages
+                            WHERE id > COALESCE((SELECT MAX(rowid) FROM knowledge_pages), 0)""")
+            conn.execute("""INSERT INTO knowledge_summaries(rowid, title, url, body)
+                            SELECT s.rowid, p.title, p.url, s.summary FROM summaries s JOIN pages p ON p.id = s.page_id
+                            WHERE s.rowid > COALESCE((SELECT MAX(rowid) FROM knowledge_summaries), 0)""")
+
+    def index_chat_file(self, path):
+        """
+        Adds or refreshes one saved chat transcript (.txt) or journal session
+        (.jsonl, see chat_journal.py). Unchanged files are skipped.
+
+        Return:
+            bool: True if the file was (re)indexed
+        """
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError as e:
+            logging.error(f"Cannot stat chat file {path}: {e}")
+            return False
+
+        with self._chat_lock:
+            conn = self.store.connection()
+            row = conn.execute("SELECT mtime, fts_rowid FROM indexed_chats WHERE path = ?", (path,)).fetchone()
+            if row and row["mtime"] >= mtime:
+                return False
+
+            try:
+                body = _read_chat(path)
+            except Exception as e:
+                logging.error(f"Error reading chat file {path}: {e}")
+                return False
+
+            with conn:
+                if row:
+                    conn.execute("DELETE FROM knowledge_chats WHERE rowid = ?", (row["fts_rowid"],))
+                cur = conn.execute("INSERT INTO knowledge_chats(title, url, body) VALUES (?, ?, ?)",
+                                   (os.path.basename(path), path, body))
+                conn.execute("INSERT OR REPLACE INTO indexed_chats (path, mtime, fts_rowid) VALUES (?, ?, ?)",
+                             (path, mtime, cur.lastrowid))
+        logging.info(f"Indexed chat transcript {path}")
+        return True
+
+    def sync_chats(self, chat_dir, sessions_dir=None):
+        #index new or modified transcripts and journal sessions only
+        count = 0
+        for directory, extension in ((chat_dir, ".txt"), (sessions_dir, ".jsonl")):
+            if not directory or not os.path.isdir(directory):
+                continue
+            for filename in os.listdir(directory):
+                if filename.endswith(extension) and self.index_chat_file(os.path.join(directory, filename)):
+                    count += 1
+        return count
+
+    def search(self, query, limit=5, kinds=KINDS):
+        """
+        Ranked lookup across the indexed artifacts.
+
+        Args:
+            query (str): Free-text question
+            limit (int): Maximum number of hits
+            kinds (tuple): Any of "pages", "summaries", "chats"
+
+        Return:
+            list: dicts with kind, title, url, snippet, text and score (lower is better)
+        """
+        expression = _match_expression(query)
+        if not expression:
+            return []
+
+        parts = [
+            f"""SELECT '{kind}' AS kind, title, url, body,
+                       snippet(knowledge_{kind}, 2, '', '', ' ... ', 24) AS snippet,
+                       bm25(knowledge_{kind}) AS score
+                FROM knowledge_{kind} WHERE knowledge_{kind} MATCH :q"""
+            for kind in kinds if kind in KINDS
+        ]
+        sql = " UNION ALL ".join(parts) + " ORDER BY score LIMIT :limit"
+        try:
+            rows = self.store.connection().execute(sql, {"q": expression, "limit": limit}).fetchall()
+        except Exception as e:
+            logging.error(f"Knowledge search failed for '{query}': {e}")
+            return []
+
+        return [
+            {"kind": r["kind"], "title": r["title"], "url": r["url"],
+             "snippet": r["snippet"], "text": r["body"], "score": r["score"]}
+            for r in rows
+        ]
+
+    def build_context(self, query, max_tokens=800, limit=5):
+        """
+        Grounding text for the model made of the best local hits,
+        preferring summaries over raw pages within the token budget.
+        """
+        hits = self.search(query, limit=limit)
+        hits.sort(key=lambda h: (h["kind"] != "summaries", h["score"]))
+
+        blocks = []
+        used = 0
+        for hit in hits:
+            block = f"[{hit['title']}]\n{hit['snippet'] if hit['kind'] != 'summaries' else hit['text']}\n"
+            cost = estimate_tokens(block)
+            if used + cost > max_tokens:
+                continue
+            blocks.append(block)
+            used += cost
+        return "\n".join(blocks).strip()
+
+
+@lru_cache(maxsize=1)
+def get_knowledge_index():
+    return KnowledgeIndex(get_store())
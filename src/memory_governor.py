@@ -0,0 +1,253 @@
+import os
+import time
+import uuid
+import asyncio
+import logging
+import functools
+import threading
+from functools import lru_cache
+from contextlib import contextmanager, asynccontextmanager
+
+#local imports
+from utils import load_config, setup_logging, get_process_rss_mb, get_child_pids, ensure_dir_exists
+
+CONFIG = load_config()
+
+setup_logging()
+
+
+class _Reservation:
+    #bytes one document holds while it is fetched and extracted
+    def __init__(self, governor, nbytes):
+        self.governor = governor
+        self.nbytes = nbytes
+
+    def resize(self, nbytes):
+        #growing never waits (the holder is already in flight), it only delays the next acquirer
+        with self.governor._lock:
+            self.governor.inflight_bytes += nbytes - self.nbytes
+            self.nbytes = nbytes
+
+
+class MemoryGovernor:
+    """
+    Keeps the search pipeline inside a memory budget shared with the model.
+
+    Memory is this process's RSS plus that of its children (the Playwright
+    driver and browsers). Every document in flight reserves its bytes;
+    new fetches wait while the reserved bytes are over max_inflight_mb or
+    total memory is above high_water * budget_mb. One document is always let
+    through, so a single large page slows things down but never deadlocks.
+    Extracted text can be spilled to disk until it is written to the store.
+
+        async with governor.reserve(estimate) as held:
+            ...
+            held.resize(len(html))
+    """
+    def __init__(self, budget_mb=6000, high_water=0.85, max_inflight_mb=64, poll_interval_s=0.05,
+                 wait_timeout_s=30, spill_dir="spill"):
+        self.budget_mb = budget_mb
+        self.high_water = high_water
+        self.max_inflight_bytes = int(max_inflight_mb * 1024 * 1024)
+        self.poll_interval_s = poll_interval_s
+        self.wait_timeout_s = wait_timeout_s
+        self.spill_dir = spill_dir
+        self.inflight_bytes = 0
+        self.inflight_docs = 0
+        self._lock = threading.Lock()
+        self._rss_cache = (0.0, None)
+        self._sample_lock = threading.Lock()
+        self.stats = {"waits": 0, "wait_s": 0.0, "spilled_bytes": 0, "peak_inflight_bytes": 0}
+        #last monitor() report per label
+        self.reports = {}
+        self._clear_spill()
+
+    def _clear_spill(self):
+        #spill files left behind by a search that crashed
+        if not os.path.isdir(self.spill_dir):
+            return
+        for name in os.listdir(self.spill_dir):
+            if name.endswith(".txt"):
+                try:
+                    os.remove(os.path.join(self.spill_dir, name))
+                except OSError:
+                    pass
+
+    def memory_mb(self):
+        """
+        Return:
+            tuple: (this process MB, child processes MB), 0 where it can't be read
+        """
+        own = get_process_rss_mb() or 0.0
+        children = sum(get_process_rss_mb(pid) or 0.0 for pid in get_child_pids())
+        return own, children
+
+    def _total_mb(self):
+        #listing processes is not free, so the reading is reused for one poll interval;
+        #while one thread takes a new one, the others keep using the last
+        at, total = self._rss_cache
+        if total is not None and time.monotonic() - at <= self.poll_interval_s:
+            return total
+        if not self._sample_lock.acquire(blocking=total is None):
+            return total
+        try:
+            total = sum(self.memory_mb())
+            self._rss_cache = (time.monotonic(), total)
+        finally:
+            self._sample_lock.release()
+        return total
+
+    def under_pressure(self):
+        return self._total_mb() > self.high_water * self.budget_mb
+
+    async def _under_pressure_async(self):
+        #a stale reading is refreshed on an executor thread, never on the event loop the fetches share
+        at, total = self._rss_cache
+        if total is None or time.monotonic() - at > self.poll_interval_s:
+            total = await asyncio.get_running_loop().run_in_executor(None, self._total_mb)
+        return total > self.high_water * self.budget_mb
+
+    def _try_acquire(self, nbytes, under_pressure):
+        #the memory reading is taken before, outside the lock; the lock only guards the counters
+        with self._lock:
+            if self.inflight_docs and (self.inflight_bytes + nbytes > self.max_inflight_bytes or under_pressure):
+                return None
+            self.inflight_bytes += nbytes
+            self.inflight_docs += 1
+            self.stats["peak_inflight_bytes"] = max(self.stats["peak_inflight_bytes"], self.inflight_bytes)
+            return _Reservation(self, nbytes)
+
+    def _release(self, reservation):
+        with self._lock:
+            self.inflight_bytes -= reservation.nbytes
+            self.inflight_docs -= 1
+
+    def _waited(self, start):
+        waited = time.monotonic() - start
+        if waited > self.poll_interval_s:
+            self.stats["waits"] += 1
+            self.stats["wait_s"] += waited
+        if waited > self.wait_timeout_s:
+            logging.warning(f"Memory governor: waited {waited:.0f} s for room, letting the document through")
+
+    @asynccontextmanager
+    async def reserve(self, nbytes):
+        #async: waits on the event loop without blocking other fetches
+        start = time.monotonic()
+        reservation = self._try_acquire(nbytes, await self._under_pressure_async())
+        while reservation is None:
+            await asyncio.sleep(self.poll_interval_s)
+            reservation = self._try_acquire(nbytes, await self._under_pressure_async())
+            if reservation is None and time.monotonic() - start > self.wait_timeout_s:
+                reservation = self._force_acquire(nbytes)
+        self._waited(start)
+        try:
+            yield reservation
+        finally:
+            self._release(reservation)
+
+    def _force_acquire(self, nbytes):
+        with self._lock:
+            self.inflight_bytes += nbytes
+            self.inflight_docs += 1
+            return _Reservation(self, nbytes)
+
+    async def wait_for_headroom(self):
+        #before starting something big (a browser) while nothing can be reserved for it up front
+        start = time.monotonic()
+        while await self._under_pressure_async() and time.monotonic() - start <= self.wait_timeout_s:
+            await asyncio.sleep(self.poll_interval_s)
+        self._waited(start)
+
+    def spill(self, text):
+        """
+        Moves text out of memory into a file under spill_dir.
+
+        Return:
+            str: Path to pass to unspill()
+        """
+        ensure_dir_exists(self.spill_dir)
+        path = os.path.join(self.spill_dir, f"{uuid.uuid4().hex}.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        self.stats["spilled_bytes"] += len(text)
+        return path
+
+    def unspill(self, path):
+        #reads spilled text back and deletes the file
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return f.read()
+        finally:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    @contextmanager
+    def monitor(self, label):
+        """
+        Samples memory in the background while the block runs and logs the
+        peak against the budget. The yielded dict holds the report once the
+        block is done: peak_mb, peak_own_mb, peak_children_mb, budget_mb.
+        """
+        report = {"label": label, "budget_mb": self.budget_mb, "peak_mb": 0.0, "peak_own_mb": 0.0,
+                  "peak_children_mb": 0.0}
+        done = threading.Event()
+
+        def sample():
+            while True:
+                own, children = self.memory_mb()
+                if own + children > report["peak_mb"]:
+                    report.update(peak_mb=own + children, peak_own_mb=own, peak_children_mb=children)
+                if done.wait(self.poll_interval_s * 4):
+                    return
+
+        sampler = threading.Thread(target=sample, name=f"memory-{label}", daemon=True)
+        sampler.start()
+        try:
+            yield report
+        finally:
+            done.set()
+            sampler.join()
+            self.reports[label] = report
+            message = (f"Peak memory during {label}: {report['peak_mb']:.0f} MB "
+                       f"({report['peak_own_mb']:.0f} MB app, {report['peak_children_mb']:.0f} MB browsers), "
+                       f"budget {self.budget_mb} MB; {self.stats['waits']} backpressure waits, "
+                       f"{self.stats['spilled_bytes'] / 1024:.0f} KB spilled")
+            if report["peak_mb"] > self.budget_mb:
+                logging.warning(message)
+            else:
+                logging.info(message)
+
+
+@lru_cache(maxsize=1)
+def get_memory_governor():
+    #shared governor, limits from config
+    memory_config = CONFIG.get("memory", {})
+    return MemoryGovernor(
+        budget_mb=memory_config.get("budget_mb", 6000),
+        high_water=memory_config.get("high_water", 0.85),
+        max_inflight_mb=memory_config.get("max_inflight_mb", 64),
+        poll_interval_s=memory_config.get("poll_interval_ms", 50) / 1000,
+        wait_timeout_s=memory_config.get("wait_timeout_s", 30),
+        spill_dir=memory_config.get("spill_dir", "spill")
+    )
+
+
+def monitored(label):
+    #decorator: memory monitor() around every call of a function or coroutine function
+    def decorator(func):
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with get_memory_governor().monitor(label):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with get_memory_governor().monitor(label):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,255 @@
+import re
+import math
+import time
+import logging
+from collections import Counter
+
+#local imports
+from utils import setup_logging
+
+setup_logging()
+
+#very common words that carry no relevance signal
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "has", "have",
+    "how", "in", "is", "it", "its", "of", "on", "or", "that", "the", "this", "to",
+    "was", "were", "what", "when", "where", "which", "who", "why", "will", "with",
+    "do", "does", "did", "can", "about", "into", "than", "then", "there", "these"
+}
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+def tokenize(text):
+    #lowercase word tokens without stopwords
+    return [t for t in TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
+
+def estimate_tokens(text):
+    #rough model token count (Phi-3 averages ~1.3 tokens per english word)
+    return int(len(text.split()) * 1.3) + 1
+
+
+class BM25Index:
+    """
+    In-memory Okapi BM25 index over a list of text chunks.
+    Built once per search attempt and queried with the original user query.
+    """
+    def __init__(self, chunks, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.doc_freqs = []
+        self.doc_lens = []
+        df = Counter()
+
+        for chunk in chunks:
+            freqs = Counter(tokenize(chunk))
+            self.doc_freqs.append(freqs)
+            self.doc_lens.append(sum(freqs.values()))
+            df.update(freqs.keys())
+
+        self.n_docs = len(self.doc_freqs)
+        self.avg_len = (sum(self.doc_lens) / self.n_docs) if self.n_docs else 0.0
+        self.idf = {
+            term: math.log(1 + (self.n_docs - n + 0.5) / (n + 0.5))
+            for term, n in df.items()
+        }
+
+    def score(self, query):
+        """
+        Return:
+            list: BM25 score for every indexed chunk, in insertion order
+        """
+        terms = tokenize(query)
+        scores = [0.0] * self.n_docs
+        if not terms or not self.n_docs:
+            return scores
+
+        for i, freqs in enumerate(self.doc_freqs):
+            norm = self.k1 * (1 - self.b + self.b * self.doc_lens[i] / (self.avg_len or 1))
+            total = 0.0
+            for term in terms:
+                tf = freqs.get(term)
+                if not tf:
+                    continue
+                total += self.idf.get(term, 0.0) * tf * (self.k1 + 1) / (tf + norm)
+            scores[i] = total
+        return scores
+
+
+def select_relevant_chunks(query, chunks, top_k=8, token_budget=6000):
+    """
+    Pick the chunks most relevant to the query within a token budget.
+
+    Args:
+        query (str): Original user search query
+        chunks (list): Chunk strings to rank
+        top_k (int): Maximum number of chunks to keep
+        token_budget (int): Maximum estimated model tokens across kept chunks
+
+    Return:
+        list: Indices of selected chunks, in their original order
+    """
+    if not chunks:
+        return []
+
+    #no query means no ranking signal, keep everything the budget allows
+    if not query or not tokenize(query):
+        logging.warning("No usable query terms, falling back to document order.")
+        ranked = list(range(len(chunks)))
+        scores = [0.0] * len(chunks)
+    else:
+        index = BM25Index(chunks)
+        scores = index.score(query)
+        ranked = sorted(range(len(chunks)), key=lambda i: scores[i], reverse=True)
+
+    selected = []
+    used_tokens = 0
+    for i in ranked:
+        if len(selected) >= top_k:
+            break
+        #chunks with zero overlap are not worth a model call when others matched
+        if scores[i] <= 0 and any(s > 0 for s in scores):
+            break
+        cost = estimate_tokens(chunks[i])
+        if used_tokens + cost > token_budget and selected:
+            continue
+        selected.append(i)
+        used_tokens += cost
+
+    logging.info("Selected %d/%d chunks (~%d tokens) for query '%s'",
+                 len(selected), len(chunks), used_tokens, query)
+    return sorted(selected)
+
+
+def selection_recall(selected, relevant):
+    """
+    Share of the reference chunks that a selection kept.
+
+    Args:
+        selected (list): Indices of the selected chunks
+        relevant (iterable): Indices of the chunks the reference judged relevant
+
+    Return:
+        float: Recall in [0, 1] (1.0 when the reference has no relevant chunk)
+    """
+    relevant = set(relevant)
+    if not relevant:
+        return 1.0
+    return len(relevant & set(selected)) / len(relevant)
+
+def build_judge_prompt(query, chunk_text):
+    #Phi-3 prompt asking whether one chunk helps answer the query
+    return f"""<|system|>
+You judge whether a document chunk helps answer a question. Reply with yes or no only.
+<|end|>
+<|user|>
+Question: {query}
+---
+{chunk_text}
+---
+Does this chunk contain information that helps answer the question?
+<|end|>
+<|assistant|>
+"""
+
+def judge_relevant_chunks(model_handler, query, chunks):
+    """
+    Reference relevance from the model itself: like the old pipeline, every
+    chunk goes to the model, which is asked (greedily) whether the chunk
+    helps answer the query. Independent of the BM25 terms.
+
+    Return:
+        set: Indices of the chunks the model judged relevant
+    """
+    relevant = set()
+    for i, chunk in enumerate(chunks):
+        reply = model_handler.generate_full_response(build_judge_prompt(query, chunk), max_tokens_gen=3,
+                                                     speculative=False, do_sample=False)
+        if reply.strip().lower().startswith("yes"):
+            relevant.add(i)
+    return relevant
+
+
+def _measure_saved_attempts(top_k=8, token_budget=6000, labels=None, model_handler=None):
+    """
+    Recall, token savings and latency of the selection on the attempts in the
+    search store, against the all-chunks pipeline that summarized everything.
+    The relevant chunks come from, in order of preference:
+    labels: {attempt id: [chunk indexes]} judged by hand, chunks numbered in
+        page order as split by split_into_chunks
+    model_handler: the model judging every chunk (judge_relevant_chunks)
+    otherwise: the full-budget selection (every chunk BM25 matches at all);
+        this only shows what the top_k / token budget cut, not ranking quality
+    """
+    from store import get_store
+    from utils import split_into_chunks
+
+    if labels is not None:
+        reference = "hand labels"
+    elif model_handler is not None:
+        reference = "model judgement of every chunk"
+    else:
+        reference = "full-budget selection"
+    print(f"Reference: {reference}")
+
+    store = get_store()
+    recalls = []
+    kept_total = all_total = 0
+    for attempt in store.list_attempts():
+        chunks = []
+        for page in store.get_pages(attempt["id"]):
+            chunks.extend(split_into_chunks(page["content"]))
+        if not chunks:
+            continue
+        if labels is not None and str(attempt["id"]) not in labels:
+            continue
+
+        start = time.perf_counter()
+        selected = select_relevant_chunks(attempt["query"], chunks, top_k, token_budget)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        if labels is not None:
+            relevant = set(labels[str(attempt["id"])])
+        elif model_handler is not None:
+            relevant = judge_relevant_chunks(model_handler, attempt["query"], chunks)
+        else:
+            relevant = select_relevant_chunks(attempt["query"], chunks, len(chunks), float("inf"))
+        recall = selection_recall(selected, relevant)
+        recalls.append(recall)
+
+        #the all-chunks pipeline sent every chunk to the model
+        all_tokens = sum(estimate_tokens(c) for c in chunks)
+        kept_tokens = sum(estimate_tokens(chunks[i]) for i in selected)
+        kept_total += kept_tokens
+        all_total += all_tokens
+
+        print(f"attempt {attempt['id']}: {len(selected)}/{len(chunks)} chunks, "
+              f"recall {recall:.0%} ({len(set(relevant) & set(selected))}/{len(relevant)} relevant), "
+              f"~{kept_tokens}/{all_tokens} tokens ({1 - kept_tokens / all_tokens:.0%} saved), "
+              f"select {elapsed_ms:.1f} ms")
+
+    if recalls:
+        print(f"{len(recalls)} attempts: mean recall {sum(recalls) / len(recalls):.1%}, "
+              f"{1 - kept_total / all_total:.0%} of the all-chunks tokens saved")
+    else:
+        print("No attempts to measure")
+
+if __name__ == "__main__":
+    import json
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Chunk selection recall and token savings on saved attempts")
+    parser.add_argument("--top-k", type=int, default=8)
+    parser.add_argument("--token-budget", type=int, default=6000)
+    parser.add_argument("--labels", help="JSON file of {attempt id: [relevant chunk indexes]}")
+    parser.add_argument("--model", action="store_true", help="let the model judge every chunk as the reference")
+    args = parser.parse_args()
+
+    labels = None
+    if args.labels:
+        with open(args.labels, "r", encoding="utf-8") as f:
+            labels = json.load(f)
+    model_handler = None
+    if args.model and labels is None:
+        from connect import ModelHandler
+        model_handler = ModelHandler()
+    _measure_saved_attempts(args.top_k, args.token_budget, labels, model_handler)
@@ -1,14 +1,23 @@
 import os
 import asyncio
 import httpx
-from playwright.async_api import async_playwright
 from bs4 import BeautifulSoup
 from readability import Document
-import aiofiles
+import json
+import time
 import logging
 
-logging.basicConfig(level=logging.INFO, filename="search.log", filemode="w",
-                    format="%(asctime)s - %(levelname)s - %(message)s")
+#local imports
+from utils import load_config, setup_logging
+from dedup import remove_duplicate_pages
+from store import get_store
+from tracing import span, traced
+from memory_governor import get_memory_governor, monitored
+from search_engines import EngineStats, fan_out_search
+
+CONFIG = load_config()
+
+setup_logging()
 
 
 os.environ["PLAYWRIGHT_BROWSERS_PATH"] = os.path.join(os.getcwd(), "ms-playwright")
@@ -40,6 +49,9 @@ def is_valid_url(url):
 async def fetch_page_content(session, url, force=False):
     """
     Fetch and extract readable content from a single URL using httpx.
+    The page's bytes are reserved with the memory governor from the first
+    byte until extraction is done, so fetches wait when memory is tight,
+    and pages over memory.max_page_mb are dropped.
     
     Args:
         session (httpx.AsyncClient): HTTP client session
@@ -49,22 +61,54 @@ async def fetch_page_content(session, url, force=False):
     Return:
         str: Extracted text content or None
     """
+    memory_config = CONFIG.get("memory", {})
+    max_page_bytes = memory_config.get("max_page_mb", 10) * 1024 * 1024
     try:
-        response = await session.get(url, timeout=20)
-        
-        if response.status_code == 200:
-            html = response.text
-            min_words = 10 if force else 100
-            content = extract_clean_text(html, min_words=min_words)
-            return content
-        else:
-            logging.warning(f"Failed to load {url} - Status code: {response.status_code}")
-            return None
+        async with get_memory_governor().reserve(memory_config.get("page_estimate_kb", 512) * 1024) as held:
+            with span("fetch", url=url) as trace:
+                async with session.stream("GET", url, timeout=20) as response:
+                    declared = int(response.headers.get("content-length") or 0)
+                    if declared > max_page_bytes:
+                        logging.warning(f"Skipping {url}: {declared} bytes is over the page size limit")
+                        return None
+                    if declared:
+                        held.resize(declared)
+                    body = bytearray()
+                    async for part in response.aiter_bytes():
+                        body += part
+                        if len(body) > max_page_bytes:
+                            logging.warning(f"Skipping {url}: over the page size limit")
+                            return None
+                    held.resize(len(body))
+                trace.set(status=response.status_code, bytes=len(body))
+            
+            if response.status_code == 200:
+                html = body.decode(response.encoding or "utf-8", errors="replace")
+                del body
+                min_words = 10 if force else 100
+                content = extract_clean_text(html, min_words=min_words)
+                return content
+            else:
+                logging.warning(f"Failed to load {url} - Status code: {response.status_code}")
+                return None
             
     except Exception as e:
         logging.error(f"Error fetching {url}: {e}")
         return None
 
+async def _fetch_and_spill(session, url):
+    #extracted text waits on disk, not in memory, until it is written to the store in result order
+    content = await fetch_page_content(session, url)
+    if content and CONFIG.get("memory", {}).get("spill_text", True):
+        return get_memory_governor().spill(content)
+    return content
+
+def _unspill(content):
+    if content and CONFIG.get("memory", {}).get("spill_text", True):
+        return get_memory_governor().unspill(content)
+    return content
+
+@traced("fetch_playwright")
 async def fetch_page_content_with_playwright(url):
     """
     Use Playwright to render JS-heavy pages and extract any visible text.
@@ -76,6 +120,8 @@ async def fetch_page_content_with_playwright(url):
         str: Extracted text content or None
     """
     try:
+        #imported here so searches that never need a browser run without Playwright installed
+        from playwright.async_api import async_playwright
         async with async_playwright() as p:
             browser = await p.chromium.launch(headless=True)
             page = await browser.new_page()
@@ -117,10 +163,13 @@ def extract_clean_text(html, min_words=100):
         str: Cleaned text or None
     """
     try:
-        doc = Document(html)
-        summary = doc.summary()
-        soup = BeautifulSoup(summary, "html.parser")
-        text = soup.get_text(separator=" ").strip()
+        with span("extract", bytes=len(html)) as trace:
+            cpu_start = time.thread_time()
+            doc = Document(html)
+            summary = doc.summary()
+            soup = BeautifulSoup(summary, "html.parser")
+            text = soup.get_text(separator=" ").strip()
+            trace.set(chars=len(text), cpu_ms=(time.thread_time() - cpu_start) * 1000)
         
         if len(text.split()) < min_words:
             return None
@@ -131,9 +180,12 @@ def extract_clean_text(html, min_words=100):
         logging.error(f"Error extracting text: {e}")
         return None
 
+@traced("serp")
 async def perform_web_search(query):
     """
-    Search Bing and extract top results, trying up to 15 links to find maybe 7 good ones.
+    Search the configured engines at once and merge their results, trying up
+    to 15 links to find maybe 7 good ones. Stops waiting for slower engines
+    once 7 usable links are in.
     
     Args:
         query (str): Search query
@@ -141,47 +193,33 @@ async def perform_web_search(query):
     Return:
         tuple: (usable_results, bad_domain_results)
     """
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=True)
-        page = await browser.new_page()
-        
-        await page.set_viewport_size({"width": 1200, "height": 800})
-        
-        await page.set_extra_http_headers({
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0 Safari/537.36"
-        })
-        
-        search_url = f"https://www.bing.com/search?q={query}"
-        await page.goto(search_url)
-        await page.wait_for_selector(".b_algo", timeout=10000)
-        html = await page.content()
-        await browser.close()
-    
-    soup = BeautifulSoup(html, "html.parser")
-    all_results = soup.select(".b_algo")
+    search_config = CONFIG.get("search", {})
+    stats = EngineStats(search_config.get("stats_file", "engine_stats.json"))
+    async with httpx.AsyncClient(follow_redirects=True) as client:
+        all_results = await fan_out_search(
+            query,
+            client,
+            min_results=7,
+            is_usable=lambda url: not any(domain in url for domain in BAD_DOMAINS),
+            timeout_s=search_config.get("timeout_s", 10),
+            stagger_s=search_config.get("stagger_ms", 300) / 1000,
+            stats=stats
+        )
     usable_results = []
     bad_domain_results = []
     
-    logging.info("Filtering Bing results (up to 15 total, looking for 7 usable ones)...")
+    logging.info("Filtering merged search results (up to 15 total, looking for 7 usable ones)...")
     
     count = 0
     for result in all_results:
         if count >= 15:
             break
-            
-        title_tag = result.select_one("h2 a")
-        url_tag = result.select_one("a")
-        
-        if not title_tag or not url_tag:
-            continue
-            
-        title = title_tag.text.strip()
-        url = url_tag.get("href")
         
+        url = result["url"]
         if not url or not url.startswith(("http://", "https://")):
             continue
             
-        item = {"title": title, "url": url}
+        item = {"title": result["title"], "url": url}
         count += 1
         
         if any(domain in url for domain in BAD_DOMAINS):
@@ -198,53 +236,42 @@ async def perform_web_search(query):
     
     return usable_results[:7], bad_domain_results
 
+@traced("web_search")
+@monitored("web search")
 async def run_web_search(query):
     """
-    Main function to run web search and save results.
+    Main function to run web search and save results to the search store.
     
     Args:
         query (str): Search query
         
     Return:
-        str: Path to output directory containing search results
+        int: Id of the search attempt holding the results
     """
-    base_output_dir = "web_searches"
-    os.makedirs(base_output_dir, exist_ok=True)
+    store = get_store()
+    attempt_id = store.new_attempt(query)
     
-    existing_attempts = [d for d in os.listdir(base_output_dir) if d.startswith("search_attempt_")]
-    attempt_number = len(existing_attempts) + 1
-    output_dir = os.path.join(base_output_dir, f"search_attempt_{attempt_number}")
-    os.makedirs(output_dir, exist_ok=True)
-    
-    logging.info("Searching Bing for: '%s'", query)
+    logging.info("Searching the web for: '%s'", query)
     
     initial_results, bad_domain_results = await perform_web_search(query)
     logging.info("Found %d usable links (after filtering first 15).", len(initial_results))
     logging.info("Also found %d link(s) from blacklisted domains.", len(bad_domain_results))
     
-    urls_file = os.path.join(output_dir, "urls_n_headlines.txt")
-    
-    async with aiofiles.open(urls_file, "w", encoding="utf-8") as f:
-        for item in initial_results:
-            await f.write(f"{item['title']}\n{item['url']}\n\n")
-    
-    logging.info("Saved URLs and titles to: %s", urls_file)
+    store.add_links(attempt_id, initial_results)
+    logging.info("Saved URLs and titles for attempt %d", attempt_id)
     
     #first batch: process usable results !first 7! 
     async with httpx.AsyncClient(follow_redirects=True, timeout=30) as client:
-        tasks = [fetch_page_content(client, item['url']) for item in initial_results]
+        tasks = [_fetch_and_spill(client, item['url']) for item in initial_results]
         contents = await asyncio.gather(*tasks)
     
     saved_count = 0
     
     for idx, (item, content) in enumerate(zip(initial_results, contents)):
+        content = _unspill(content)
         if content:
-            filename = f"search_data_{saved_count+1}.txt"
-            filepath = os.path.join(output_dir, filename)
-            
-            async with aiofiles.open(filepath, "w", encoding="utf-8") as f:
-                await f.write(f"Title: {item['title']}\nURL: {item['url']}\n{content}")
-                
+            with span("store.add_page", url=item['url'], chars=len(content)):
+                store.add_page(attempt_id, item['title'], item['url'], content)
             logging.info("Saved: %s (%d words)", item['title'], len(content.split()))
             saved_count += 1
         else:
@@ -256,24 +283,35 @@ async def run_web_search(query):
         
         for idx, item in enumerate(bad_domain_results):
             logging.info("Trying hard to get content from BAD DOMAIN: %s", item['title'])
+            #a browser costs a few hundred MB, so it waits for room under the memory budget
+            await get_memory_governor().wait_for_headroom()
             content = await fetch_page_content_with_playwright(item['url'])
             
             if content:
-                filename = f"search_data_{saved_count + 1}.txt"
-                filepath = os.path.join(output_dir, filename)
-                
-                async with aiofiles.open(filepath, "w", encoding="utf-8") as f:
-                    await f.write(f"Title: {item['title']}\nURL: {item['url']}\n{content}")
-                    
+                store.add_page(attempt_id, item['title'], item['url'], content)
                 logging.info("Saved from BAD DOMAIN: %s (%d words)", item['title'], len(content.split()))
                 saved_count += 1
             else:
                 logging.warning("Skipped from BAD DOMAIN: %s", item['title'])
     
-    logging.info("All files saved in: %s", output_dir)
-    logging.info("Done. Total saved documents: %d", saved_count)
+    #drop syndicated copies before any model call sees them
+    dedup_config = CONFIG.get("dedup", {})
+    with span("dedup_pages"):
+        removed = remove_duplicate_pages(
+            store,
+            attempt_id,
+            threshold=dedup_config.get("similarity_threshold", 0.8),
+            shingle_size=dedup_config.get("shingle_size", 5)
+        )
+    if removed:
+        logging.info("Removed %d near-duplicate document(s): %s", len(removed), ", ".join(removed))
+    
+    if CONFIG.get("storage", {}).get("export_folders", False):
+        store.export_attempt(attempt_id, CONFIG["search_result_dir"], CONFIG["summary_dir"])
+    
+    logging.info("Done. Attempt %d, total saved documents: %d", attempt_id, saved_count - len(removed))
     
-    return output_dir
+    return attempt_id
 
 #wrapper to run async function in a thread
 def start_web_search(query):
@@ -0,0 +1,297 @@
+import os
+import time
+import asyncio
+import logging
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode, quote_plus, unquote
+from bs4 import BeautifulSoup
+
+#local imports
+from utils import load_config, setup_logging, load_json_safe, save_json_safe
+from tracing import span
+
+CONFIG = load_config()
+
+setup_logging()
+
+USER_AGENT = ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) "
+              "Chrome/119.0 Safari/537.36")
+
+#query parameters that only track the click, dropped when comparing URLs
+_TRACKING_PARAMS = {"fbclid", "gclid", "msclkid", "ref", "ref_src", "mc_cid", "mc_eid"}
+
+
+def canonical_url(url):
+    """
+    Normalizes a result URL so the same page found by different engines
+    compares equal: no scheme (http and https copies are one page),
+    lower-case host without "www.", no fragment, no tracking parameters,
+    no trailing slash. The result is a comparison key, not a fetchable URL.
+    """
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    query = urlencode([(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+                       if k.lower() not in _TRACKING_PARAMS and not k.lower().startswith("utm_")])
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit(("", host, path, query, ""))
+
+
+#result page parsers: html -> [{"title", "url"}] in engine rank order
+
+def parse_bing(html):
+    results = []
+    for result in BeautifulSoup(html, "html.parser").select(".b_algo"):
+        title_tag = result.select_one("h2 a")
+        url_tag = result.select_one("a")
+        if title_tag and url_tag and url_tag.get("href"):
+            results.append({"title": title_tag.text.strip(), "url": url_tag.get("href")})
+    return results
+
+def parse_duckduckgo(html):
+    results = []
+    for link in BeautifulSoup(html, "html.parser").select("a.result__a"):
+        url = link.get("href") or ""
+        #the html endpoint wraps targets in a redirect: //duckduckgo.com/l/?uddg=<url>
+        if "uddg=" in url:
+            url = unquote(dict(parse_qsl(urlsplit(url).query)).get("uddg", ""))
+        if url:
+            results.append({"title": link.text.strip(), "url": url})
+    return results
+
+def parse_mojeek(html):
+    results = []
+    for link in BeautifulSoup(html, "html.parser").select("ul.results-standard a.title"):
+        if link.get("href"):
+            results.append({"title": link.text.strip(), "url": link.get("href")})
+    return results
+
+
+class SearchEngine:
+    """
+    One result-page source: where to send the query, how to fetch the page
+    (plain HTTP, or a headless browser for engines that need JavaScript)
+    and how to parse it.
+    """
+    def __init__(self, name, base_url, search_path, parse, render=False, wait_selector=None):
+        self.name = name
+        self.base_url = base_url.rstrip("/")
+        self.search_path = search_path
+        self.parse = parse
+        self.render = render
+        self.wait_selector = wait_selector
+
+    def url(self, query):
+        return f"{self.base_url}{self.search_path}{quote_plus(query)}"
+
+    async def fetch(self, query, client, timeout_s):
+        if not self.render:
+            response = await client.get(self.url(query), headers={"User-Agent": USER_AGENT}, timeout=timeout_s)
+            response.raise_for_status()
+            return response.text
+
+        from playwright.async_api import async_playwright
+        from memory_governor import get_memory_governor
+
+        #a browser costs a few hundred MB, so it waits for room under the memory budget
+        await get_memory_governor().wait_for_headroom()
+        async with async_playwright() as p:
+            browser = await p.chromium.launch(headless=True)
+            try:
+                page = await browser.new_page()
+                await page.set_viewport_size({"width": 1200, "height": 800})
+                await page.set_extra_http_headers({"User-Agent": USER_AGENT})
+                await page.goto(self.url(query))
+                if self.wait_selector:
+                    await page.wait_for_selector(self.wait_selector, timeout=timeout_s * 1000)
+                return await page.content()
+            finally:
+                await browser.close()
+
+    async def search(self, query, client, timeout_s):
+        with span("serp", engine=self.name) as trace:
+            results = self.parse(await self.fetch(query, client, timeout_s))
+            trace.set(results=len(results))
+        return results
+
+
+#name -> (default base URL, search path, parser, needs a browser, selector to wait for)
+_KNOWN_ENGINES = {
+    "bing": ("https://www.bing.com", "/search?q=", parse_bing, True, ".b_algo"),
+    "duckduckgo": ("https://html.duckduckgo.com", "/html/?q=", parse_duckduckgo, False, None),
+    "mojeek": ("https://www.mojeek.com", "/search?q=", parse_mojeek, False, None),
+}
+
+def configured_engines():
+    """
+    Enabled engines from config (search.engines: name -> {enabled, base_url,
+    render}). render overrides whether the engine needs a browser.
+
+    Return:
+        list: SearchEngine objects
+    """
+    engines = []
+    for name, settings in CONFIG.get("search", {}).get("engines", {"bing": {}}).items():
+        if name not in _KNOWN_ENGINES:
+            logging.warning(f"Unknown search engine '{name}' in config, skipping")
+            continue
+        if not settings.get("enabled", True):
+            continue
+        base_url, path, parse, render, wait_selector = _KNOWN_ENGINES[name]
+        render = settings.get("render", render)
+        engines.append(SearchEngine(name, settings.get("base_url") or base_url, path, parse, render, wait_selector))
+    return engines
+
+
+class EngineStats:
+    """
+    Per-engine latency (exponential moving average) and failure rate,
+    kept across runs in a small JSON file. Engines are tried best-first.
+    """
+    def __init__(self, path=None, alpha=0.3):
+        self.path = path
+        self.alpha = alpha
+        self.engines = {}
+        if path and os.path.exists(path):
+            self.engines = load_json_safe(path) or {}
+
+    def _entry(self, name):
+        return self.engines.setdefault(name, {"requests": 0, "failures": 0, "latency_ms": None})
+
+    def record(self, name, latency_s, ok, cancelled=False):
+        entry = self._entry(name)
+        latency_ms = latency_s * 1000
+        if cancelled:
+            #cut short because other engines were faster: its latency is at least this long
+            if entry["latency_ms"] is not None and latency_ms <= entry["latency_ms"]:
+                return
+        else:
+            entry["requests"] += 1
+            entry["failures"] += 0 if ok else 1
+        previous = entry["latency_ms"]
+        entry["latency_ms"] = latency_ms if previous is None else previous + self.alpha * (latency_ms - previous)
+
+    def failure_rate(self, name):
+        entry = self._entry(name)
+        return entry["failures"] / entry["requests"] if entry["requests"] else 0.0
+
+    def score(self, name):
+        #expected cost in ms of asking this engine: a failure costs as much as a 10 s wait;
+        #unknown engines count as fast so they get tried
+        entry = self._entry(name)
+        return (entry["latency_ms"] or 0.0) + 10000 * self.failure_rate(name)
+
+    def order(self, engines):
+        return sorted(engines, key=lambda engine: self.score(engine.name))
+
+    def save(self):
+        if self.path:
+            save_json_safe(self.engines, self.path)
+
+
+def reciprocal_rank_fusion(ranked_lists, k=60):
+    """
+    Merges several engines' result lists: each URL scores sum(1 / (k + rank))
+    over the lists it appears in, duplicates (by canonical URL) collapse
+    into one entry.
+
+    Args:
+        ranked_lists (list): Result lists ([{"title", "url"}]), best first
+
+    Return:
+        list: Merged results, best first, each with an "engines" count
+    """
+    merged = {}
+    for results in ranked_lists:
+        seen = set()
+        for rank, item in enumerate(results, start=1):
+            key = canonical_url(item["url"])
+            if key in seen:
+                continue
+            seen.add(key)
+            entry = merged.setdefault(key, {"title": item["title"], "url": item["url"], "score": 0.0, "engines": 0,
+                                            "best_rank": rank})
+            entry["score"] += 1 / (k + rank)
+            entry["engines"] += 1
+            if rank < entry["best_rank"]:
+                entry.update(title=item["title"], url=item["url"], best_rank=rank)
+    ordered = sorted(merged.values(), key=lambda entry: (-entry["score"], entry["best_rank"]))
+    return [{"title": entry["title"], "url": entry["url"], "engines": entry["engines"]} for entry in ordered]
+
+
+async def fan_out_search(query, client, engines=None, min_results=7, is_usable=None, timeout_s=10,
+                         stagger_s=0.3, stats=None):
+    """
+    Queries several engines at once and merges their results, returning as
+    soon as the merged list holds min_results usable URLs; engines still
+    running then are cancelled. Engines start best-first by their stats,
+    each one stagger_s after the previous, so a fast engine often answers
+    before a slow (or browser-based) one has even started.
+
+    Args:
+        query (str): Search query
+        client (httpx.AsyncClient): Client for engines fetched over plain HTTP
+        engines (list): SearchEngine objects (configured ones if None)
+        min_results (int): Usable results that are enough to stop
+        is_usable (callable): url -> bool, what counts toward min_results
+        timeout_s (float): Limit for the whole fan-out
+        stagger_s (float): Delay between engine starts
+        stats (EngineStats): Latency and failure stats to order by and update
+
+    Return:
+        list: Merged results ([{"title", "url", "engines"}]), best first
+    """
+    engines = engines if engines is not None else configured_engines()
+    stats = stats or EngineStats()
+    is_usable = is_usable or (lambda url: True)
+    results = {}
+    started = {}
+
+    async def run(engine, delay):
+        await asyncio.sleep(delay)
+        started[engine.name] = time.perf_counter()
+        return await engine.search(query, client, timeout_s)
+
+    tasks = {asyncio.create_task(run(engine, rank * stagger_s)): engine
+             for rank, engine in enumerate(stats.order(engines))}
+    deadline = time.perf_counter() + timeout_s
+    pending = set(tasks)
+    merged = []
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, timeout=max(0.0, deadline - time.perf_counter()),
+                                               return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                logging.warning(f"Search engines timed out after {timeout_s} s: "
+                                f"{', '.join(tasks[task].name for task in pending)}")
+                for task in pending:
+                    name = tasks[task].name
+                    if name in started:
+                        stats.record(name, time.perf_counter() - started[name], ok=False)
+                    task.cancel()
+                await asyncio.gather(*pending, return_exceptions=True)
+                pending = set()
+                break
+            for task in done:
+                engine = tasks[task]
+                elapsed = time.perf_counter() - started.get(engine.name, time.perf_counter())
+                try:
+                    results[engine.name] = task.result()
+                    stats.record(engine.name, elapsed, ok=True)
+                    logging.info(f"{engine.name}: {len(results[engine.name])} results in {elapsed * 1000:.0f} ms")
+                except Exception as e:
+                    stats.record(engine.name, elapsed, ok=False)
+                    logging.warning(f"{engine.name} search failed after {elapsed * 1000:.0f} ms: {e}")
+            merged = reciprocal_rank_fusion([results[e.name] for e in engines if e.name in results])
+            if sum(1 for item in merged if is_usable(item["url"])) >= min_results:
+                break
+    finally:
+        for task in pending:
+            task.cancel()
+            name = tasks[task].name
+            if name in started:
+                stats.record(name, time.perf_counter() - started[name], ok=True, cancelled=True)
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+        stats.save()
+    return merged
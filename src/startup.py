@@ -0,0 +1,53 @@
+import sys
+import time
+import logging
+import importlib
+from contextlib import contextmanager
+
+#reference point for all startup timings: when the entry script imported us
+_T0 = time.perf_counter()
+
+
+class StartupProfiler:
+    """
+    Records what the app spends its cold start on (imports, config, model
+    load, first window paint) as (name, start ms, duration ms) events.
+    """
+    def __init__(self, t0=_T0):
+        self.t0 = t0
+        self.events = []
+
+    def elapsed_ms(self):
+        return (time.perf_counter() - self.t0) * 1000
+
+    @contextmanager
+    def timed(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            self.events.append((name, (start - self.t0) * 1000, (end - start) * 1000))
+
+    def mark(self, name):
+        self.events.append((name, self.elapsed_ms(), 0.0))
+
+    def report(self):
+        #logs the timeline and returns it as a dict
+        lines = [f"{start:9.1f} ms  {duration:9.1f} ms  {name}" for name, start, duration in self.events]
+        logging.info("Startup timeline (start, duration, step):\n" + "\n".join(lines))
+        return {
+            "events": [{"name": n, "start_ms": round(s, 1), "duration_ms": round(d, 1)} for n, s, d in self.events],
+            "total_ms": round(self.elapsed_ms(), 1)
+        }
+
+
+PROFILER = StartupProfiler()
+
+def lazy_import(module_name):
+    #imports a heavy subsystem on first use and records how long it took
+    module = sys.modules.get(module_name)
+    if module is None:
+        with PROFILER.timed(f"import {module_name} (lazy)"):
+            module = importlib.import_module(module_name)
+    return module
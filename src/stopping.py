@@ -0,0 +1,54 @@
+class StopSequenceMatcher:
+    """
+    Streaming matcher for stop sequences.
+
+    Text is fed piece by piece as tokens are decoded. Anything that cannot be
+    the start of a stop sequence is released right away; a possible partial
+    match at the end is held back until the next piece decides it, so a stop
+    sequence split across token boundaries is still caught and never shown.
+    """
+    def __init__(self, stop_sequences):
+        self.stop_sequences = [s for s in (stop_sequences or []) if s]
+        self._max_hold = max((len(s) for s in self.stop_sequences), default=1) - 1
+        self.pending = ""
+        self.matched = None
+
+    def feed(self, text):
+        """
+        Return:
+            tuple: (text safe to emit, True if a stop sequence was hit)
+        """
+        if self.matched is not None:
+            return "", True
+        self.pending += text
+        if not self.stop_sequences:
+            out, self.pending = self.pending, ""
+            return out, False
+
+        #earliest complete match wins
+        hit = None
+        for seq in self.stop_sequences:
+            idx = self.pending.find(seq)
+            if idx != -1 and (hit is None or idx < hit[0]):
+                hit = (idx, seq)
+        if hit:
+            self.matched = hit[1]
+            out = self.pending[:hit[0]]
+            self.pending = ""
+            return out, True
+
+        #hold back the longest suffix that could still grow into a stop sequence
+        hold = 0
+        for size in range(min(self._max_hold, len(self.pending)), 0, -1):
+            suffix = self.pending[-size:]
+            if any(seq.startswith(suffix) for seq in self.stop_sequences):
+                hold = size
+                break
+        out = self.pending[:len(self.pending) - hold]
+        self.pending = self.pending[len(self.pending) - hold:]
+        return out, False
+
+    def flush(self):
+        #held-back text once generation ended without a match
+        out, self.pending = self.pending, ""
+        return out
@@ -0,0 +1,507 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from functools import lru_cache
+
+#local imports
+from utils import load_config, setup_logging, split_into_chunks
+
+CONFIG = load_config()
+
+setup_logging()
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS attempts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    query TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS links (
+    attempt_id INTEGER NOT NULL REFERENCES attempts(id),
+    position INTEGER NOT NULL,
+    title TEXT NOT NULL,
+    url TEXT NOT NULL,
+    PRIMARY KEY (attempt_id, position)
+);
+CREATE TABLE IF NOT EXISTS pages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    attempt_id INTEGER NOT NULL REFERENCES attempts(id),
+    position INTEGER NOT NULL,
+    title TEXT NOT NULL,
+    url TEXT NOT NULL,
+    content TEXT NOT NULL,
+    content_hash TEXT NOT NULL,
+    UNIQUE (attempt_id, position)
+);
+CREATE TABLE IF NOT EXISTS chunks (
+    page_id INTEGER NOT NULL REFERENCES pages(id) ON DELETE CASCADE,
+    chunk_index INTEGER NOT NULL,
+    content TEXT NOT NULL,
+    content_hash TEXT NOT NULL,
+    PRIMARY KEY (page_id, chunk_index)
+);
+CREATE TABLE IF NOT EXISTS summaries (
+    page_id INTEGER NOT NULL REFERENCES pages(id) ON DELETE CASCADE,
+    chunk_index INTEGER NOT NULL,
+    summary TEXT NOT NULL,
+    PRIMARY KEY (page_id, chunk_index)
+);
+CREATE TABLE IF NOT EXISTS answers (
+    page_id INTEGER PRIMARY KEY REFERENCES pages(id) ON DELETE CASCADE,
+    answer TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS deep_search_runs (
+    attempt_id INTEGER PRIMARY KEY REFERENCES attempts(id),
+    stage TEXT NOT NULL,
+    selection TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS duplicates (
+    attempt_id INTEGER NOT NULL REFERENCES attempts(id),
+    kind TEXT NOT NULL,
+    item TEXT NOT NULL,
+    duplicate_of TEXT NOT NULL,
+    similarity REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS legacy_imports (
+    folder TEXT PRIMARY KEY,
+    attempt_id INTEGER REFERENCES attempts(id),
+    imported_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_attempts_query ON attempts(query);
+CREATE INDEX IF NOT EXISTS idx_attempts_created ON attempts(created_at);
+CREATE INDEX IF NOT EXISTS idx_pages_attempt ON pages(attempt_id, position);
+CREATE INDEX IF NOT EXISTS idx_pages_url ON pages(url);
+CREATE INDEX IF NOT EXISTS idx_pages_hash ON pages(content_hash);
+CREATE INDEX IF NOT EXISTS idx_chunks_hash ON chunks(content_hash);
+"""
+
+def content_hash(text):
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+def page_name(page):
+    #legacy file stem, used for labels and folder export
+    return f"search_data_{page['position']}"
+
+
+class SearchStore:
+    """
+    SQLite store (WAL mode) for search attempts, fetched pages, chunks,
+    deep-search summaries and answers. Each thread gets its own connection.
+    """
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.executescript(SCHEMA)
+
+    def connection(self):
+        #per-thread connection, for modules that keep their own tables in this database
+        return self._conn()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            #so INSERT OR REPLACE fires delete triggers (keeps the knowledge index in sync)
+            conn.execute("PRAGMA recursive_triggers=ON")
+            self._local.conn = conn
+        return conn
+
+    #attempts
+
+    def new_attempt(self, query):
+        #AUTOINCREMENT under an immediate write lock gives each caller a unique id
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            cur = conn.execute("INSERT INTO attempts (query, created_at) VALUES (?, ?)", (query, time.time()))
+        logging.info("Allocated search attempt %d for '%s'", cur.lastrowid, query)
+        return cur.lastrowid
+
+    def latest_attempt_id(self):
+        #newest by creation time (imported folders keep their own time), one index descent, no directory scan
+        row = self._conn().execute("SELECT id FROM attempts ORDER BY created_at DESC, id DESC LIMIT 1").fetchone()
+        return row[0] if row else None
+
+    def get_attempt(self, attempt_id):
+        return self._conn().execute("SELECT * FROM attempts WHERE id = ?", (attempt_id,)).fetchone()
+
+    def list_attempts(self):
+        return self._conn().execute("SELECT * FROM attempts ORDER BY id").fetchall()
+
+    #links and pages
+
+    def add_links(self, attempt_id, items):
+        with self._conn() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO links (attempt_id, position, title, url) VALUES (?, ?, ?, ?)",
+                [(attempt_id, i + 1, item["title"], item["url"]) for i, item in enumerate(items)]
+            )
+
+    def get_links(self, attempt_id):
+        return self._conn().execute(
+            "SELECT title, url FROM links WHERE attempt_id = ? ORDER BY position", (attempt_id,)
+        ).fetchall()
+
+    def add_page(self, attempt_id, title, url, content):
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            position = conn.execute(
+                "SELECT COALESCE(MAX(position), 0) + 1 FROM pages WHERE attempt_id = ?", (attempt_id,)
+            ).fetchone()[0]
+            cur = conn.execute(
+                "INSERT INTO pages (attempt_id, position, title, url, content, content_hash) VALUES (?, ?, ?, ?, ?, ?)",
+                (attempt_id, position, title, url, content, content_hash(content))
+            )
+        return cur.lastrowid
+
+    def get_pages(self, attempt_id):
+        return self._conn().execute(
+            "SELECT * FROM pages WHERE attempt_id = ? ORDER BY position", (attempt_id,)
+        ).fetchall()
+
+    def remove_page(self, page_id):
+        with self._conn() as conn:
+            conn.execute("DELETE FROM pages WHERE id = ?", (page_id,))
+
+    def find_pages_by_url(self, url):
+        return self._conn().execute("SELECT * FROM pages WHERE url = ? ORDER BY id", (url,)).fetchall()
+
+    #chunks
+
+    def set_chunks(self, page_id, chunks):
+        with self._conn() as conn:
+            conn.execute("DELETE FROM chunks WHERE page_id = ?", (page_id,))
+            conn.executemany(
+                "INSERT INTO chunks (page_id, chunk_index, content, content_hash) VALUES (?, ?, ?, ?)",
+                [(page_id, i, c, content_hash(c)) for i, c in enumerate(chunks)]
+            )
+
+    def get_chunks(self, page_id):
+        rows = self._conn().execute(
+            "SELECT content FROM chunks WHERE page_id = ? ORDER BY chunk_index", (page_id,)
+        ).fetchall()
+        return [r["content"] for r in rows]
+
+    #summaries and answers
+
+    def add_summary(self, page_id, chunk_index, summary):
+        with self._conn() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO summaries (page_id, chunk_index, summary) VALUES (?, ?, ?)",
+                (page_id, chunk_index, summary)
+            )
+
+    def clear_summaries(self, attempt_id):
+        with self._conn() as conn:
+            conn.execute(
+                "DELETE FROM summaries WHERE page_id IN (SELECT id FROM pages WHERE attempt_id = ?)", (attempt_id,)
+            )
+            conn.execute(
+                "DELETE FROM answers WHERE page_id IN (SELECT id FROM pages WHERE attempt_id = ?)", (attempt_id,)
+            )
+
+    def get_summaries(self, attempt_id):
+        """
+        Return:
+            list: Rows of (page_id, position, title, url, chunk_index, chunk_count, summary)
+        """
+        return self._conn().execute(
+            """SELECT p.id AS page_id, p.position, p.title, p.url, s.chunk_index, s.summary,
+                      (SELECT COUNT(*) FROM chunks c WHERE c.page_id = p.id) AS chunk_count
+               FROM summaries s JOIN pages p ON p.id = s.page_id
+               WHERE p.attempt_id = ? ORDER BY p.position, s.chunk_index""",
+            (attempt_id,)
+        ).fetchall()
+
+    def add_answer(self, page_id, answer):
+        with self._conn() as conn:
+            conn.execute("INSERT OR REPLACE INTO answers (page_id, answer) VALUES (?, ?)", (page_id, answer))
+
+    def get_answers(self, attempt_id):
+        return self._conn().execute(
+            """SELECT p.id AS page_id, p.position, a.answer FROM answers a JOIN pages p ON p.id = a.page_id
+               WHERE p.attempt_id = ? ORDER BY p.position""",
+            (attempt_id,)
+        ).fetchall()
+
+    #deep search manifest: which chunks were chosen and how far the run got;
+    #finished summaries and answers are the rows above, each committed on its own
+
+    def start_deep_search(self, attempt_id, selection):
+        #selection: (page_id, chunk_index) pairs to summarize; old results go in the same transaction
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            for table in ("summaries", "answers"):
+                conn.execute(f"DELETE FROM {table} WHERE page_id IN (SELECT id FROM pages WHERE attempt_id = ?)",
+                             (attempt_id,))
+            conn.execute(
+                "INSERT OR REPLACE INTO deep_search_runs (attempt_id, stage, selection, updated_at) VALUES (?, ?, ?, ?)",
+                (attempt_id, "summarizing", json.dumps([list(ref) for ref in selection]), time.time())
+            )
+
+    def set_deep_search_stage(self, attempt_id, stage):
+        #summarizing -> answering -> done
+        with self._conn() as conn:
+            conn.execute("UPDATE deep_search_runs SET stage = ?, updated_at = ? WHERE attempt_id = ?",
+                         (stage, time.time(), attempt_id))
+
+    def get_deep_search(self, attempt_id):
+        """
+        Return:
+            dict: stage, selection (list of (page_id, chunk_index)), summarized
+                (set of summarized pairs), chunks_done, answers_done; None if
+                deep search never started on the attempt
+        """
+        conn = self._conn()
+        row = conn.execute("SELECT * FROM deep_search_runs WHERE attempt_id = ?", (attempt_id,)).fetchone()
+        if row is None:
+            return None
+        selection = [tuple(ref) for ref in json.loads(row["selection"])]
+        done = {(r["page_id"], r["chunk_index"]) for r in conn.execute(
+            "SELECT s.page_id, s.chunk_index FROM summaries s JOIN pages p ON p.id = s.page_id WHERE p.attempt_id = ?",
+            (attempt_id,))}
+        answers = conn.execute(
+            "SELECT COUNT(*) FROM answers a JOIN pages p ON p.id = a.page_id WHERE p.attempt_id = ?", (attempt_id,)
+        ).fetchone()[0]
+        return {"stage": row["stage"], "selection": selection, "summarized": done,
+                "chunks_done": len(done & set(selection)), "answers_done": answers}
+
+    #dedup records
+
+    def record_duplicates(self, attempt_id, kind, records):
+        #records: (item_label, duplicate_of_label, similarity)
+        with self._conn() as conn:
+            conn.executemany(
+                "INSERT INTO duplicates (attempt_id, kind, item, duplicate_of, similarity) VALUES (?, ?, ?, ?, ?)",
+                [(attempt_id, kind, item, of, sim) for item, of, sim in records]
+            )
+
+    #legacy folder export
+
+    def export_attempt(self, attempt_id, base_dir="web_searches", summary_dir="model_search_summary"):
+        """
+        Writes the attempt in the old web_searches / model_search_summary layout.
+
+        Return:
+            tuple: (attempt folder path, summary folder path)
+        """
+        folder = f"search_attempt_{attempt_id}"
+        attempt_path = os.path.join(base_dir, folder)
+        summary_path = os.path.join(summary_dir, f"{folder}_summary")
+        os.makedirs(attempt_path, exist_ok=True)
+
+        attempt = self.get_attempt(attempt_id)
+        with open(os.path.join(attempt_path, "query.txt"), "w", encoding="utf-8") as f:
+            f.write(attempt["query"] if attempt else "")
+        with open(os.path.join(attempt_path, "urls_n_headlines.txt"), "w", encoding="utf-8") as f:
+            for link in self.get_links(attempt_id):
+                f.write(f"{link['title']}\n{link['url']}\n\n")
+
+        for page in self.get_pages(attempt_id):
+            name = page_name(page)
+            with open(os.path.join(attempt_path, f"{name}.txt"), "w", encoding="utf-8") as f:
+                f.write(f"Title: {page['title']}\nURL: {page['url']}\n{page['content']}")
+            chunks = self.get_chunks(page["id"])
+            if len(chunks) > 1:
+                for i, chunk in enumerate(chunks):
+                    with open(os.path.join(attempt_path, f"{name}_chunk{i+1}.txt"), "w", encoding="utf-8") as f:
+                        f.write(chunk)
+
+        summaries = self.get_summaries(attempt_id)
+        answers = self.get_answers(attempt_id)
+        if summaries or answers:
+            os.makedirs(summary_path, exist_ok=True)
+            for name, text in combine_summaries(summaries):
+                with open(os.path.join(summary_path, f"{name}_summary.txt"), "w", encoding="utf-8") as f:
+                    f.write(text)
+            if answers:
+                with open(os.path.join(summary_path, "all_deep_search_answers.txt"), "w", encoding="utf-8") as f:
+                    f.write(format_answers(answers))
+
+        logging.info("Exported attempt %d to %s", attempt_id, attempt_path)
+        return attempt_path, summary_path
+
+    #legacy folder import
+
+    def import_legacy_folders(self, base_dir="web_searches", summary_dir="model_search_summary"):
+        """
+        Brings search attempts saved in the old web_searches / model_search_summary
+        layout into the store: links, pages, chunk summaries and answers. Each
+        folder is imported once, in one transaction, so this can run on every
+        start. Folders with a query.txt were written by export_attempt from
+        this store and are skipped.
+
+        Return:
+            int: Number of folders imported
+        """
+        if not os.path.isdir(base_dir):
+            return 0
+        folders = [name for name in os.listdir(base_dir) if re.fullmatch(r"search_attempt_\d+", name)]
+        imported = 0
+        for folder in sorted(folders, key=lambda name: int(name.rsplit("_", 1)[1])):
+            attempt_path = os.path.join(base_dir, folder)
+            if os.path.exists(os.path.join(attempt_path, "query.txt")):
+                continue
+            try:
+                if self._import_legacy_attempt(folder, attempt_path, os.path.join(summary_dir, f"{folder}_summary")):
+                    imported += 1
+            except Exception as e:
+                logging.error(f"Could not import {attempt_path}: {e}", exc_info=True)
+        if imported:
+            logging.info("Imported %d search attempt folder(s) from %s", imported, base_dir)
+        return imported
+
+    def _import_legacy_attempt(self, folder, attempt_path, summary_path):
+        conn = self._conn()
+        if conn.execute("SELECT 1 FROM legacy_imports WHERE folder = ?", (folder,)).fetchone():
+            return False
+        links, pages = _read_legacy_attempt(attempt_path)
+        summaries, answers = _read_legacy_summaries(summary_path)
+
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            #another process may have imported it meanwhile
+            if conn.execute("SELECT 1 FROM legacy_imports WHERE folder = ?", (folder,)).fetchone():
+                return False
+            cur = conn.execute("INSERT INTO attempts (query, created_at) VALUES (?, ?)",
+                               ("", os.path.getmtime(attempt_path)))
+            attempt_id = cur.lastrowid
+            conn.executemany("INSERT INTO links (attempt_id, position, title, url) VALUES (?, ?, ?, ?)",
+                             [(attempt_id, i + 1, title, url) for i, (title, url) in enumerate(links)])
+
+            page_ids = {}
+            for position, (name, title, url, content) in enumerate(pages, start=1):
+                cur = conn.execute(
+                    "INSERT INTO pages (attempt_id, position, title, url, content, content_hash) VALUES (?, ?, ?, ?, ?, ?)",
+                    (attempt_id, position, title, url, content, content_hash(content))
+                )
+                page_ids[name] = cur.lastrowid
+                conn.executemany("INSERT INTO chunks (page_id, chunk_index, content, content_hash) VALUES (?, ?, ?, ?)",
+                                 [(cur.lastrowid, i, c, content_hash(c))
+                                  for i, c in enumerate(split_into_chunks(content))])
+
+            selection = [(page_ids[name], idx) for name, idx, _ in summaries if name in page_ids]
+            conn.executemany("INSERT OR REPLACE INTO summaries (page_id, chunk_index, summary) VALUES (?, ?, ?)",
+                             [(page_ids[name], idx, text) for name, idx, text in summaries if name in page_ids])
+            conn.executemany("INSERT OR REPLACE INTO answers (page_id, answer) VALUES (?, ?)",
+                             [(page_ids[name], text) for name, text in answers if name in page_ids])
+            #a deep search that got to summaries continues from there like any interrupted run
+            if selection:
+                conn.execute(
+                    "INSERT INTO deep_search_runs (attempt_id, stage, selection, updated_at) VALUES (?, ?, ?, ?)",
+                    (attempt_id, "done" if answers else "answering", json.dumps([list(ref) for ref in selection]),
+                     time.time())
+                )
+            conn.execute("INSERT INTO legacy_imports (folder, attempt_id, imported_at) VALUES (?, ?, ?)",
+                         (folder, attempt_id, time.time()))
+        logging.info("Imported %s as attempt %d (%d pages, %d summaries, %d answers)",
+                     attempt_path, attempt_id, len(pages), len(summaries), len(answers))
+        return True
+
+
+def _read_legacy_attempt(attempt_path):
+    """
+    Reads an old search_attempt_N folder.
+
+    Return:
+        tuple: ([(title, url)] links, [(page name, title, url, content)] pages in file order)
+    """
+    links = []
+    urls_file = os.path.join(attempt_path, "urls_n_headlines.txt")
+    if os.path.exists(urls_file):
+        with open(urls_file, "r", encoding="utf-8") as f:
+            for block in f.read().split("\n\n"):
+                lines = block.strip().splitlines()
+                if len(lines) >= 2:
+                    links.append((lines[0], lines[1]))
+
+    pages = []
+    numbered = [(int(m.group(1)), m.group(0)) for m in
+                (re.fullmatch(r"search_data_(\d+)\.txt", name) for name in os.listdir(attempt_path)) if m]
+    for _, filename in sorted(numbered):
+        with open(os.path.join(attempt_path, filename), "r", encoding="utf-8") as f:
+            lines = f.read().strip().split("\n")
+        #"Title: ...", "URL: ...", then the page text
+        title = lines[0].removeprefix("Title: ") if lines else ""
+        url = lines[1].removeprefix("URL: ") if len(lines) > 1 else ""
+        content = "\n".join(lines[2:]).strip()
+        pages.append((filename[:-len(".txt")], title, url, content))
+    return links, pages
+
+def _read_legacy_summaries(summary_path):
+    """
+    Reads an old search_attempt_N_summary folder (see combine_summaries and
+    format_answers for the formats).
+
+    Return:
+        tuple: ([(page name, chunk index, summary)], [(page name, answer)])
+    """
+    summaries, answers = [], []
+    if not os.path.isdir(summary_path):
+        return summaries, answers
+    for filename in sorted(os.listdir(summary_path)):
+        if not re.fullmatch(r"search_data_\d+_summary\.txt", filename):
+            continue
+        with open(os.path.join(summary_path, filename), "r", encoding="utf-8") as f:
+            text = f.read()
+        for m in re.finditer(r"\[(?:Chunk|Document) (\d+) Summary for '(search_data_\d+)\.txt'\]:\n(.*?)"
+                             r"(?=\n\n\[(?:Chunk|Document) \d+ Summary for '|\Z)", text, re.S):
+            summaries.append((m.group(2), int(m.group(1)) - 1, m.group(3).strip()))
+
+    answers_file = os.path.join(summary_path, "all_deep_search_answers.txt")
+    if os.path.exists(answers_file):
+        with open(answers_file, "r", encoding="utf-8") as f:
+            text = f.read()
+        for m in re.finditer(r"Answer based on '(search_data_\d+)_summary\.txt':\n(.*?)\n-{60}(?:\n|$)", text, re.S):
+            answers.append((m.group(1), m.group(2).strip()))
+    return summaries, answers
+
+
+def combine_summaries(summary_rows):
+    """
+    Groups per-chunk summary rows into one text per page, in the same
+    format the summary files always had.
+
+    Return:
+        list: (page name, combined summary text) tuples
+    """
+    combined = []
+    for row in summary_rows:
+        name = page_name(row)
+        label = "Chunk" if row["chunk_count"] > 1 else "Document"
+        block = f"[{label} {row['chunk_index']+1} Summary for '{name}.txt']:\n{row['summary']}\n\n"
+        if combined and combined[-1][0] == name:
+            combined[-1] = (name, combined[-1][1] + block)
+        else:
+            combined.append((name, block))
+    return [(name, text.strip()) for name, text in combined]
+
+def format_answers(answer_rows):
+    return "".join(
+        f"Answer based on '{page_name(row)}_summary.txt':\n{row['answer']}\n{'-'*60}\n"
+        for row in answer_rows
+    ).strip()
+
+
+@lru_cache(maxsize=1)
+def get_store():
+    #shared store instance, path from config
+    storage = CONFIG.get("storage", {})
+    store = SearchStore(storage.get("db_path", "search_store.db"))
+    #attempts saved before the store existed (no-op once they are in)
+    if storage.get("import_legacy_folders", True):
+        store.import_legacy_folders(CONFIG["search_result_dir"], CONFIG["summary_dir"])
+    return store
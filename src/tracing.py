@@ -0,0 +1,136 @@
+import os
+import json
+import time
+import atexit
+import asyncio
+import logging
+import functools
+import itertools
+import threading
+from contextlib import contextmanager
+
+#local imports
+from utils import load_config
+
+CONFIG = load_config()
+
+
+class _NullSpan:
+    #what span() hands out while tracing is off
+    def set(self, **attrs):
+        pass
+
+_NULL_SPAN = _NullSpan()
+
+class _Span:
+    def __init__(self, attrs):
+        self.attrs = attrs
+
+    def set(self, **attrs):
+        #attributes known only at the end (bytes read, tokens generated, ...)
+        self.attrs.update(attrs)
+
+
+class Tracer:
+    """
+    Collects spans as Chrome trace events (chrome://tracing, Perfetto).
+
+    Spans on a thread nest as complete events; spans opened inside asyncio
+    tasks overlap freely, so they are written as async begin/end pairs.
+    While disabled, span() costs one attribute check.
+    """
+    def __init__(self, enabled=False, output_file="trace.json"):
+        self.enabled = enabled
+        self.output_file = output_file
+        self.events = []
+        self._ids = itertools.count(1)
+        self._pid = os.getpid()
+        self._t0 = time.perf_counter()
+
+    def _now_us(self):
+        return (time.perf_counter() - self._t0) * 1e6
+
+    @contextmanager
+    def span(self, name, **attrs):
+        """
+        Times the enclosed block.
+
+            with span("fetch", url=url) as s:
+                ...
+                s.set(bytes=len(html))
+        """
+        if not self.enabled:
+            yield _NULL_SPAN
+            return
+
+        span = _Span(attrs)
+        try:
+            task = asyncio.current_task()
+        except RuntimeError:
+            task = None
+        tid = threading.get_ident()
+        start = self._now_us()
+        try:
+            yield span
+        except BaseException as e:
+            span.attrs["error"] = repr(e)
+            raise
+        finally:
+            end = self._now_us()
+            args = {k: v if isinstance(v, (int, float, bool, str)) or v is None else str(v)
+                    for k, v in span.attrs.items()}
+            if task is None:
+                self.events.append({"name": name, "ph": "X", "ts": start, "dur": end - start,
+                                    "pid": self._pid, "tid": tid, "args": args})
+            else:
+                span_id = next(self._ids)
+                common = {"name": name, "cat": "async", "id": span_id, "pid": self._pid, "tid": tid}
+                self.events.append({**common, "ph": "b", "ts": start, "args": args})
+                self.events.append({**common, "ph": "e", "ts": end})
+
+    def export(self, path=None):
+        """
+        Writes the spans collected so far as Chrome trace-event JSON.
+
+        Return:
+            str: Path written, or None if tracing is off or nothing was recorded
+        """
+        if not self.enabled or not self.events:
+            return None
+        path = path or self.output_file
+        thread_names = [{"name": "thread_name", "ph": "M", "pid": self._pid, "tid": t.ident, "args": {"name": t.name}}
+                        for t in threading.enumerate()]
+        try:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump({"traceEvents": thread_names + list(self.events), "displayTimeUnit": "ms"}, f)
+        except Exception as e:
+            logging.error(f"Error writing trace to {path}: {e}")
+            return None
+        logging.info(f"Wrote {len(self.events)} trace events to {path}")
+        return path
+
+
+def traced(name):
+    #decorator: one span around every call of a function or coroutine function
+    def decorator(func):
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with TRACER.span(name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with TRACER.span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+_tracing_config = CONFIG.get("tracing", {})
+TRACER = Tracer(_tracing_config.get("enabled", False), _tracing_config.get("output_file", "trace.json"))
+span = TRACER.span
+export_chrome_trace = TRACER.export
+
+atexit.register(export_chrome_trace)
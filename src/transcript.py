@@ -0,0 +1,65 @@
+class Transcript:
+    """
+    Chat transcript kept apart from the Tk widget.
+
+    Text is grouped into messages: a message is closed once appended text ends
+    with a newline, so streamed tokens of one reply stay a single message.
+    Closed messages are stored as a plain string, or as a tuple of
+    (text, tag) segments when parts of it are tagged (hyperlinks).
+    """
+    def __init__(self):
+        self.messages = []
+        self._open = []
+
+    def __len__(self):
+        #number of closed messages
+        return len(self.messages)
+
+    def append(self, text, tag=None):
+        """
+        Return:
+            bool: True if this text closed a message
+        """
+        if not text:
+            return False
+        if self._open and self._open[-1][1] == tag:
+            self._open[-1][0].append(text)
+        else:
+            self._open.append(([text], tag))
+
+        if not text.endswith("\n"):
+            return False
+
+        segments = tuple(("".join(parts), seg_tag) for parts, seg_tag in self._open)
+        if len(segments) == 1 and segments[0][1] is None:
+            self.messages.append(segments[0][0])
+        else:
+            self.messages.append(segments)
+        self._open = []
+        return True
+
+    def segments(self, index):
+        #(text, tag) pairs of a closed message
+        message = self.messages[index]
+        if isinstance(message, str):
+            return ((message, None),)
+        return message
+
+    def message_text(self, index):
+        message = self.messages[index]
+        if isinstance(message, str):
+            return message
+        return "".join(text for text, _ in message)
+
+    def line_count(self, start, end):
+        #newlines in closed messages [start, end), i.e. widget lines they take up
+        return sum(self.message_text(i).count("\n") for i in range(start, end))
+
+    def text(self):
+        #whole transcript including a message still being streamed
+        closed = "".join(self.message_text(i) for i in range(len(self.messages)))
+        return closed + "".join("".join(parts) for parts, _ in self._open)
+
+    def clear(self):
+        self.messages = []
+        self._open = []
@@ -1,24 +1,62 @@
 import os
 import sys
-import logging
 import json
+import queue
+import atexit
+import logging
+import logging.handlers
+import multiprocessing
 from datetime import datetime
 from functools import lru_cache
 from pathlib import Path
 
-logging.basicConfig(level=logging.INFO, filename="utils.log", filemode="w",
-                    format="%(asctime)s - %(levelname)s - %(message)s")
+@lru_cache(maxsize=1)
+def load_config(path="config.json"):
+    #config.json is parsed once and shared by every module
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+_log_listener = None
+
+def setup_logging(log_file=None, force=False):
+    """
+    Process-wide logging: every module logs to the root logger, whose only
+    handler puts records on a queue; a listener thread does the file writes,
+    so logging never blocks the UI or generation threads.
+    The first call wins (later calls are no-ops unless force=True).
+
+    Args:
+        log_file (str): Log file (default: logging.file in config, app.log)
+        force (bool): Replace an existing setup, e.g. in a worker process
+    """
+    global _log_listener
+    if _log_listener is not None and not force:
+        return
+    #spawned children re-run the entry module; they must not truncate the parent's log
+    if multiprocessing.parent_process() is not None and not force:
+        return
+
+    log_config = load_config().get("logging", {})
+    handlers = [logging.FileHandler(log_file or log_config.get("file", "app.log"), mode="w", encoding="utf-8")]
+    if log_config.get("console", False):
+        handlers.append(logging.StreamHandler())
+    formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(module)s - %(message)s")
+    for handler in handlers:
+        handler.setFormatter(formatter)
 
-def setup_logging(log_file="app.log"):
-    """basic logging configuration"""
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.FileHandler(log_file),
-            logging.StreamHandler()
-        ]
-    )
+    if _log_listener is not None:
+        _log_listener.stop()
+        atexit.unregister(_log_listener.stop)
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.setLevel(log_config.get("level", "INFO"))
+
+    _log_listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _log_listener.start()
+    atexit.register(_log_listener.stop)
 
 @lru_cache(maxsize=128)
 def resource_path(relative_path):
@@ -31,6 +69,122 @@ def resource_path(relative_path):
     
     return os.path.join(base_path, relative_path)
 
+def get_process_rss_mb(pid=None):
+    #resident memory of this process (or pid) in MB, None where it can't be read
+    try:
+        if sys.platform.startswith("linux"):
+            with open(f"/proc/{pid or 'self'}/status", "r") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        return int(line.split()[1]) / 1024
+        elif sys.platform == "win32":
+            import ctypes
+            from ctypes import wintypes
+
+            class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+                _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD),
+                            ("PeakWorkingSetSize", ctypes.c_size_t), ("WorkingSetSize", ctypes.c_size_t),
+                            ("QuotaPeakPagedPoolUsage", ctypes.c_size_t), ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                            ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t), ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                            ("PagefileUsage", ctypes.c_size_t), ("PeakPagefileUsage", ctypes.c_size_t)]
+
+            counters = PROCESS_MEMORY_COUNTERS()
+            counters.cb = ctypes.sizeof(counters)
+            kernel32 = ctypes.windll.kernel32
+            #PROCESS_QUERY_LIMITED_INFORMATION | PROCESS_VM_READ
+            handle = kernel32.GetCurrentProcess() if pid is None else kernel32.OpenProcess(0x1000 | 0x0010, False, pid)
+            if not handle:
+                return None
+            try:
+                if ctypes.windll.psapi.GetProcessMemoryInfo(handle, ctypes.byref(counters), counters.cb):
+                    return counters.WorkingSetSize / (1024 * 1024)
+            finally:
+                if pid is not None:
+                    kernel32.CloseHandle(handle)
+    except Exception as e:
+        logging.warning(f"Could not read process memory: {e}")
+    return None
+
+def set_cpu_affinity(cores):
+    """
+    Pins this process to the given logical cores.
+
+    Return:
+        bool: True if the affinity was set
+    """
+    try:
+        if hasattr(os, "sched_setaffinity"):
+            os.sched_setaffinity(0, cores)
+            return True
+        if sys.platform == "win32":
+            import ctypes
+
+            #the mask only covers the first processor group (64 cores)
+            mask = sum(1 << core for core in cores if core < 64)
+            kernel32 = ctypes.windll.kernel32
+            kernel32.GetCurrentProcess.restype = ctypes.c_void_p
+            process = ctypes.c_void_p(kernel32.GetCurrentProcess())
+            return bool(mask) and bool(kernel32.SetProcessAffinityMask(process, ctypes.c_size_t(mask)))
+    except Exception as e:
+        logging.warning(f"Could not set CPU affinity to {cores}: {e}")
+    return False
+
+def get_child_pids(pid=None):
+    #all descendants of this process (or pid), e.g. the Playwright driver and its browsers
+    pid = pid or os.getpid()
+    parents = {}
+    try:
+        if sys.platform.startswith("linux"):
+            for entry in os.listdir("/proc"):
+                if not entry.isdigit():
+                    continue
+                try:
+                    with open(f"/proc/{entry}/stat", "r") as f:
+                        #the command name may contain spaces, the ppid follows its closing parenthesis
+                        parents[int(entry)] = int(f.read().rsplit(")", 1)[1].split()[1])
+                except (OSError, IndexError, ValueError):
+                    continue
+        elif sys.platform == "win32":
+            import ctypes
+            from ctypes import wintypes
+
+            class PROCESSENTRY32(ctypes.Structure):
+                _fields_ = [("dwSize", wintypes.DWORD), ("cntUsage", wintypes.DWORD),
+                            ("th32ProcessID", wintypes.DWORD), ("th32DefaultHeapID", ctypes.c_size_t),
+                            ("th32ModuleID", wintypes.DWORD), ("cntThreads", wintypes.DWORD),
+                            ("th32ParentProcessID", wintypes.DWORD), ("pcPriClassBase", ctypes.c_long),
+                            ("dwFlags", wintypes.DWORD), ("szExeFile", ctypes.c_char * 260)]
+
+            kernel32 = ctypes.windll.kernel32
+            kernel32.CreateToolhelp32Snapshot.restype = wintypes.HANDLE
+            #TH32CS_SNAPPROCESS
+            snapshot = kernel32.CreateToolhelp32Snapshot(0x2, 0)
+            if snapshot in (None, wintypes.HANDLE(-1).value):
+                return []
+            try:
+                entry = PROCESSENTRY32()
+                entry.dwSize = ctypes.sizeof(entry)
+                ok = kernel32.Process32First(snapshot, ctypes.byref(entry))
+                while ok:
+                    parents[entry.th32ProcessID] = entry.th32ParentProcessID
+                    ok = kernel32.Process32Next(snapshot, ctypes.byref(entry))
+            finally:
+                kernel32.CloseHandle(snapshot)
+    except Exception as e:
+        logging.warning(f"Could not list child processes: {e}")
+        return []
+
+    children = {}
+    for child, parent in parents.items():
+        children.setdefault(parent, []).append(child)
+    found, todo = [], [pid]
+    while todo:
+        for child in children.get(todo.pop(), []):
+            if child != pid and child not in found:
+                found.append(child)
+                todo.append(child)
+    return found
+
 def ensure_dir_exists(directory):
     #to ensure a directory exists !create if not!
     try:
@@ -174,7 +328,7 @@ def reset_input_field(input_widget):
 
 def validate_model_loaded(model_handler, callback):
     #validating model loadeding before everything
-    if not model_handler.model:
+    if not model_handler.is_loaded():
         error_msg = "[Error: Model not loaded or failed to load. Please check console.]"
         if callable(callback):
             callback(error_msg)
@@ -185,13 +339,18 @@ def validate_model_loaded(model_handler, callback):
 def get_prompt_template():
     #returning prompt template from config or default
     try:
-        with open("config.json", "r", encoding="utf-8") as f:
-            config = json.load(f)
-        return config.get("prompt_template", "<|{role}|>\n{content}<|end|>\n")
+        return load_config().get("prompt_template", "<|{role}|>\n{content}<|end|>\n")
     except Exception as e:
         logging.warning(f"Failed to load prompt template from config: {e}")
         return "<|{role}|>\n{content}<|end|>\n"
 
+def split_into_chunks(text, max_words=1500):
+    #splits text into word-bounded chunks without touching disk
+    words = text.split()
+    if len(words) <= max_words:
+        return [text]
+    return [' '.join(words[start:start + max_words]) for start in range(0, len(words), max_words)]
+
 def chunk_text_if_needed(text, filename, output_folder, max_words=1500):
     """
     if text is too long, its aves chunks in the same folder as original file.
@@ -204,8 +363,7 @@ def chunk_text_if_needed(text, filename, output_folder, max_words=1500):
     logging.info(f"Splitting large document: {filename} ({len(words)} words)")
     chunks = []
     
-    for i, start in enumerate(range(0, len(words), max_words)):
-        chunk = ' '.join(words[start:start + max_words])
+    for i, chunk in enumerate(split_into_chunks(text, max_words)):
         chunk_filename = f"{Path(filename).stem}_chunk{i+1}.txt"
         chunk_path = os.path.join(output_folder, chunk_filename)
         
@@ -0,0 +1,150 @@
+import os
+import logging
+import threading
+import multiprocessing
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+#local imports
+from utils import load_config, setup_logging, set_cpu_affinity
+
+CONFIG = load_config()
+
+#worker processes log to worker_<n>.log (set up in _init_worker)
+
+#per-process state of a worker
+_worker_handler = None
+_worker_cancel = None
+
+
+def _core_partition(index, threads_per_worker):
+    #cores this worker is pinned to; workers get disjoint slices while there are enough cores
+    cores = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else list(range(os.cpu_count() or 1))
+    start = (index * threads_per_worker) % len(cores)
+    return [cores[(start + i) % len(cores)] for i in range(min(threads_per_worker, len(cores)))]
+
+def _init_worker(counter, cancel, threads_per_worker, preload_task):
+    global _worker_handler, _worker_cancel
+    _worker_cancel = cancel
+    with counter.get_lock():
+        index = counter.value
+        counter.value += 1
+
+    setup_logging(f"worker_{index}.log", force=True)
+
+    cores = _core_partition(index, threads_per_worker)
+    pinned = set_cpu_affinity(cores)
+
+    from connect import ModelHandler
+    _worker_handler = ModelHandler(load_now=False, worker=True)
+    _worker_handler.registry.session_overrides = {"intra_op_num_threads": threads_per_worker}
+    logging.info(f"Worker {index} (pid {os.getpid()}) {'on cores ' + str(cores) if pinned else 'not pinned'}, "
+                 f"{threads_per_worker} intra-op threads")
+    try:
+        _worker_handler.registry.get(preload_task)
+    except Exception as e:
+        logging.error(f"Worker {index} could not preload the {preload_task} model: {e}")
+        raise
+
+def _worker_generate(job):
+    prompt, max_tokens_gen, task = job
+    return _worker_handler.generate_full_response(prompt, max_tokens_gen=max_tokens_gen, task=task,
+                                                  cancel_event=_worker_cancel)
+
+
+class ModelWorkerPool:
+    """
+    N worker processes, each holding its own model instance pinned to its own
+    slice of cores. Prompts are spread over the workers and results come back
+    in submission order.
+    """
+    def __init__(self, num_workers, threads_per_worker=None, preload_task="summarize"):
+        self.num_workers = num_workers
+        self.threads_per_worker = threads_per_worker or max(1, (os.cpu_count() or 1) // num_workers)
+        #spawn: never fork a process that holds Tk, threads and a loaded model
+        context = multiprocessing.get_context("spawn")
+        #set to stop every worker's current generation at its next token
+        self._cancel = context.Event()
+        self._executor = ProcessPoolExecutor(
+            max_workers=num_workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(context.Value("i", 0), self._cancel, self.threads_per_worker, preload_task)
+        )
+        logging.info(f"Started {num_workers} model workers with {self.threads_per_worker} threads each")
+
+    def generate_all(self, prompts, max_tokens_gen=None, task="summarize", cancel_event=None):
+        #yields responses in prompt order as soon as each one (and all before it) is done
+        self._cancel.clear()
+        jobs = [(prompt, max_tokens_gen, task) for prompt in prompts]
+        finished = threading.Event()
+        if cancel_event is not None:
+            threading.Thread(target=self._relay_cancel, args=(cancel_event, finished), daemon=True).start()
+        try:
+            yield from self._executor.map(_worker_generate, jobs)
+        finally:
+            finished.set()
+
+    def _relay_cancel(self, cancel_event, finished):
+        #forwards the caller's threading.Event to the workers' shared event
+        while not finished.is_set():
+            if cancel_event.wait(0.02):
+                self._cancel.set()
+                return
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def can_partition_threads():
+    #each worker's intra-op thread count is only capped through a session options
+    #overlay; without it every worker would use all cores and they'd oversubscribe the CPU
+    from connect import session_options_supported
+    return session_options_supported()
+
+@lru_cache(maxsize=1)
+def get_worker_pool():
+    """
+    Shared worker pool if enabled in config (workers.num_workers > 1) and
+    this runtime can split the cores between workers, else None.
+    """
+    worker_config = CONFIG.get("workers", {})
+    num_workers = worker_config.get("num_workers", 1)
+    if num_workers <= 1:
+        return None
+    if not can_partition_threads():
+        logging.warning(f"workers.num_workers is {num_workers}, but this onnxruntime-genai can't limit the threads "
+                        "of each worker (no Config.overlay); using 1 worker to avoid oversubscribing the CPU")
+        return None
+    return ModelWorkerPool(num_workers, worker_config.get("threads_per_worker") or None)
+
+def generate_many(model_handler, prompts, max_tokens_gen=None, task="summarize", cancel_event=None, on_token=None):
+    """
+    Generates a response for every prompt, fanned out over the worker pool
+    when one is configured, otherwise one by one on model_handler.
+    Once cancel_event is set, in-flight generations stop at their next token
+    and return what they have; callers should treat those as incomplete.
+    on_token(text) receives streamed text in single-process mode only; pool
+    responses arrive whole.
+
+    Return:
+        generator: responses in prompt order
+    """
+    done = 0
+    pool = get_worker_pool()
+    if pool is not None:
+        try:
+            for response in pool.generate_all(prompts, max_tokens_gen, task, cancel_event):
+                done += 1
+                yield response
+            return
+        except BrokenProcessPool as e:
+            logging.error(f"Model worker pool failed ({e}), continuing in this process")
+            pool.shutdown()
+            get_worker_pool.cache_clear()
+            CONFIG.setdefault("workers", {})["num_workers"] = 1
+
+    for prompt in prompts[done:]:
+        yield model_handler.generate_full_response(prompt, max_tokens_gen=max_tokens_gen, task=task,
+                                                   cancel_event=cancel_event, callback=on_token)
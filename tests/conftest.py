@@ -0,0 +1,13 @@
+import os
+import sys
+import shutil
+import tempfile
+
+#the app imports its modules by name and reads config.json from the working
+#directory, so tests run from a scratch copy of it with src on the path
+SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+sys.path.insert(0, SRC)
+
+_workdir = tempfile.mkdtemp(prefix="tests_")
+shutil.copy(os.path.join(SRC, "config.json"), _workdir)
+os.chdir(_workdir)
@@ -0,0 +1,67 @@
+import random
+
+import pytest
+
+from dedup import MinHasher, shingles, find_near_duplicates, remove_duplicate_pages
+from store import SearchStore
+
+WORDS = ("river stone cloud engine market garden signal paper window forest metal "
+         "letter orbit candle bridge winter salt thread music harbor").split()
+
+
+def article(seed, words=300):
+    rng = random.Random(seed)
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def edit(text, every=60):
+    #replaces one word in every `every`, a light rewrite of the same page
+    words = text.split()
+    for i in range(0, len(words), every):
+        words[i] = "changed"
+    return " ".join(words)
+
+
+def test_shingles_are_stable_and_case_insensitive():
+    assert shingles("One two three four five six") == shingles("ONE two three four five SIX")
+    assert len(shingles("one two three four five six", size=5)) == 2
+    assert shingles("") == set()
+
+
+def test_minhash_similarity_tracks_jaccard():
+    hasher = MinHasher(num_perm=128, bands=32)
+    a = hasher.signature(shingles(article(1)))
+    assert MinHasher.similarity(a, a) == 1.0
+    assert MinHasher.similarity(a, hasher.signature(shingles(edit(article(1))))) > 0.8
+    assert MinHasher.similarity(a, hasher.signature(shingles(article(2)))) < 0.2
+
+
+def test_minhash_rejects_uneven_bands():
+    with pytest.raises(ValueError):
+        MinHasher(num_perm=64, bands=10)
+
+
+def test_near_duplicates_point_at_the_earliest_copy():
+    texts = [article(1), article(2), edit(article(1)), article(1), article(3)]
+    duplicates = find_near_duplicates(texts)
+    assert [(dup, kept) for dup, kept, _ in duplicates] == [(2, 0), (3, 0)]
+    assert all(sim >= 0.8 for _, _, sim in duplicates)
+
+
+def test_distinct_and_empty_texts_are_kept():
+    assert find_near_duplicates([article(1), article(2), "", article(3)]) == []
+
+
+def test_remove_duplicate_pages_records_them(tmp_path):
+    store = SearchStore(str(tmp_path / "store.db"))
+    attempt_id = store.new_attempt("query")
+    for i, text in enumerate([article(1), article(2), edit(article(1))]):
+        store.add_page(attempt_id, f"Page {i}", f"https://example.com/{i}", text)
+
+    removed = remove_duplicate_pages(store, attempt_id)
+
+    assert removed == ["search_data_3"]
+    assert [page["url"] for page in store.get_pages(attempt_id)] == ["https://example.com/0", "https://example.com/1"]
+    rows = store.connection().execute("SELECT kind, item, duplicate_of FROM duplicates").fetchall()
+    assert [tuple(row) for row in rows] == [
+        ("page", "search_data_3 [https://example.com/2]", "search_data_1 [https://example.com/0]")]
@@ -0,0 +1,48 @@
+from relevance import BM25Index, select_relevant_chunks, selection_recall, tokenize
+
+
+CHUNKS = [
+    "The weather in the mountains is cold and windy in winter.",
+    "Lithium battery capacity drops in cold weather; battery chemistry slows down.",
+    "A recipe for bread: flour, water, salt and yeast.",
+    "Battery battery battery.",
+]
+
+
+def test_tokenize_drops_stopwords_and_case():
+    assert tokenize("What is THE Battery life?") == ["battery", "life"]
+
+
+def test_bm25_ranks_matching_chunks_first():
+    scores = BM25Index(CHUNKS).score("battery cold weather")
+    assert scores[2] == 0.0
+    assert scores[1] == max(scores)
+    assert scores[1] > scores[0] > 0
+
+
+def test_bm25_saturates_term_frequency():
+    #repeating a term helps less and less: four mentions in a tiny chunk do not beat the focused chunk
+    index = BM25Index(CHUNKS)
+    scores = index.score("lithium battery")
+    assert scores[1] > scores[3]
+
+
+def test_select_respects_top_k_budget_and_order():
+    selected = select_relevant_chunks("battery cold weather", CHUNKS, top_k=2, token_budget=6000)
+    assert selected == [0, 1]
+    #the best chunk costs 15 of 16 tokens, nothing else fits after it
+    assert select_relevant_chunks("battery cold weather", CHUNKS, top_k=8, token_budget=16) == [1]
+    #a smaller, lower-ranked chunk still fills leftover room
+    assert select_relevant_chunks("battery cold weather", CHUNKS, top_k=8, token_budget=20) == [1, 3]
+
+
+def test_select_skips_unmatched_chunks():
+    assert 2 not in select_relevant_chunks("battery", CHUNKS)
+
+
+def test_select_without_query_terms_keeps_document_order():
+    assert select_relevant_chunks("the of and", CHUNKS, top_k=2) == [0, 1]
+
+
+def test_selection_recall():
+    assert selection_recall([0, 1], [1, 3]) == 0.5
@@ -0,0 +1,56 @@
+from search_engines import canonical_url, reciprocal_rank_fusion, parse_duckduckgo, EngineStats
+
+
+def results(*urls):
+    return [{"title": url.rsplit("/", 1)[-1], "url": url} for url in urls]
+
+
+def test_canonical_url_ignores_cosmetic_differences():
+    assert canonical_url("http://www.Example.com/a/?utm_source=x&id=3#top") == canonical_url("https://example.com/a?id=3")
+    assert canonical_url("https://example.com/a?id=3") != canonical_url("https://example.com/a?id=4")
+    assert canonical_url("https://example.com/a") != canonical_url("https://example.org/a")
+
+
+def test_fusion_ranks_results_found_by_more_engines_first():
+    merged = reciprocal_rank_fusion([
+        results("https://a.com/1", "https://b.com/2", "https://c.com/3"),
+        results("https://c.com/3", "https://b.com/2", "https://d.com/4"),
+    ])
+    assert [item["url"] for item in merged] == ["https://c.com/3", "https://b.com/2", "https://a.com/1",
+                                                "https://d.com/4"]
+    assert [item["engines"] for item in merged] == [2, 2, 1, 1]
+
+
+def test_fusion_collapses_http_and_www_copies():
+    merged = reciprocal_rank_fusion([
+        results("https://www.example.com/page", "https://other.com/x"),
+        results("http://example.com/page/"),
+    ])
+    assert len(merged) == 2
+    assert merged[0]["engines"] == 2
+    #the best-ranked copy's URL and title are kept
+    assert merged[0]["url"] == "https://www.example.com/page"
+
+
+def test_fusion_counts_a_repeated_url_once_per_engine():
+    merged = reciprocal_rank_fusion([results("https://a.com/1", "https://a.com/1#again", "https://b.com/2")])
+    assert [(item["url"], item["engines"]) for item in merged] == [("https://a.com/1", 1), ("https://b.com/2", 1)]
+
+
+def test_duckduckgo_redirects_are_unwrapped():
+    html = ("<a class='result__a' href='//duckduckgo.com/l/?uddg=https%3A%2F%2Fexample.com%2Fa&amp;rut=x'>A</a>")
+    assert parse_duckduckgo(html) == [{"title": "A", "url": "https://example.com/a"}]
+
+
+def test_failing_engines_are_tried_last():
+    stats = EngineStats()
+    stats.record("fast", 0.1, ok=True)
+    stats.record("slow", 2.0, ok=True)
+    stats.record("broken", 0.05, ok=False)
+
+    class Engine:
+        def __init__(self, name):
+            self.name = name
+
+    assert [e.name for e in stats.order([Engine("broken"), Engine("slow"), Engine("fast")])] == ["fast", "slow",
+                                                                                              "broken"]
@@ -0,0 +1,126 @@
+import json
+import types
+
+import numpy as np
+import pytest
+
+import connect
+from connect import ModelHandler, LoadedModel, _find_draft
+
+#a tiny deterministic stand-in for onnxruntime-genai: token 0 is EOS, the
+#next token depends on the last two, and a runner-up just below the favourite
+#makes the repetition penalty change the pick once the favourite has been seen
+VOCAB = 16
+EOS = 0
+
+
+def next_logits(tokens):
+    prev2, prev1 = (tokens[-2] if len(tokens) > 1 else 1), tokens[-1]
+    favourite = (prev1 * 7 + prev2 * 3) % (VOCAB - 1) + 1
+    logits = np.array([((v * 5 + prev1) % 7) * 0.1 for v in range(VOCAB)], dtype=np.float32)
+    logits[favourite] = 3.0
+    logits[favourite % (VOCAB - 1) + 1] = 2.8
+    logits[EOS] = 3.5 if (prev2, prev1) == (9, 4) else -1.0
+    return logits
+
+
+class FakeTokenizer:
+    def encode(self, text):
+        return np.array([int(word) for word in text.split()], dtype=np.int32)
+
+    def decode(self, tokens):
+        return " ".join(str(int(t)) for t in tokens if t != EOS)
+
+
+class FakeParams:
+    def __init__(self, model):
+        self.options = {}
+
+    def set_search_options(self, **options):
+        self.options.update(options)
+
+
+class FakeGenerator:
+    def __init__(self, model, params):
+        self.max_length = params.options["max_length"]
+        self.penalty = params.options.get("repetition_penalty", 1.0)
+        self.tokens = []
+        self.logits = None
+
+    def append_tokens(self, tokens):
+        start = len(self.tokens)
+        self.tokens += [int(t) for t in tokens]
+        self.logits = np.stack([next_logits(self.tokens[:i + 1]) for i in range(start, len(self.tokens))])
+
+    def get_output(self, name):
+        return self.logits[np.newaxis]
+
+    def rewind_to(self, length):
+        del self.tokens[length:]
+
+    def is_done(self):
+        return len(self.tokens) >= self.max_length or self.tokens[-1] == EOS
+
+    def generate_next_token(self):
+        self.tokens.append(connect._greedy_token(next_logits(self.tokens), set(self.tokens), self.penalty))
+
+    def get_next_tokens(self):
+        return [self.tokens[-1]]
+
+
+@pytest.fixture
+def handler(monkeypatch, tmp_path):
+    monkeypatch.setattr(connect, "og", types.SimpleNamespace(Generator=FakeGenerator, GeneratorParams=FakeParams))
+    (tmp_path / "genai_config.json").write_text(json.dumps({"model": {"eos_token_id": EOS}}))
+    handler = ModelHandler(load_now=False, worker=True)
+    task = handler.registry.variant_for("summarize")
+    handler.registry.resident[task] = LoadedModel(task, str(tmp_path), object(), FakeTokenizer(), 0)
+    return handler
+
+
+def generate(handler, prompt, speculative, max_tokens_gen):
+    text = handler.generate_full_response(prompt, max_tokens_gen=max_tokens_gen, speculative=speculative,
+                                          stop_sequences=[], do_sample=False)
+    return text, handler.last_stop_reason
+
+
+#the last two end in EOS after 33 and 37 tokens
+PROMPTS = ["3 5 7 3 5 7 3 5 7", "1 2 3 4 5 6 7 8 9 10 11 12", "9 4 2", "15 15 15 15", "1 2 1 2", "6 7 6 7"]
+
+
+@pytest.mark.parametrize("prompt", PROMPTS)
+@pytest.mark.parametrize("max_tokens_gen", [1, 7, 60])
+def test_speculative_output_matches_greedy(handler, prompt, max_tokens_gen):
+    greedy = generate(handler, prompt, False, max_tokens_gen)
+    assert generate(handler, prompt, True, max_tokens_gen) == greedy
+    assert handler.registry.resident[handler.registry.variant_for("summarize")].pins == 0
+
+
+def test_drafts_are_accepted_and_rejected(handler):
+    for prompt in PROMPTS:
+        generate(handler, prompt, True, 60)
+    stats = handler.speculative_stats
+    assert 0 < stats["accepted"] < stats["drafted"]
+    assert stats["forward_passes"] < stats["tokens"] + stats["calls"]
+
+
+def test_speculative_stops_at_eos_like_greedy(handler):
+    text, reason = generate(handler, "6 7 6 7", True, 60)
+    assert (len(text.split()), reason) == (37, "eos")
+
+
+def test_speculative_stops_at_the_context_window_like_greedy(handler, monkeypatch):
+    #the window cuts generation short: both paths must stop at the same token
+    monkeypatch.setitem(connect.CONFIG, "context_window", 20)
+    prompt = "3 5 7 3 5 7 3 5 7"
+    greedy_text, _ = generate(handler, prompt, False, 60)
+    text, reason = generate(handler, prompt, True, 60)
+    assert text == greedy_text
+    assert len(text.split()) == 20 - len(prompt.split())
+    assert reason == "max_length"
+
+
+def test_find_draft_copies_what_followed_the_latest_match():
+    assert _find_draft([1, 2, 3, 9, 1, 2, 3, 8, 1, 2], ngram_size=3, draft_length=2) == [3, 8]
+    assert _find_draft([1, 2, 3], ngram_size=3, draft_length=4) == []
+    assert _find_draft([1, 2, 1, 2], ngram_size=3, draft_length=0) == []
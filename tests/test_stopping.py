@@ -0,0 +1,48 @@
+from stopping import StopSequenceMatcher
+
+
+def stream(matcher, pieces):
+    #feeds pieces until a stop, returns (emitted text, stopped)
+    emitted = ""
+    for piece in pieces:
+        out, stopped = matcher.feed(piece)
+        emitted += out
+        if stopped:
+            return emitted, True
+    return emitted + matcher.flush(), False
+
+
+def test_stop_sequence_split_across_pieces_is_never_emitted():
+    matcher = StopSequenceMatcher(["<|end|>"])
+    assert stream(matcher, ["Hello", " world<", "|en", "d|> tail"]) == ("Hello world", True)
+    assert matcher.matched == "<|end|>"
+
+
+def test_only_a_possible_prefix_is_held_back():
+    matcher = StopSequenceMatcher(["<|end|>"])
+    assert matcher.feed("a <|e") == ("a ", False)
+    assert matcher.pending == "<|e"
+    #the held text turns out not to be a stop sequence and is released
+    assert matcher.feed("x") == ("<|ex", False)
+
+
+def test_earliest_match_wins():
+    matcher = StopSequenceMatcher(["STOP", "\nUser:"])
+    assert matcher.feed("answer\nUser: hi STOP") == ("answer", True)
+    assert matcher.matched == "\nUser:"
+
+
+def test_held_text_is_flushed_when_generation_ends():
+    matcher = StopSequenceMatcher(["<|end|>"])
+    assert stream(matcher, ["ends with <|"]) == ("ends with <|", False)
+
+
+def test_nothing_after_a_match():
+    matcher = StopSequenceMatcher(["."])
+    assert matcher.feed("one. two") == ("one", True)
+    assert matcher.feed("three") == ("", True)
+
+
+def test_no_stop_sequences_passes_text_through():
+    matcher = StopSequenceMatcher(None)
+    assert matcher.feed("<|end|>") == ("<|end|>", False)
@@ -0,0 +1,102 @@
+import os
+import threading
+
+from store import SearchStore
+
+
+def make_store(tmp_path):
+    return SearchStore(str(tmp_path / "store.db"))
+
+
+def test_concurrent_attempts_get_unique_ids(tmp_path):
+    store = make_store(tmp_path)
+    ids = []
+    lock = threading.Lock()
+
+    def allocate():
+        for _ in range(10):
+            attempt_id = store.new_attempt("query")
+            with lock:
+                ids.append(attempt_id)
+
+    threads = [threading.Thread(target=allocate) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(ids) == list(range(1, 41))
+    assert store.latest_attempt_id() == max(ids)
+
+
+def test_pages_are_numbered_per_attempt(tmp_path):
+    store = make_store(tmp_path)
+    first, second = store.new_attempt("a"), store.new_attempt("b")
+    store.add_page(first, "A1", "https://a/1", "one")
+    store.add_page(second, "B1", "https://b/1", "uno")
+    store.add_page(first, "A2", "https://a/2", "two")
+    assert [page["position"] for page in store.get_pages(first)] == [1, 2]
+    assert [page["position"] for page in store.get_pages(second)] == [1]
+
+
+def test_export_writes_the_legacy_layout(tmp_path):
+    store = make_store(tmp_path)
+    attempt_id = store.new_attempt("battery life")
+    store.add_links(attempt_id, [{"title": "A", "url": "https://a"}, {"title": "B", "url": "https://b"}])
+    single = store.add_page(attempt_id, "A", "https://a", "short page")
+    chunked = store.add_page(attempt_id, "B", "https://b", "first half second half")
+    store.set_chunks(single, ["short page"])
+    store.set_chunks(chunked, ["first half", "second half"])
+    store.add_summary(single, 0, "about a")
+    store.add_summary(chunked, 0, "about b one")
+    store.add_summary(chunked, 1, "about b two")
+    store.add_answer(chunked, "b answers it")
+
+    attempt_path, summary_path = store.export_attempt(attempt_id, str(tmp_path / "web"), str(tmp_path / "summary"))
+
+    def read(*parts):
+        with open(os.path.join(*parts), encoding="utf-8") as f:
+            return f.read()
+
+    assert attempt_path.endswith(f"search_attempt_{attempt_id}")
+    assert read(attempt_path, "query.txt") == "battery life"
+    assert read(attempt_path, "urls_n_headlines.txt") == "A\nhttps://a\n\nB\nhttps://b\n\n"
+    assert read(attempt_path, "search_data_1.txt") == "Title: A\nURL: https://a\nshort page"
+    assert read(attempt_path, "search_data_2_chunk2.txt") == "second half"
+    assert not os.path.exists(os.path.join(attempt_path, "search_data_1_chunk1.txt"))
+    assert read(summary_path, "search_data_1_summary.txt") == "[Document 1 Summary for 'search_data_1.txt']:\nabout a"
+    assert read(summary_path, "search_data_2_summary.txt") == (
+        "[Chunk 1 Summary for 'search_data_2.txt']:\nabout b one\n\n"
+        "[Chunk 2 Summary for 'search_data_2.txt']:\nabout b two")
+    assert "b answers it" in read(summary_path, "all_deep_search_answers.txt")
+
+
+def test_exported_folders_are_not_imported_back(tmp_path):
+    store = make_store(tmp_path)
+    attempt_id = store.new_attempt("query")
+    store.add_page(attempt_id, "A", "https://a", "text")
+    store.export_attempt(attempt_id, str(tmp_path / "web"), str(tmp_path / "summary"))
+
+    store.import_legacy_folders(str(tmp_path / "web"), str(tmp_path / "summary"))
+
+    assert len(store.list_attempts()) == 1
+
+
+def test_legacy_folders_are_imported_once(tmp_path):
+    #a folder in the old layout: what export writes, minus the query.txt only the store writes
+    source = make_store(tmp_path)
+    attempt_id = source.new_attempt("query")
+    page_id = source.add_page(attempt_id, "A", "https://a", "page text")
+    source.add_summary(page_id, 0, "about a")
+    attempt_path, _ = source.export_attempt(attempt_id, str(tmp_path / "web"), str(tmp_path / "summary"))
+    os.remove(os.path.join(attempt_path, "query.txt"))
+
+    store = SearchStore(str(tmp_path / "fresh.db"))
+    store.import_legacy_folders(str(tmp_path / "web"), str(tmp_path / "summary"))
+    store.import_legacy_folders(str(tmp_path / "web"), str(tmp_path / "summary"))
+
+    assert len(store.list_attempts()) == 1
+    imported = store.latest_attempt_id()
+    assert [(page["title"], page["url"], page["content"]) for page in store.get_pages(imported)] == [
+        ("A", "https://a", "page text")]
+    assert [row["summary"] for row in store.get_summaries(imported)] == ["about a"]
@@ -0,0 +1,24 @@
+import os
+
+import pytest
+
+import workers
+
+
+@pytest.fixture
+def eight_cores(monkeypatch):
+    monkeypatch.setattr(os, "sched_getaffinity", lambda pid: set(range(8)), raising=False)
+
+
+def test_workers_get_disjoint_core_slices(eight_cores):
+    slices = [workers._core_partition(index, 2) for index in range(4)]
+    assert slices == [[0, 1], [2, 3], [4, 5], [6, 7]]
+
+
+def test_slices_wrap_around_when_cores_run_out(eight_cores):
+    assert workers._core_partition(2, 3) == [6, 7, 0]
+    assert workers._core_partition(5, 2) == [2, 3]
+
+
+def test_a_worker_never_gets_more_cores_than_exist(eight_cores):
+    assert workers._core_partition(0, 16) == list(range(8))